@@ -1,315 +1,620 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
 import io
 import os
 from datetime import datetime
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import calendar
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
-from google.oauth2.service_account import Credentials
-import gspread
+from karlilik_motoru import (
+    karlilik_analizi_ozetten_hesapla, karlilik_sonucuna_maliyet_ekle, kar_hesapla, toptan_fiyat_listesi_hesapla, tablo_sayfasi, MODEL_TABLOSU_SUTUNLARI, VARYANT_TABLOSU_SUTUNLARI,
+    maliyet_surumu, HEDEF_KAR_MARJI, HEDEF_NET_KAR, SENARYO_PARAMETRELERI, SENARYO_SINIRI, aralik_degerleri, aralik_uzunlugu, senaryo_izgarasi_hesapla, model_duyarlilik_tablosu
+)
+from siparis_onbellegi import icerik_hash, siparis_excel_yukle, siparis_onbellekten_yukle
+from veri_onbellegi import paylasimli_onbellek, analiz_onbellegi
+import zamanlama
+from zamanlama import olcum
+from arama_indeksi import AramaIndeksi
+from disa_aktarim import disa_aktar, tablo_ozeti, BICIMLER
+from siparis_deposu import depoya_ekle, depo_ozeti, depo_sinirlari, gunluk_ozetleri_oku
+from maliyet_deposu import (
+    degisiklik_var_mi, barkod_ekle_veya_guncelle, barkodlari_ekle_veya_guncelle, maliyet_tablosunu_temizle, MaliyetCakismaHatasi
+)
+from maliyet_kaynagi import SqliteMaliyetKaynagi, maliyet_kaynagi_olustur
+
+SHEETS_ZAMAN_ASIMI = 15  # saniye
+KAMPANYA_ONERI_LIMITI = 50
 
 # ==============================================================================
 # YARDIMCI FONKSİYONLAR
 # ==============================================================================
 
+@st.cache_resource
 def get_google_creds():
+    # Tek istemci tüm oturumlarca paylaşılır: bağlantılar yeniden kullanılır, jeton kendiliğinden yenilenir
+    from google.oauth2.service_account import Credentials
+    from sheets_istemcisi import istemci_olustur
+
     scopes = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
     try:
         creds_dict = st.secrets["gcp_service_account"]
         sa = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        return gspread.authorize(sa)
     except (KeyError, FileNotFoundError):
         if os.path.exists("secrets.json"):
             sa = Credentials.from_service_account_file("secrets.json", scopes=scopes)
-            return gspread.authorize(sa)
         else:
             st.error("KRİTİK HATA: Kimlik bilgisi dosyası ('secrets.json' veya Cloud secrets) bulunamadı.")
             st.stop()
+    # Yavaş bir Sheets yanıtı sayfayı süresiz bekletmesin
+    return istemci_olustur(sa, SHEETS_ZAMAN_ASIMI)
 
-@st.cache_data(ttl=600)
-def load_cost_data_from_gsheets(_gc):
-    try:
-        workbook = _gc.open("maliyet_referans")
-        worksheet = workbook.worksheet("Sayfa1")
-        df = get_as_dataframe(worksheet, evaluate_formulas=True)
-        df['Barkod'] = df['Barkod'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
-        df['Model Kodu'] = df['Model Kodu'].astype(str).str.strip()
-        df['Alış Fiyatı'] = pd.to_numeric(df['Alış Fiyatı'], errors='coerce')
-        return df.dropna(subset=['Alış Fiyatı'])
-    except Exception as e:
-        st.error(f"Google Sheets'ten maliyet verisi okunurken hata: {e}")
-        return pd.DataFrame()
+def get_sheets_client():
+    return get_google_creds()
+
+@st.cache_resource
+def get_cost_source():
+    """Ayarlara göre seçilen maliyet kaynağı (Google Sheets ya da yerel SQLite); tüm sayfalar bunu kullanır."""
+    return maliyet_kaynagi_olustur(get_sheets_client)
+
+@st.cache_resource
+def get_loading_pool():
+    # Maliyet ve sipariş verisini eşzamanlı yüklemek için süreç genelinde tek havuz
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="yukleme")
+
+def run_in_background(fonksiyon, *args):
+    """Fonksiyonu oturum bağlamıyla birlikte yükleme havuzunda çalıştırır; Future döndürür."""
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    baglam = contextvars.copy_context()  # Zamanlama aralıkları bu çalıştırmaya bağlansın
+
+    def calistir():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fonksiyon(*args)
+    return get_loading_pool().submit(baglam.run, calistir)
+
+def fetch_cost_data(kaynak):
+    """Maliyet tablosunu kaynaktan okur; ekrana bir şey yazmadığı için arka planda çalışabilir.
+
+    (df, meta, hata) döndürür.
+    """
+    # Sheets kaynağında maliyetler yerel aynadan gelir; Sheets sadece revizyon değiştiğinde yeniden indirilir
+    with olcum('maliyet_yukle') as aralik:
+        try:
+            df, meta = kaynak.tumunu_yukle()
+            hata = None
+        except Exception as e:
+            df, meta, hata = pd.DataFrame(), None, e
+        aralik.satir = len(df)
+    return df, meta, hata
+
+def apply_cost_data(kaynak, sonuc):
+    df, meta, hata = sonuc
+    if hata is not None:
+        st.error(f"{kaynak.ad} kaynağından maliyet verisi okunurken hata: {hata}")
+    elif kaynak.son_hata() is not None:
+        st.warning(f"{kaynak.ad} ile senkronizasyon yapılamadı, son kaydedilen maliyet verisi kullanılıyor: {kaynak.son_hata()}")
+    st.session_state.df_maliyet = apply_session_costs(df)
+    # Kaydederken sadece değişen hücreleri bulmak için yüklenen anlık görüntüyü sakla
+    st.session_state.maliyet_anlik_goruntu = (df, meta)
+
+def apply_session_costs(df):
+    """Eksik maliyet sekmesinde girilen, kaynağa kaydedilmemiş maliyetleri kaynaktan yüklenen tabloya uygular.
+
+    Bu maliyetler oturum boyunca her yüklemede yeniden uygulanır. Sonuç aynı
+    tablo ve ekler için aynı nesnedir; analiz anahtarı her çalıştırmada
+    yeniden hesaplanmaz.
+    """
+    ekler = st.session_state.get('maliyet_ekleri')
+    if ekler is None or 'Barkod' not in df.columns:  # Kaynak okunamadıysa tablo boş ve sütunsuzdur
+        return df
+    onceki = st.session_state.get('maliyet_ekli_tablo')
+    if onceki is not None and onceki[0] is df and onceki[1] is ekler:
+        return onceki[2]
+    sonuc = barkodlari_ekle_veya_guncelle(df, ekler)
+    st.session_state.maliyet_ekli_tablo = (df, ekler, sonuc)
+    return sonuc
 
 def load_cost_data():
-    if 'gc' not in st.session_state:
-        st.session_state.gc = get_google_creds()
-    st.session_state.df_maliyet = load_cost_data_from_gsheets(st.session_state.gc)
-
-# --- HATA DÜZELTME: EKSİK OLAN KÂR HESAPLAMA FONKSİYONU ---
-def kar_hesapla(satis_fiyati_kdvli, alis_fiyati_kdvsiz, komisyon_orani, kdv_orani, kargo_gideri, reklam_gideri):
-    """Tek bir ürün için kâr hesaplaması yapar."""
-    kdv_bolen = 1 + (kdv_orani / 100)
-    kdv_carpan = kdv_orani / 100
-    
-    satis_fiyati_kdvsiz = satis_fiyati_kdvli / kdv_bolen
-    satis_kdv_tutari = satis_fiyati_kdvli - satis_fiyati_kdvsiz
-    alis_kdv_tutari = alis_fiyati_kdvsiz * kdv_carpan
-    net_odenecek_kdv = satis_kdv_tutari - alis_kdv_tutari
-    komisyon_tutari = satis_fiyati_kdvli * (komisyon_orani / 100)
-    
-    toplam_maliyet = alis_fiyati_kdvsiz + kargo_gideri + reklam_gideri + komisyon_tutari + net_odenecek_kdv
-    net_kar = satis_fiyati_kdvsiz - toplam_maliyet
-    kar_marji = (net_kar / satis_fiyati_kdvsiz) * 100 if satis_fiyati_kdvsiz > 0 else 0
-    
-    return {
-        'net_kar': net_kar, 
-        'kar_marji': kar_marji, 
-        'toplam_maliyet': toplam_maliyet
-    }
+    kaynak = get_cost_source()
+    apply_cost_data(kaynak, fetch_cost_data(kaynak))
+
+def save_cost_changes(yeni_df):
+    """Düzenlenmiş maliyet tablosunu, yüklenen anlık görüntüye göre farkı alarak maliyet kaynağına yazar."""
+    onceki_df, meta = st.session_state.maliyet_anlik_goruntu
+    if meta is None:
+        raise RuntimeError("Maliyet verisi yüklenemediği için kaydedilemiyor.")
+    df, meta, degisiklik = get_cost_source().kaydet(onceki_df, meta, yeni_df)
+    st.session_state.df_maliyet = df
+    st.session_state.maliyet_anlik_goruntu = (df, meta)
+    return degisiklik
+
+@st.cache_resource(max_entries=2)
+def _build_search_index(surum, _df_maliyet):
+    return AramaIndeksi(_df_maliyet)
+
+def get_search_index(df_maliyet):
+    # İndeks, aranan tablonun kendi içerik özetiyle anahtarlanır; oturumdaki eklerle
+    # değişmiş tablo da kaynaktaki tablonun indeksini değil kendi indeksini alır
+    return _build_search_index(maliyet_surumu(df_maliyet), df_maliyet)
+
+def get_order_dataset(anahtar, dosya_icerigi=None):
+    """Sipariş veri setini (df, hatalı satırlar) oturumlar arası paylaşılan önbellekten döndürür.
+
+    Oturumlar sadece içerik özetini saklar; aynı dosyayı açan tüm oturumlar
+    bellekteki tek kopyayı kullanır. Kopya bellekten çıkarıldıysa diskteki
+    önbellekten yeniden yüklenir.
+    """
+    def yukle():
+        with olcum('siparis_yukle') as aralik:
+            if dosya_icerigi is not None:
+                _, df, df_hatali = siparis_excel_yukle(dosya_icerigi, anahtar)
+            else:
+                onbellekteki = siparis_onbellekten_yukle(anahtar)
+                if onbellekteki is None:
+                    raise FileNotFoundError("Sipariş verisi artık önbellekte bulunmuyor. Lütfen Excel dosyasını yeniden yükleyin.")
+                df, df_hatali = onbellekteki
+            aralik.satir = len(df)
+            return df, df_hatali
+    return paylasimli_onbellek.al(('siparis', anahtar), yukle)
+
+def get_daily_rollups(revizyon, baslangic, bitis, platformlar):
+    """Filtreye uyan günlük özet tablolarını (df_gunluk, df_siparis_sayisi) döndürür.
+
+    Anahtar depo revizyonu ve filtredir; depoya yeni döküm eklenince eski
+    kopyalar kullanılmaz ve zamanla paylaşılan önbellekten çıkarılır.
+    """
+    anahtar = ('gunluk_ozet', revizyon, baslangic, bitis, tuple(sorted(platformlar)))
+    return paylasimli_onbellek.al(anahtar, lambda: gunluk_ozetleri_oku(baslangic, bitis, platformlar))
 
 # ==============================================================================
 # SAYFA RENDER FONKSİYONLARI
 # ==============================================================================
 
+# Büyük tablolarda sayfa başına satır seçenekleri ve "ilk N" seçenekleri
+SAYFA_BOYUTLARI = [50, 100, 500]
+ILK_N_SECENEKLERI = ["Tümü", 10, 50, 100, 500]
+
+def para_sutunlari(sutunlar, bicim="%.2f TL"):
+    """Para sütunları için sayısal sütun ayarları; biçimlendirme tarayıcıda yapılır, sıralama sayısal kalır."""
+    return {col: st.column_config.NumberColumn(format=bicim) for col in sutunlar}
+
+def sayfali_tablo(df, key, column_config, siralama_sutunu, azalan=True):
+    """Tabloyu sunucuda sıralayıp sayfalara bölerek gösterir; tarayıcıya sadece seçilen sayfa gönderilir."""
+    t_col1, t_col2, t_col3, t_col4 = st.columns([2, 1, 1, 1])
+    sayisal = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    siralama_sutunu = t_col1.selectbox("Sırala", sayisal, index=sayisal.index(siralama_sutunu), key=f"{key}_siralama")
+    azalan = t_col2.toggle("Büyükten küçüğe", value=azalan, key=f"{key}_azalan")
+    ilk_n = t_col3.selectbox("Göster", ILK_N_SECENEKLERI, key=f"{key}_ilk_n")
+    sayfa_boyutu = t_col4.selectbox("Sayfa başına", SAYFA_BOYUTLARI, index=1, key=f"{key}_sayfa_boyutu")
+
+    ilk_n = None if ilk_n == "Tümü" else ilk_n
+    toplam = min(len(df), ilk_n) if ilk_n is not None else len(df)
+    sayfa_sayisi = max(1, -(-toplam // sayfa_boyutu))
+    # Filtre ya da sayfa boyutu değişince kayıtlı sayfa numarası aralık dışında kalabilir
+    if st.session_state.get(f"{key}_sayfa", 1) > sayfa_sayisi:
+        st.session_state[f"{key}_sayfa"] = 1
+    sayfa = st.number_input("Sayfa", min_value=1, max_value=sayfa_sayisi, key=f"{key}_sayfa") if sayfa_sayisi > 1 else 1
+
+    with olcum('tablo_sayfasi', satir=len(df)):
+        df_sayfa, toplam = tablo_sayfasi(df, siralama_sutunu, azalan, ilk_n, sayfa, sayfa_boyutu)
+    st.dataframe(df_sayfa, column_config=column_config, hide_index=True, use_container_width=True)
+    bas = (sayfa - 1) * sayfa_boyutu
+    st.caption(f"{toplam:,} satırdan {min(bas + 1, toplam):,}–{min(bas + sayfa_boyutu, toplam):,} arası gösteriliyor.")
+
+def render_disa_aktarim(df, dosya_adi, key, sutunlar=None):
+    """Tablonun tamamını XLSX/CSV olarak indirme butonu.
+
+    Dosya her yeniden çalıştırmada değil, sadece istenince üretilir; üretilen
+    baytlar aynı içerik ve biçim için oturumda tutulur. Tablo her çalıştırmada
+    yeniden türetilse de içeriği değişmedikçe dosya yeniden üretilmez.
+    """
+    d_col1, d_col2 = st.columns([1, 2])
+    bicim = d_col1.selectbox("Dışa aktarım biçimi", list(BICIMLER), key=f"{key}_bicim", label_visibility="collapsed")
+    uzanti, mime = BICIMLER[bicim]
+    imza = (bicim, tablo_ozeti(df, sutunlar))
+    hazir = st.session_state.get(f"{key}_disa_aktarim")
+    if hazir is None or hazir[0] != imza:
+        if d_col2.button(f"📥 {bicim} dosyasını hazırla ({len(df):,} satır)", key=f"{key}_hazirla"):
+            with st.spinner("Dosya hazırlanıyor..."):
+                hazir = (imza, disa_aktar(df, bicim, sutunlar))
+            st.session_state[f"{key}_disa_aktarim"] = hazir
+        else:
+            return
+    d_col2.download_button(f"⬇️ {dosya_adi}.{uzanti} indir", data=hazir[1], file_name=f"{dosya_adi}.{uzanti}",
+                           mime=mime, key=f"{key}_indir")
+
+def render_performans_paneli():
+    """Son yeniden çalıştırmaların aşama sürelerini kenar çubuğunda gösterir."""
+    with st.sidebar.expander("⏱️ Performans (son çalıştırmalar)"):
+        calistirmalar = [c for c in zamanlama.son_calistirmalar() if c['araliklar']]
+        if not calistirmalar:
+            st.caption("Henüz ölçüm yok.")
+            return
+        for calistirma in calistirmalar:
+            zaman = datetime.fromtimestamp(calistirma['zaman']).strftime('%H:%M:%S')
+            st.caption(f"{zaman} · {calistirma['ad']} · {calistirma['id']}")
+            st.dataframe(
+                pd.DataFrame(calistirma['araliklar'])[['ad', 'sure_ms', 'satir', 'bellek_degisim_mb']],
+                hide_index=True, use_container_width=True
+            )
+
 def render_karlilik_analizi():
     st.title("📊 Kârlılık Analiz Paneli")
-    load_cost_data()
+    # Maliyetler arka planda yüklenirken sipariş dosyası ayrıştırılır ve filtreler gösterilir;
+    # maliyetler sadece analiz çizilmeden hemen önce beklenir
+    kaynak = get_cost_source()
+    maliyet_gorevi = run_in_background(fetch_cost_data, kaynak)
+
+    siparis_excelleri = st.file_uploader(
+        "Pixa Sipariş Excellerini Yükleyin", type=["xlsx", "xls"],
+        accept_multiple_files=True, key="karlilik_siparis_uploader"
+    )
+
+    # Yüklenen dökümler kalıcı sipariş deposuna eklenir; analiz her zaman depo üzerinden yapılır
+    for siparis_excel in siparis_excelleri or []:
+        try:
+            # Önbellek anahtarı dosya adı değil içeriğin özetidir; aynı dosya depoya ikinci kez eklenmez
+            dosya_icerigi = siparis_excel.getvalue()
+            dosya_hash = icerik_hash(dosya_icerigi)
+            df_yuklenen, df_hatali = get_order_dataset(dosya_hash, dosya_icerigi)
+            if not df_hatali.empty:
+                st.warning(f"**{siparis_excel.name}** dosyasında okunamayan **{len(df_hatali)}** satır analize dahil edilmedi.")
+                with st.expander("Okunamayan satırları göster"):
+                    st.dataframe(df_hatali, use_container_width=True)
+            if df_yuklenen.empty:
+                st.error(f"**{siparis_excel.name}** dosyasında geçerli 'Sipariş Tarihi' içeren hiçbir sipariş bulunamadı. Lütfen dosyanızı kontrol edin.")
+                continue
+            eklenen = depoya_ekle(df_yuklenen, kaynak=dosya_hash)
+            if eklenen['aylar']:
+                st.success(f"**{siparis_excel.name}**: {eklenen['eklenen']:,} yeni, {eklenen['guncellenen']:,} güncellenen satır depoya eklendi.")
+            # Tarih filtresi varsayılan olarak son yüklenen dökümün aralığını gösterir
+            tarihler = df_yuklenen['Sipariş Tarihi']
+            st.session_state.son_yukleme_araligi = (tarihler.min().date(), tarihler.max().date())
+        except Exception as e:
+            st.error(f"**{siparis_excel.name}** okunurken bir hata oluştu: {e}")
 
-    siparis_excel = st.file_uploader("Pixa Sipariş Excelini Yükleyin", type=["xlsx", "xls"], key="karlilik_siparis_uploader")
+    ozet = depo_ozeti()
+    sinirlar = depo_sinirlari(ozet)
+    if sinirlar is None:
+        st.info("Sipariş deposu henüz boş. Analize başlamak için Pixa sipariş Excel'ini yükleyin.")
+    else:
+        min_tarih, maks_tarih, _ = sinirlar
+        toplam_satir = sum(a['satir'] for a in ozet['aylar'].values())
+        st.caption(f"Sipariş deposu: {len(ozet['aylar'])} ay, {toplam_satir:,} sipariş satırı ({min_tarih:%d.%m.%Y} – {maks_tarih:%d.%m.%Y})")
+        # Bu oturumda dosya yüklenmediyse depodaki en yeni ay gösterilir
+        varsayilan_aralik = st.session_state.get('son_yukleme_araligi') or (max(min_tarih, maks_tarih.replace(day=1)), maks_tarih)
 
-    if 'df_siparis_orjinal' not in st.session_state:
-        st.session_state.df_siparis_orjinal = None
+        render_analiz_secenekleri(ozet, sinirlar, varsayilan_aralik)
 
-    if siparis_excel:
-        try:
-            if st.session_state.get('uploaded_filename') != siparis_excel.name:
-                df_siparis = pd.read_excel(siparis_excel, engine="calamine")
-                df_siparis['Sipariş Tarihi'] = pd.to_datetime(df_siparis['Sipariş Tarihi'], errors='coerce')
-                st.session_state.df_siparis_orjinal = df_siparis.dropna(subset=['Sipariş Tarihi'])
-                st.session_state.uploaded_filename = siparis_excel.name
-        except Exception as e:
-            st.error(f"Sipariş dosyası okunurken bir hata oluştu: {e}")
-            st.session_state.df_siparis_orjinal = None
+    with st.spinner("Maliyet verisi yükleniyor..."):
+        apply_cost_data(kaynak, maliyet_gorevi.result())
+
+    if st.session_state.get('analiz_calisti', False):
+        run_and_display_analysis()
 
-    if st.session_state.df_siparis_orjinal is not None:
-        df_siparis_orjinal = st.session_state.df_siparis_orjinal
+@st.fragment
+def render_analiz_secenekleri(ozet, sinirlar, varsayilan_aralik):
+    """Filtre ve parametre kartları.
 
-        # --- YENİ: Boş DataFrame kontrolü ---
-        # Eğer yüklenen Excel'de geçerli tarih içeren hiçbir satır yoksa,
-        # df_siparis_orjinal boş olur ve hata verir. Bunu burada engelliyoruz.
-        if df_siparis_orjinal.empty:
-            st.error("Yüklenen Excel dosyasında geçerli 'Sipariş Tarihi' içeren hiçbir sipariş bulunamadı. Lütfen dosyanızı kontrol edin.")
-            return # Fonksiyonun geri kalanını çalıştırmayı durdur
+    Bir girdinin değişmesi sadece bu bölümü yeniden çalıştırır; analiz
+    butona basıldığında sayfanın tamamı yeniden çizilerek güncellenir.
+    """
+    min_tarih, maks_tarih, platformlar = sinirlar
 
-        # Filtreleme Kartı
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.subheader("🔍 Filtreleme Seçenekleri")
-        filt_col1, filt_col2 = st.columns([1, 2])
+    # Filtreleme Kartı
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("🔍 Filtreleme Seçenekleri")
+    filt_col1, filt_col2 = st.columns([1, 2])
+
+    with filt_col1:
+        # Tarih sınırları depo özetinden gelir; veri dosyaları okunmaz
+        secilen_tarih_araligi = st.date_input(
+            "Tarih Aralığı Seçin", value=varsayilan_aralik,
+            min_value=min_tarih, max_value=maks_tarih, key='tarih_filtresi'
+        )
 
-        with filt_col1:
-            min_tarih = df_siparis_orjinal['Sipariş Tarihi'].min().date()
-            maks_tarih = df_siparis_orjinal['Sipariş Tarihi'].max().date()
-            
-            secilen_tarih_araligi = st.date_input(
-                "Tarih Aralığı Seçin", value=(min_tarih, maks_tarih),
-                min_value=min_tarih, max_value=maks_tarih, key='tarih_filtresi'
-            )
-            
-            if len(secilen_tarih_araligi) != 2:
-                st.warning("Lütfen bir başlangıç ve bitiş tarihi seçin.")
-                st.stop()
-            
-            secilen_baslangic, secilen_bitis = secilen_tarih_araligi
+        if len(secilen_tarih_araligi) != 2:
+            st.warning("Lütfen bir başlangıç ve bitiş tarihi seçin.")
+            return
 
-        with filt_col2:
-            platformlar = sorted(df_siparis_orjinal['Platform'].unique())
-            secilen_platformlar = st.multiselect(
-                "Platforma Göre Filtrele", options=platformlar,
-                default=platformlar, key='platform_filtresi'
-            )
-        st.markdown('</div>', unsafe_allow_html=True)
+        secilen_baslangic, secilen_bitis = secilen_tarih_araligi
 
-        # Analiz Parametreleri Kartı
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.subheader("⚙️ Analiz Parametreleri")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            komisyon_oran = st.number_input("Ort. Komisyon (%)", min_value=0.0, value=21.5, step=0.1)
-            kdv_oran = st.number_input("KDV Oranı (%)", min_value=0.0, value=10.0, step=1.0)
-        with col2:
-            toplam_kargo_faturasi = st.number_input("Toplam Kargo Faturası (TL)", min_value=0.0, value=0.0, step=1.0)
-            kargo_maliyeti_siparis_basi = st.number_input("Sipariş Başı Kargo (TL)", min_value=0.0, value=80.0, step=0.5, disabled=(toplam_kargo_faturasi > 0))
-        with col3:
-            toplam_reklam_butcesi = st.number_input("Toplam Reklam Bütçesi (TL)", min_value=0.0, value=0.0, step=1.0)
-            reklam_gideri_urun_basi = st.number_input("Ürün Başı Reklam (TL)", min_value=0.0, value=0.0, step=0.1, disabled=(toplam_reklam_butcesi > 0))
-
-        if st.button("🚀 Filtrelenmiş Veriyle Analizi Başlat", key="karlilik_button"):
-            df_filtrelenmis = df_siparis_orjinal[
-                (df_siparis_orjinal['Sipariş Tarihi'].dt.date >= secilen_baslangic) &
-                (df_siparis_orjinal['Sipariş Tarihi'].dt.date <= secilen_bitis) &
-                (df_siparis_orjinal['Platform'].isin(secilen_platformlar))
-            ]
-
-            if df_filtrelenmis.empty:
-                st.warning("Seçtiğiniz filtrelere uygun hiçbir sipariş bulunamadı.")
-                st.session_state.analiz_calisti = False
-            else:
-                st.session_state.df_tum_siparisler = df_filtrelenmis.copy()
-                st.session_state.analiz_params = {
-                    "komisyon_oran": komisyon_oran, "kdv_oran": kdv_oran,
-                    "toplam_kargo_faturasi": toplam_kargo_faturasi, "kargo_maliyeti_siparis_basi": kargo_maliyeti_siparis_basi,
-                    "toplam_reklam_butcesi": toplam_reklam_butcesi, "reklam_gideri_urun_basi": reklam_gideri_urun_basi,
-                    "satis_fiyati_sutunu": 'Tutar'
-                }
-                st.session_state.analiz_calisti = True
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+    with filt_col2:
+        secilen_platformlar = st.multiselect(
+            "Platforma Göre Filtrele", options=platformlar,
+            default=platformlar, key='platform_filtresi'
+        )
+    st.markdown('</div>', unsafe_allow_html=True)
 
-    if st.session_state.get('analiz_calisti', False):
-        run_and_display_analysis()
+    # Analiz Parametreleri Kartı
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.subheader("⚙️ Analiz Parametreleri")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        komisyon_oran = st.number_input("Ort. Komisyon (%)", min_value=0.0, value=21.5, step=0.1)
+        kdv_oran = st.number_input("KDV Oranı (%)", min_value=0.0, value=10.0, step=1.0)
+    with col2:
+        toplam_kargo_faturasi = st.number_input("Toplam Kargo Faturası (TL)", min_value=0.0, value=0.0, step=1.0)
+        kargo_maliyeti_siparis_basi = st.number_input("Sipariş Başı Kargo (TL)", min_value=0.0, value=80.0, step=0.5, disabled=(toplam_kargo_faturasi > 0))
+    with col3:
+        toplam_reklam_butcesi = st.number_input("Toplam Reklam Bütçesi (TL)", min_value=0.0, value=0.0, step=1.0)
+        reklam_gideri_urun_basi = st.number_input("Ürün Başı Reklam (TL)", min_value=0.0, value=0.0, step=0.1, disabled=(toplam_reklam_butcesi > 0))
+
+    if st.button("🚀 Filtrelenmiş Veriyle Analizi Başlat", key="karlilik_button"):
+        # Sipariş satırları okunmaz; sadece aralığa düşen ayların günlük özetleri okunur
+        # Fragment tek başına yeniden çalıştıysa `ozet` eskimiş olabilir; güncel revizyon okunur
+        df_gunluk, _ = get_daily_rollups(depo_ozeti()['revizyon'], secilen_baslangic, secilen_bitis, secilen_platformlar)
+
+        if df_gunluk.empty:
+            st.warning("Seçtiğiniz filtrelere uygun hiçbir sipariş bulunamadı.")
+            st.session_state.analiz_calisti = False
+        else:
+            # Filtrelenmiş kopya değil, filtrenin kendisi saklanır
+            st.session_state.siparis_filtresi = (secilen_baslangic, secilen_bitis, list(secilen_platformlar))
+            st.session_state.analiz_params = {
+                "komisyon_oran": komisyon_oran, "kdv_oran": kdv_oran,
+                "toplam_kargo_faturasi": toplam_kargo_faturasi, "kargo_maliyeti_siparis_basi": kargo_maliyeti_siparis_basi,
+                "toplam_reklam_butcesi": toplam_reklam_butcesi, "reklam_gideri_urun_basi": reklam_gideri_urun_basi,
+                "satis_fiyati_sutunu": 'Tutar'
+            }
+            st.session_state.analiz_calisti = True
+            st.rerun()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def analiz_anahtari(revizyon, df_maliyet, params):
+    """Seçili filtre için analiz sonucunun paylaşılan önbellekteki anahtarı.
+
+    Aynı depo revizyonu, maliyet içeriği, filtre ve parametrelerle sonuç bellekten
+    gelir; depoya döküm eklenince ya da maliyetler düzenlenince eski sonuç kullanılmaz.
+    """
+    baslangic, bitis, platformlar = st.session_state.siparis_filtresi
+    return (
+        'karlilik', revizyon, baslangic, bitis, tuple(sorted(platformlar)),
+        maliyet_surumu(df_maliyet), tuple(sorted(params.items()))
+    )
 
 def run_and_display_analysis():
     try:
-        df_siparis = st.session_state.df_tum_siparisler
+        baslangic, bitis, platformlar = st.session_state.siparis_filtresi
+        # Analizden sonra yüklenen dökümler de sonuca girsin diye revizyon filtreyle saklanmaz, depodan okunur
+        revizyon = depo_ozeti()['revizyon']
         df_maliyet = st.session_state.df_maliyet
         params = st.session_state.analiz_params
 
-        # --- KESİN ÇÖZÜM: Kapsamlı Barkod Temizliği ---
-        # Farklı kaynaklardan gelen (Excel ve Google Sheets) barkod formatlarını
-        # birleştirmeden önce standart hale getiriyoruz.
-        
-        # 1. Sipariş DataFrame'ini (Excel'den gelen) temizle
-        df_siparis['Barkod'] = df_siparis['Barkod'].astype(str) # Önce metne çevir
-        df_siparis['Barkod'] = df_siparis['Barkod'].str.replace(r'\.0$', '', regex=True) # Sonundaki ".0" uzantısını kaldır
-        df_siparis['Barkod'] = df_siparis['Barkod'].str.strip() # Olası boşlukları temizle
-
-        # 2. Maliyet DataFrame'ini (Google Sheets'ten gelen) temizle
-        df_maliyet['Barkod'] = df_maliyet['Barkod'].astype(str)
-        df_maliyet['Barkod'] = df_maliyet['Barkod'].str.replace(r'\.0$', '', regex=True)
-        df_maliyet['Barkod'] = df_maliyet['Barkod'].str.strip()
-
-        # Artık formatları eşit olan tabloları birleştir
-        df_merged = pd.merge(df_siparis, df_maliyet, on="Barkod", how="left")
-        df_maliyetli = df_merged[df_merged['Alış Fiyatı'].notna()].copy()
-        df_maliyetsiz = df_merged[df_merged['Alış Fiyatı'].isna()].copy()
-
-        toplam_satilan_urun = df_siparis['Miktar'].sum()
-        essiz_siparis_sayisi = df_siparis['Sipariş No'].nunique()
-        if params['toplam_kargo_faturasi'] > 0:
-            urun_basi_kargo_maliyeti = params['toplam_kargo_faturasi'] / toplam_satilan_urun if toplam_satilan_urun > 0 else 0
-        else:
-            urun_basi_kargo_maliyeti = (params['kargo_maliyeti_siparis_basi'] * essiz_siparis_sayisi) / toplam_satilan_urun if toplam_satilan_urun > 0 else 0
-
-        if params['toplam_reklam_butcesi'] > 0:
-            trendyol_urun_adedi = df_siparis[df_siparis['Platform'] == 'Trendyol']['Miktar'].sum()
-            urun_basi_reklam_gideri_trendyol = params['toplam_reklam_butcesi'] / trendyol_urun_adedi if trendyol_urun_adedi > 0 else 0
-            df_maliyetli['Birim_Reklam_Gideri'] = df_maliyetli['Platform'].apply(lambda x: urun_basi_reklam_gideri_trendyol if x == 'Trendyol' else 0)
-        else:
-            df_maliyetli['Birim_Reklam_Gideri'] = params['reklam_gideri_urun_basi']
+        def hesapla():
+            df_gunluk, df_siparis_sayisi = get_daily_rollups(revizyon, baslangic, bitis, platformlar)
+            # Tüm hesaplama Streamlit'ten bağımsız motorda, sipariş satırları yerine günlük özetler üzerinden yapılır
+            with olcum('karlilik_analizi', satir=len(df_gunluk)):
+                return karlilik_analizi_ozetten_hesapla(df_gunluk, df_siparis_sayisi, df_maliyet, params)
 
-        df_grouped = df_maliyetli.groupby('Model Kodu').agg(
-            Toplam_Adet=('Miktar', 'sum'),
-            Toplam_Ciro_Analiz_Edilen=(params['satis_fiyati_sutunu'], lambda x: (x * df_maliyetli.loc[x.index, 'Miktar']).sum()),
-            Alis_Fiyati_KDVsiz=('Alış Fiyatı', 'first'),
-            Toplam_Reklam_Gideri=('Birim_Reklam_Gideri', lambda x: (x * df_maliyetli.loc[x.index, 'Miktar']).sum())
-        ).reset_index()
-
-        toplam_analiz_kari = 0
-        if not df_grouped.empty:
-            df_grouped['Ort_Satis_Fiyati_KDVli'] = df_grouped['Toplam_Ciro_Analiz_Edilen'] / df_grouped['Toplam_Adet']
-            kdv_bolen = 1 + (params['kdv_oran'] / 100)
-            kdv_carpan = params['kdv_oran'] / 100
-            df_grouped['Ort_Satis_Fiyati_KDVsiz'] = df_grouped['Ort_Satis_Fiyati_KDVli'] / kdv_bolen
-            df_grouped['Satis_KDV'] = df_grouped['Ort_Satis_Fiyati_KDVli'] - df_grouped['Ort_Satis_Fiyati_KDVsiz']
-            df_grouped['Alis_KDV'] = df_grouped['Alis_Fiyati_KDVsiz'] * kdv_carpan
-            df_grouped['Net_Odenecek_KDV'] = df_grouped['Satis_KDV'] - df_grouped['Alis_KDV']
-            df_grouped['Komisyon_TL'] = df_grouped['Ort_Satis_Fiyati_KDVli'] * (params['komisyon_oran'] / 100)
-            df_grouped['Birim_Kar'] = (df_grouped['Ort_Satis_Fiyati_KDVsiz'] - df_grouped['Alis_Fiyati_KDVsiz'] - df_grouped['Net_Odenecek_KDV'] - df_grouped['Komisyon_TL'] - urun_basi_kargo_maliyeti)
-            df_grouped['Toplam_Kar'] = (df_grouped['Birim_Kar'] * df_grouped['Toplam_Adet']) - df_grouped['Toplam_Reklam_Gideri']
-            toplam_analiz_kari = df_grouped['Toplam_Kar'].sum()
-
-        st.session_state.toplam_analiz_kari = toplam_analiz_kari
+        sonuc = analiz_onbellegi.al(analiz_anahtari(revizyon, df_maliyet, params), hesapla)
+        df_maliyetsiz = sonuc['df_maliyetsiz']
+        st.session_state.toplam_analiz_kari = sonuc['toplamlar']['toplam_analiz_kari']
+        st.session_state.gunluk_kar = sonuc['df_gunluk_kar']
 
         if not df_maliyetsiz.empty:
-            st.warning(f"**DİKKAT:** Seçtiğiniz filtredeki **{len(df_maliyetsiz)}** satır ürünün maliyet bilgisi bulunamadı. Aşağıdaki 'Eksik Maliyetleri Gir' sekmesinden bu verileri tamamlayabilirsiniz.")
-            tab1, tab2 = st.tabs(["Genel Analiz", "⚠️ Eksik Maliyetleri Gir"])
-            with tab1:
-                display_summary_and_details(df_siparis, df_grouped, toplam_analiz_kari, urun_basi_kargo_maliyeti)
-            with tab2:
-                render_eksik_maliyet_tab(df_maliyetsiz)
+            st.warning(f"**DİKKAT:** Seçtiğiniz filtredeki **{sonuc['toplamlar']['maliyetsiz_satir_sayisi']}** satır ürünün maliyet bilgisi bulunamadı. Aşağıdaki 'Eksik Maliyetleri Gir' sekmesinden bu verileri tamamlayabilirsiniz.")
+            tab1, tab2, tab3 = st.tabs(["Genel Analiz", "🧪 Senaryo Analizi", "⚠️ Eksik Maliyetleri Gir"])
+            with tab3:
+                render_eksik_maliyet_tab(sonuc, revizyon)
         else:
-            display_summary_and_details(df_siparis, df_grouped, toplam_analiz_kari, urun_basi_kargo_maliyeti)
+            tab1, tab2 = st.tabs(["Genel Analiz", "🧪 Senaryo Analizi"])
+        with tab1:
+            display_summary_and_details(sonuc)
+        with tab2:
+            render_senaryo_analizi(sonuc, params)
     except Exception as e:
         st.error(f"Analiz sırasında bir hata oluştu: {e}")
 
-def display_summary_and_details(df_siparis, df_grouped, toplam_analiz_kari, urun_basi_kargo_maliyeti):
+def display_summary_and_details(sonuc):
+    df_grouped = sonuc['df_grouped']
+    render_ozet_metrikleri(sonuc['toplamlar'])
+    render_platform_performansi(sonuc['df_platform'])
+
+    with st.container():
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.subheader("📋 Model Bazında Detaylı Analiz (Maliyeti Bilinenler)")
+        if not df_grouped.empty:
+            render_model_tablosu(df_grouped, sonuc['df_varyant'])
+        else:
+            st.warning("Maliyeti bilinen ürün bulunamadı.")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+def render_ozet_metrikleri(toplamlar):
+    """Sipariş özeti ve genel finansal bakış kartları; diğer bölümlerdeki etkileşimler bunları yeniden çizmez."""
+    toplam_analiz_kari = toplamlar['toplam_analiz_kari']
+    toplam_siparis_sayisi = toplamlar['toplam_siparis_sayisi']
+    toplam_satilan_urun = toplamlar['toplam_satilan_urun']
+
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📦 Sipariş Özeti (Filtrelenmiş Veri)")
         sum_col1, sum_col2, sum_col3 = st.columns(3)
-        sum_col1.metric("Toplam Sipariş Sayısı", f"{df_siparis['Sipariş No'].nunique()}")
-        sum_col2.metric("Toplam Satılan Ürün", f"{df_siparis['Miktar'].sum()}")
-        sum_col3.metric("Sipariş Başına Ürün", f"{(df_siparis['Miktar'].sum() / df_siparis['Sipariş No'].nunique()) if df_siparis['Sipariş No'].nunique() > 0 else 0:.2f}")
+        sum_col1.metric("Toplam Sipariş Sayısı", f"{toplam_siparis_sayisi}")
+        sum_col2.metric("Toplam Satılan Ürün", f"{toplam_satilan_urun}")
+        sum_col3.metric("Sipariş Başına Ürün", f"{(toplam_satilan_urun / toplam_siparis_sayisi) if toplam_siparis_sayisi > 0 else 0:.2f}")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("💰 Genel Finansal Bakış (Filtrelenmiş Veri)")
         m_col1, m_col2 = st.columns(2)
-        toplam_gercek_ciro = (df_siparis['Tutar'] * df_siparis['Miktar']).sum()
+        toplam_gercek_ciro = toplamlar['toplam_gercek_ciro']
         m_col1.metric("Toplam Ciro (KDV Dahil)", f"{toplam_gercek_ciro:,.2f} TL")
         m_col2.metric("Toplam Net Kâr (Analiz Edilen)", f"{toplam_analiz_kari:,.2f} TL")
 
         m_col3, m_col4 = st.columns(2)
         m_col3.metric("Net Kâr Marjı", f"{(toplam_analiz_kari / toplam_gercek_ciro * 100) if toplam_gercek_ciro > 0 else 0:.2f}%")
-        m_col4.metric("Hesaplanan Ürün Başı Kargo", f"{urun_basi_kargo_maliyeti:,.2f} TL")
+        m_col4.metric("Hesaplanan Ürün Başı Kargo", f"{toplamlar['urun_basi_kargo_maliyeti']:,.2f} TL")
         st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+def render_platform_performansi(df_platform):
+    """Platform ciro dağılımı grafiği ve tablosu; grafik sadece analiz yenilendiğinde yeniden çizilir."""
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("🌐 Platform Performansı")
-        df_platform = df_siparis.groupby('Platform').agg(
-            Ciro=('Tutar', lambda x: (x * df_siparis.loc[x.index, 'Miktar']).sum())
-        ).reset_index()
 
         pie_col, data_col = st.columns([2,3])
-        with pie_col:
+        with pie_col, olcum('grafik_platform', satir=len(df_platform)):
+            import plotly.express as px
             fig = px.pie(df_platform, names='Platform', values='Ciro', title='Ciro Dağılımı',
                          color_discrete_sequence=px.colors.sequential.Peach)
             fig.update_layout(showlegend=False)
             fig.update_traces(textinfo='percent+label', textfont_size=14)
             st.plotly_chart(fig, use_container_width=True)
         with data_col:
-            st.dataframe(df_platform.sort_values('Ciro', ascending=False).style.format({'Ciro': '{:,.2f} TL'}), use_container_width=True)
+            st.dataframe(df_platform.sort_values('Ciro', ascending=False), column_config=para_sutunlari(['Ciro', 'Kar']), hide_index=True, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+def render_model_tablosu(df_grouped, df_varyant):
+    """Model tablosu ve seçilen modelin varyant kırılımı; sıralama, sayfa ve model seçimi grafikleri ve özetleri yeniden çizmez."""
+    # Sütunlar sayısal kalır: sıralama doğru çalışır, biçim tarayıcıda uygulanır
+    sayfali_tablo(
+        df_grouped[MODEL_TABLOSU_SUTUNLARI], "model_tablosu",
+        para_sutunlari(MODEL_TABLOSU_SUTUNLARI[2:]), siralama_sutunu='Toplam_Kar'
+    )
+    render_disa_aktarim(df_grouped, "model_karlilik", "model_tablosu", sutunlar=MODEL_TABLOSU_SUTUNLARI)
+
+    # Model alış fiyatı varyantların adet ağırlıklı ortalamasıdır; kırılım her barkodun kendi maliyetini gösterir
+    secilen_model = st.selectbox(
+        "🔎 Varyantlarını görmek için model seçin", df_grouped.sort_values('Toplam_Kar', ascending=False)['Model Kodu'],
+        index=None, placeholder="Model Kodu", key="model_varyant_secimi"
+    )
+    if secilen_model is not None:
+        # Varyant tablosu model koduna göre sıralıdır; seçilen modelin satırları ikili aramayla bulunur
+        modeller = df_varyant['Model Kodu']
+        bas, son = modeller.searchsorted(secilen_model, side='left'), modeller.searchsorted(secilen_model, side='right')
+        st.dataframe(df_varyant.iloc[bas:son][VARYANT_TABLOSU_SUTUNLARI[1:]], column_config=para_sutunlari(VARYANT_TABLOSU_SUTUNLARI[3:]),
+                     hide_index=True, use_container_width=True)
+
+def _aralik_girdisi(etiket, varsayilan, adim, key):
+    """Bir parametre için (min, maks, adım) girdilerini alıp aralığı döndürür."""
+    a_col1, a_col2, a_col3 = st.columns(3)
+    alt = a_col1.number_input(f"{etiket} (Min)", min_value=0.0, value=float(varsayilan), step=adim, key=f"{key}_min")
+    ust = a_col2.number_input(f"{etiket} (Maks)", min_value=0.0, value=float(varsayilan), step=adim, key=f"{key}_maks")
+    artis = a_col3.number_input(f"{etiket} (Adım)", min_value=0.01, value=adim, step=adim, key=f"{key}_adim")
+    if ust < alt:
+        alt, ust = ust, alt
+    return alt, ust, artis
+
+@st.fragment
+def render_senaryo_analizi(sonuc, params):
+    # Senaryo girdileri sadece bu sekmeyi yeniden çalıştırır
+    df_grouped = sonuc['df_grouped']
+    if df_grouped.empty:
+        st.warning("Maliyeti bilinen ürün bulunamadı.")
+        return
+
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.subheader("📋 Model Bazında Detaylı Analiz (Maliyeti Bilinenler)")
-        if not df_grouped.empty:
-            df_display = df_grouped[['Model Kodu', 'Toplam_Adet', 'Ort_Satis_Fiyati_KDVli', 'Alis_Fiyati_KDVsiz', 'Komisyon_TL', 'Net_Odenecek_KDV', 'Birim_Kar', 'Toplam_Kar']].copy()
-            for col in df_display.columns.drop(['Model Kodu', 'Toplam_Adet']): df_display[col] = df_display[col].map('{:,.2f} TL'.format)
-            st.dataframe(df_display, use_container_width=True)
+        st.subheader("🧪 Senaryo Izgarası")
+        st.caption("Parametre aralıklarının tüm kombinasyonları, toplanmış model tablosu üzerinden tek seferde hesaplanır.")
+
+        # Kargo ve reklam için analizde hangi mod seçildiyse o değer aralığa alınır
+        kargo_anahtari = 'toplam_kargo_faturasi' if params['toplam_kargo_faturasi'] > 0 else 'kargo_maliyeti_siparis_basi'
+        reklam_anahtari = 'toplam_reklam_butcesi' if params['toplam_reklam_butcesi'] > 0 else 'reklam_gideri_urun_basi'
+        kargo_etiketi = "Toplam Kargo Faturası (TL)" if kargo_anahtari == 'toplam_kargo_faturasi' else "Sipariş Başı Kargo (TL)"
+        reklam_etiketi = "Toplam Reklam Bütçesi (TL)" if reklam_anahtari == 'toplam_reklam_butcesi' else "Ürün Başı Reklam (TL)"
+
+        senaryo_params = {k: params[k] for k in SENARYO_PARAMETRELERI}
+        araliklar = {
+            'komisyon_oran': _aralik_girdisi("Komisyon (%)", params['komisyon_oran'], 0.5, "senaryo_komisyon"),
+            'kdv_oran': _aralik_girdisi("KDV Oranı (%)", params['kdv_oran'], 1.0, "senaryo_kdv"),
+            kargo_anahtari: _aralik_girdisi(kargo_etiketi, params[kargo_anahtari], 5.0, "senaryo_kargo"),
+            reklam_anahtari: _aralik_girdisi(reklam_etiketi, params[reklam_anahtari], 1.0, "senaryo_reklam"),
+        }
+        # Izgara boyutu diziler oluşturulmadan kontrol edilir; geniş aralık + küçük adım belleği tüketmesin
+        senaryo_sayisi = int(np.prod([aralik_uzunlugu(*a) for a in araliklar.values()], dtype=float))
+        if senaryo_sayisi > SENARYO_SINIRI:
+            st.warning(f"Seçilen aralıklar {senaryo_sayisi:,} senaryo üretiyor; en fazla {SENARYO_SINIRI:,} senaryo hesaplanabilir. "
+                       "Lütfen aralıkları daraltın ya da adımları büyütün.")
         else:
-            st.warning("Maliyeti bilinen ürün bulunamadı.")
+            senaryo_params.update({k: aralik_degerleri(*a) for k, a in araliklar.items()})
+            df_senaryo = senaryo_izgarasi_hesapla(df_grouped, sonuc['toplamlar'], senaryo_params)
+            st.markdown(f"**{len(df_senaryo):,}** senaryo hesaplandı.")
+
+            # Komisyon × kargo yüzeyi; diğer parametreler için seçilen değerler sabitlenir
+            s_col1, s_col2 = st.columns(2)
+            kdv_secim = s_col1.selectbox("Yüzey için KDV Oranı (%)", sorted(df_senaryo['kdv_oran'].unique()), key="senaryo_yuzey_kdv")
+            reklam_secim = s_col2.selectbox(f"Yüzey için {reklam_etiketi}", sorted(df_senaryo[reklam_anahtari].unique()), key="senaryo_yuzey_reklam")
+            df_yuzey = df_senaryo[(df_senaryo['kdv_oran'] == kdv_secim) & (df_senaryo[reklam_anahtari] == reklam_secim)]
+            yuzey = df_yuzey.pivot(index=kargo_anahtari, columns='komisyon_oran', values='Toplam_Kar')
+            with olcum('grafik_senaryo_yuzeyi', satir=yuzey.size):
+                import plotly.express as px
+                fig = px.imshow(yuzey, labels=dict(x="Komisyon (%)", y=kargo_etiketi, color="Toplam Kâr (TL)"),
+                                aspect="auto", color_continuous_scale="RdYlGn", title="Toplam Kâr Yüzeyi")
+                st.plotly_chart(fig, use_container_width=True)
+
+            sayfali_tablo(df_senaryo, "senaryo_tablosu", para_sutunlari(['Toplam_Kar']), siralama_sutunu='Toplam_Kar')
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with st.container():
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.subheader("📐 Model Bazında Duyarlılık")
+        st.caption("Her sütun, ilgili parametrede +1 puan / +1 TL artışın modelin toplam kârına etkisini (TL) gösterir.")
+        df_duyarlilik = model_duyarlilik_tablosu(df_grouped, sonuc['toplamlar'], params)
+        st.dataframe(df_duyarlilik.sort_values('Komisyon_1_Puan'), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
-def render_eksik_maliyet_tab(df_maliyetsiz):
+@st.fragment
+def render_eksik_maliyet_tab(sonuc, revizyon):
+    # Tablodaki düzenlemeler sadece bu sekmeyi yeniden çalıştırır; güncelleme butonu sonucu artımlı günceller
+    df_maliyetsiz = sonuc['df_maliyetsiz']
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📝 Eksik Maliyet Bilgileri")
         eksik_urunler_editor = df_maliyetsiz[['Barkod', 'Model Kodu', 'Alış Fiyatı']].drop_duplicates(subset=['Barkod']).copy()
         edited_eksikler = st.data_editor(eksik_urunler_editor, disabled=["Barkod"], key="eksik_maliyet_editor", use_container_width=True)
+        render_disa_aktarim(eksik_urunler_editor, "eksik_maliyetler", "eksik_maliyet")
+        kaynak = get_cost_source()
+        kalici = st.checkbox(f"Girilen maliyetleri {kaynak.ad} kaynağına da kaydet", key="eksik_maliyet_kalici")
         if st.button("🔄 Girilen Maliyetlerle Analizi Güncelle", key="guncelle_button"):
             if edited_eksikler['Alış Fiyatı'].isna().any() or (edited_eksikler['Model Kodu'].astype(str).str.strip() == '').any():
                 st.error("Lütfen tüm eksik 'Model Kodu' ve 'Alış Fiyatı' alanlarını doldurun.")
             else:
-                yeni_maliyetler = edited_eksikler.dropna()
-                st.session_state.df_maliyet = pd.concat([st.session_state.df_maliyet, yeni_maliyetler], ignore_index=True).drop_duplicates(subset=['Barkod'], keep='last')
+                yeni_maliyetler = maliyet_tablosunu_temizle(edited_eksikler.dropna().copy())
+                params = st.session_state.analiz_params
+                # Analiz baştan çalışmaz: sadece maliyeti girilen satırlar hesaplanıp mevcut toplamlara eklenir
+                yeni_sonuc = karlilik_sonucuna_maliyet_ekle(sonuc, yeni_maliyetler, params)
+                # Artımlı sonucun karşılık geldiği maliyet tablosu: analizdeki tablo + girilen maliyetler
+                beklenen_df = barkodlari_ekle_veya_guncelle(st.session_state.df_maliyet, yeni_maliyetler)
+                ekler = st.session_state.get('maliyet_ekleri')
+                if kalici:
+                    try:
+                        # Tüm yeni maliyetler tek bir kayıt işlemiyle yazılır
+                        df_kaynak, meta, degisiklik = kaynak.ekle_veya_guncelle(yeni_maliyetler.to_dict('records'))
+                    except MaliyetCakismaHatasi as e:
+                        st.error(f"Kaydetme iptal edildi: {e}")
+                        return
+                    except Exception as e:
+                        st.error(f"{kaynak.ad} kaynağına yazılırken bir hata oluştu: {e}")
+                        return
+                    st.session_state.maliyet_anlik_goruntu = (df_kaynak, meta)
+                    if ekler is not None:
+                        # Kaydedilen barkodlar artık kaynaktan gelir
+                        ekler = ekler[~ekler['Barkod'].isin(yeni_maliyetler['Barkod'])]
+                        ekler = ekler if len(ekler) else None
+                else:
+                    # Kaydedilmeyen maliyetler oturumda tutulur; kaynak her yeniden yüklendiğinde üzerine uygulanır
+                    ekler = yeni_maliyetler if ekler is None else barkodlari_ekle_veya_guncelle(ekler, yeni_maliyetler)
+                st.session_state.maliyet_ekleri = ekler
+                # Sonraki çalıştırmada apply_cost_data aynı tabloyu kuracağı için anahtar da onunla hesaplanır
+                df_maliyet = apply_session_costs(st.session_state.maliyet_anlik_goruntu[0])
+                st.session_state.df_maliyet = df_maliyet
+                # Kaynaktan dönen tablo başka değişiklikler de içeriyorsa artımlı sonuç geçerli değildir;
+                # önbelleğe konmaz ve analiz bir kez baştan hesaplanır
+                if maliyet_surumu(df_maliyet) == maliyet_surumu(beklenen_df):
+                    analiz_onbellegi.al(analiz_anahtari(revizyon, df_maliyet, params), lambda: yeni_sonuc)
+                st.session_state.pop("eksik_maliyet_editor", None)  # Satırlar değişti; eski düzenlemeler uygulanmasın
                 st.success("Maliyet referans listesi güncellendi! Analiz yeniden çalıştırılıyor...")
                 st.session_state.analiz_calisti = True
                 st.rerun()
@@ -330,10 +635,11 @@ def render_maliyet_yonetimi():
             yeni_alis = f_col3.number_input("Yeni Ürün Alış Fiyatı (KDV Hariç)", min_value=0.0, format="%.2f")
             
             if st.form_submit_button("Yeni Ürünü Ekle") and yeni_barkod and yeni_model:
-                yeni_veri = pd.DataFrame([{"Model Kodu": yeni_model, "Barkod": yeni_barkod, "Alış Fiyatı": yeni_alis}])
-                # Önce session state'i güncelle
-                st.session_state.df_maliyet = pd.concat([st.session_state.df_maliyet, yeni_veri], ignore_index=True).drop_duplicates(subset=['Barkod'], keep='last')
-                st.success(f"'{yeni_barkod}' barkodlu ürün eklendi. Değişikliklerin kalıcı olması için aşağıdaki butona tıklayarak Google Sheets'e kaydedin.")
+                # Önce session state'i güncelle (indeks sayfadaki satır konumudur, bu yüzden korunur)
+                st.session_state.df_maliyet = barkod_ekle_veya_guncelle(
+                    st.session_state.df_maliyet, {"Model Kodu": yeni_model, "Barkod": yeni_barkod, "Alış Fiyatı": yeni_alis}
+                )
+                st.success(f"'{yeni_barkod}' barkodlu ürün eklendi. Değişikliklerin kalıcı olması için aşağıdaki butona tıklayarak {get_cost_source().ad} kaynağına kaydedin.")
         st.markdown('</div>', unsafe_allow_html=True)
 
     # --- MEVCUT MALİYETLERİ DÜZENLEME KARTI (GÜNCELLENDİ) ---
@@ -349,44 +655,75 @@ def render_maliyet_yonetimi():
             key="maliyet_editor"
         )
 
-        # Buton artık Google Sheets'e kaydedecek
-        if st.button("💾 Değişiklikleri Google Sheets'e Kaydet"):
+        # Buton seçili maliyet kaynağına (Google Sheets ya da yerel veritabanı) kaydeder
+        kaynak_adi = get_cost_source().ad
+        if st.button(f"💾 Değişiklikleri {kaynak_adi} Kaynağına Kaydet"):
             try:
-                # --- GÜNCELLENDİ: Tüm karmaşık blok yerine tek fonksiyon çağrısı ---
-                gc = get_google_creds()
-                
-                # Doğru dosyayı ve sayfayı aç
-                workbook = gc.open("maliyet_referans")
-                worksheet = workbook.worksheet("Sayfa1")
-                
-                # Değiştirilmiş DataFrame'i Google Sheets'e yaz
-                set_with_dataframe(worksheet, edited_df)
-                
-                # Lokal state'i de güncelle
-                st.session_state.df_maliyet = edited_df.copy()
-                
-                st.success("Değişiklikler başarıyla Google Sheets'e kaydedildi!")
-                st.balloons() # Başarıyı kutla!
+                # Sadece değişen/eklenen/silinen satırlar tek bir toplu istekle yazılır
+                degisiklik = save_cost_changes(edited_df)
+
+                if degisiklik_var_mi(degisiklik):
+                    st.success(
+                        f"Değişiklikler başarıyla {kaynak_adi} kaynağına kaydedildi! "
+                        f"({len(degisiklik['guncellenen'])} güncellenen, {len(degisiklik['eklenen'])} eklenen, {len(degisiklik['silinen'])} silinen satır)"
+                    )
+                    st.balloons() # Başarıyı kutla!
+                else:
+                    st.info("Kaydedilecek bir değişiklik bulunamadı.")
 
+            except MaliyetCakismaHatasi as e:
+                st.error(f"Kaydetme iptal edildi: {e}")
             except Exception as e:
-                st.error(f"Google Sheets'e yazılırken bir hata oluştu: {e}")
+                st.error(f"{kaynak_adi} kaynağına yazılırken bir hata oluştu: {e}")
         
         st.markdown('</div>', unsafe_allow_html=True)
 
+    # --- GOOGLE SHEETS'TEN İÇERİ AKTARMA KARTI (sadece yerel veritabanı kullanılırken) ---
+    kaynak = get_cost_source()
+    if isinstance(kaynak, SqliteMaliyetKaynagi):
+        with st.container():
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.subheader("📥 Google Sheets'ten İçeri Aktar")
+            st.caption("Google Sheets maliyet tablosunu yerel veritabanına kopyalar. Veritabanındaki mevcut satırlar silinir.")
+            onay = st.checkbox("Yerel veritabanının üzerine yazılacağını anladım", key="sheets_aktar_onay")
+            if st.button("Sheets'ten Aktar", disabled=not onay):
+                try:
+                    satir = kaynak.sheets_ten_aktar(get_sheets_client)
+                except Exception as e:
+                    st.error(f"Google Sheets'ten aktarılırken bir hata oluştu: {e}")
+                else:
+                    st.success(f"{satir} maliyet satırı yerel veritabanına aktarıldı.")
+                    load_cost_data()
+            st.markdown('</div>', unsafe_allow_html=True)
+
 def render_hedef_analizi():
     st.title("🎯 Aylık Hedef Analizi")
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         hedef_kar = st.number_input("Bu Ayki Net Kâr Hedefiniz (TL)", min_value=0, value=1000000, step=10000)
         st.markdown('</div>', unsafe_allow_html=True)
-    if 'toplam_analiz_kari' not in st.session_state:
+    if 'gunluk_kar' not in st.session_state:
         st.info("Lütfen önce 'Kârlılık Analizi' sayfasından bir analiz yapın."); return
-    gerceklesen_kar = st.session_state.toplam_analiz_kari
+    df_gunluk_kar = st.session_state.gunluk_kar
+    if df_gunluk_kar.empty:
+        st.info("Son analizde maliyeti bilinen satış bulunamadı."); return
+
+    # Hedef, son analizdeki en yeni ayın gerçek günlük kâr serisi üzerinden izlenir
+    son_gun = df_gunluk_kar['Gün'].max()
+    ay_basi = son_gun.replace(day=1)
+    _, aydaki_gun_sayisi = calendar.monthrange(son_gun.year, son_gun.month)
+    gunluk_kar = (
+        df_gunluk_kar[df_gunluk_kar['Gün'] >= ay_basi].set_index('Gün')['Kar']
+        .reindex(pd.date_range(ay_basi, son_gun, freq='D'), fill_value=0.0)
+    )
+    gerceklesen_kar = gunluk_kar.sum()
+    st.caption(f"Son analizdeki {son_gun:%m.%Y} verisi kullanılıyor ({ay_basi:%d.%m} – {son_gun:%d.%m}).")
+
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📈 Hedefe Giden Yol")
         hedefe_ulasma_orani = (gerceklesen_kar / hedef_kar) if hedef_kar > 0 else 0
-        st.progress(max(0.0, hedefe_ulasma_orani), text=f"Hedefin %{hedefe_ulasma_orani:.1%} kadarı tamamlandı")
+        st.progress(min(1.0, max(0.0, hedefe_ulasma_orani)), text=f"Hedefin %{hedefe_ulasma_orani:.1%} kadarı tamamlandı")
         h_col1, h_col2, h_col3 = st.columns(3)
         h_col1.metric("Hedef Kâr", f"{hedef_kar:,.0f} TL")
         h_col2.metric("Gerçekleşen Kâr", f"{gerceklesen_kar:,.0f} TL", delta=f"{gerceklesen_kar - hedef_kar:,.0f} TL")
@@ -396,18 +733,30 @@ def render_hedef_analizi():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("🔮 Gelecek Projeksiyonu")
         today = datetime.now()
-        _, aydaki_gun_sayisi = calendar.monthrange(today.year, today.month)
-        gecen_gun, kalan_gun = today.day, aydaki_gun_sayisi - today.day
+        # İçinde bulunulan ay için bugüne kadar geçen gün, geçmiş bir ay için verideki son gün esas alınır
+        gecen_gun = today.day if (today.year, today.month) == (son_gun.year, son_gun.month) else son_gun.day
+        kalan_gun = aydaki_gun_sayisi - gecen_gun
+        gereken_gunluk_kar = 0
         if gecen_gun > 0:
             gunluk_ortalama_kar = gerceklesen_kar / gecen_gun
-            p_col1, p_col2 = st.columns(2)
+            p_col1, p_col2, p_col3 = st.columns(3)
             p_col1.metric("Günlük Ortalama Kâr", f"{gunluk_ortalama_kar:,.0f} TL/gün")
-            p_col2.metric("Ay Sonu Tahmini Kâr", f"{gunluk_ortalama_kar * aydaki_gun_sayisi:,.0f} TL")
+            p_col2.metric("Son 7 Gün Ortalaması", f"{gunluk_kar.tail(7).mean():,.0f} TL/gün")
+            p_col3.metric("Ay Sonu Tahmini Kâr", f"{gunluk_ortalama_kar * aydaki_gun_sayisi:,.0f} TL")
             if kalan_gun > 0:
                 gereken_gunluk_kar = (hedef_kar - gerceklesen_kar) / kalan_gun if (hedef_kar - gerceklesen_kar) > 0 else 0
                 st.metric("Hedefe Ulaşmak İçin Gereken Günlük Kâr", f"{gereken_gunluk_kar:,.0f} TL/gün")
                 if gunluk_ortalama_kar > 0:
                     st.info(f"Hedefe ulaşmak için günlük kârınızı **%{((gereken_gunluk_kar / gunluk_ortalama_kar) - 1) * 100 if gereken_gunluk_kar > 0 else -100:.1f}** artırmanız gerekmektedir.")
+
+        with olcum('grafik_gunluk_kar', satir=len(gunluk_kar)):
+            import plotly.express as px
+            fig = px.bar(gunluk_kar.rename_axis('Gün').reset_index(name='Kar'), x='Gün', y='Kar', title='Günlük Net Kâr',
+                         color_discrete_sequence=px.colors.sequential.Peach[-2:])
+            if gereken_gunluk_kar > 0:
+                fig.add_hline(y=gereken_gunluk_kar, line_dash='dash', annotation_text='Gereken günlük kâr')
+            fig.update_layout(xaxis_title=None, yaxis_title='TL')
+            st.plotly_chart(fig, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
 # --- ESKİ SATIŞ FİYATI HESAPLAYICI FONKSİYONU SİLİNDİ ---
@@ -437,69 +786,34 @@ def render_toptan_fiyat_teklifi():
             urun_kdv_orani = st.number_input("Ürün Satış KDV Oranı (%)", min_value=0.0, value=10.0, step=1.0, key="toptan_kdv")
 
         with col2:
-            hedef_tipi = st.selectbox("Hedef Türü", ["% Kâr Marjı", "Net Kâr Tutarı (TL)"], key="toptan_hedef_tipi")
-            if hedef_tipi == "% Kâr Marjı":
+            hedef_tipi = st.selectbox("Hedef Türü", [HEDEF_KAR_MARJI, HEDEF_NET_KAR], key="toptan_hedef_tipi")
+            if hedef_tipi == HEDEF_KAR_MARJI:
                 hedef_deger = st.number_input("Hedef Kâr Marjı (%)", min_value=0.0, max_value=99.9, value=25.0, step=0.5, key="toptan_hedef_deger_marj")
             else:
                 hedef_deger = st.number_input("Hedef Net Kâr (TL)", min_value=0.0, value=100.0, step=1.0, key="toptan_hedef_deger_tutar")
 
         if st.button("Fiyat Listesini Oluştur", type="primary", use_container_width=True):
-            # --- DÜZELTME: Sadece benzersiz model kodları ile çalış ---
-            df_hesaplama = df_maliyet.drop_duplicates(subset=['Model Kodu']).copy()
-
-            kdv_carpan = urun_kdv_orani / 100
-            kdv_bolen = 1 + kdv_carpan
-            
-            alis_fiyati_kdvsiz = df_hesaplama['Alış Fiyatı']
-            alis_kdv_tutari = alis_fiyati_kdvsiz * kdv_carpan
-            
-            if hedef_tipi == "% Kâr Marjı":
-                hedef_kar_marji = hedef_deger / 100
-                pay = alis_fiyati_kdvsiz - alis_kdv_tutari
-                payda = 1 - hedef_kar_marji - (kdv_bolen * (komisyon_orani/100)) - kdv_carpan
-            else: # Hedef Net Kâr (TL)
-                hedef_net_kar = hedef_deger
-                pay = alis_fiyati_kdvsiz - alis_kdv_tutari + hedef_net_kar
-                payda = 1 - (kdv_bolen * (komisyon_orani / 100)) - kdv_carpan
-
-            if payda <= 0:
-                st.error("Bu hedefe ulaşılamıyor. Lütfen komisyon veya kâr hedefini düşürün.")
-            else:
-                satis_fiyati_kdvsiz = pay / payda
-                satis_fiyati_kdvli = satis_fiyati_kdvsiz * kdv_bolen
-                
-                # --- DÜZELTME: İstenen sütunlarla yeni bir sonuç DataFrame'i oluştur ---
-                df_sonuc = pd.DataFrame({
-                    'Model Kodu': df_hesaplama['Model Kodu'],
-                    'Alış Fiyatı (KDV Hariç)': df_hesaplama['Alış Fiyatı'],
-                    'Satış Fiyatı (KDV Hariç)': satis_fiyati_kdvsiz,
-                    'Satış Fiyatı (KDV Dahil)': satis_fiyati_kdvli
-                })
-
-                kar_sonuclari = df_sonuc.apply(
-                    lambda row: kar_hesapla(
-                        row['Satış Fiyatı (KDV Dahil)'], 
-                        row['Alış Fiyatı (KDV Hariç)'], 
-                        komisyon_orani, urun_kdv_orani, 0, 0
-                    ), axis=1, result_type='expand'
-                )
-                kar_sonuclari.columns = ['Net Kar', 'Kar Marjı', 'Toplam Maliyet']
-                
-                df_sonuc = pd.concat([df_sonuc, kar_sonuclari[['Net Kar', 'Kar Marjı']]], axis=1)
-
-                st.subheader("Oluşturulan Fiyat Listesi")
-                st.dataframe(
-                    df_sonuc.style.format({
-                        'Alış Fiyatı (KDV Hariç)': '{:,.2f} TL',
-                        'Satış Fiyatı (KDV Hariç)': '{:,.2f} TL',
-                        'Satış Fiyatı (KDV Dahil)': '{:,.2f} TL',
-                        'Net Kar': '{:,.2f} TL',
-                        'Kar Marjı': '{:.2f}%'
-                    }),
-                    use_container_width=True
-                )
+            try:
+                # Fiyatlar ve kâr sonuçları satır satır değil, tüm sütun üzerinden tek seferde hesaplanır
+                st.session_state.toptan_fiyat_listesi = toptan_fiyat_listesi_hesapla(df_maliyet, komisyon_orani, urun_kdv_orani, hedef_tipi, hedef_deger)
+            except ValueError as e:
+                st.error(str(e))
+                st.session_state.pop('toptan_fiyat_listesi', None)
+
+        # Liste oturumda tutulur; sıralama ve sayfa değiştirmek listeyi yeniden hesaplatmaz
+        if 'toptan_fiyat_listesi' in st.session_state:
+            render_fiyat_listesi()
         st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+def render_fiyat_listesi():
+    """Oluşturulan fiyat listesi; sıralama ve sayfa değişiklikleri sadece bu bölümü yeniden çalıştırır."""
+    st.subheader("Oluşturulan Fiyat Listesi")
+    column_config = para_sutunlari(['Alış Fiyatı (KDV Hariç)', 'Satış Fiyatı (KDV Hariç)', 'Satış Fiyatı (KDV Dahil)', 'Net Kar'])
+    column_config['Kar Marjı'] = st.column_config.NumberColumn(format="%.2f%%")
+    sayfali_tablo(st.session_state.toptan_fiyat_listesi, "toptan_listesi", column_config, siralama_sutunu='Satış Fiyatı (KDV Dahil)')
+    render_disa_aktarim(st.session_state.toptan_fiyat_listesi, "toptan_fiyat_listesi", "toptan_listesi")
+
 # --- YENİ: KAMPANYA FİYATI HESAPLAMA MODÜLÜ ---
 def render_kampanya_fiyati():
     st.title("🏷️ Kampanya Fiyatı Kârlılık Hesaplayıcı")
@@ -516,40 +830,48 @@ def render_kampanya_fiyati():
     search_term = st.text_input("Aramak için Model Kodu veya Barkod girin", key="kampanya_search_term")
 
     if search_term:
-        results = df_maliyet[
-            df_maliyet['Model Kodu'].str.contains(search_term, case=False, na=False) |
-            df_maliyet['Barkod'].str.contains(search_term, case=False, na=False)
-        ]
-
-        if not results.empty:
-            # --- DÜZELTME: Arama sonuçları Model Kodu'na göre tekilleştirildi ---
-            unique_model_codes = results['Model Kodu'].unique()
+        # Tam bir barkod girildiyse ürün doğrudan kaynağın barkod indeksinden bulunur
+        urun = get_cost_source().barkod_bul(search_term)
+        if urun is not None:
+            st.session_state.selected_product_kampanya = urun
+            st.success(f"Ürün bulundu ve seçildi: **{urun['Model Kodu']}**")
+        else:
+            # Arama, maliyet verisinin her sürümü için bir kez kurulan indeks üzerinden yapılır
+            arama_indeksi = get_search_index(df_maliyet)
+            results = df_maliyet.iloc[arama_indeksi.ara(search_term)]
+
+            if not results.empty:
+                # --- DÜZELTME: Arama sonuçları Model Kodu'na göre tekilleştirildi ---
+                # Sonuçlar eşleşme kalitesine göre sıralı geldiği için öneri listesi de sıralıdır
+                unique_model_codes = results['Model Kodu'].unique()[:KAMPANYA_ONERI_LIMITI]
             
-            if len(unique_model_codes) == 1:
-                # Tek bir model kodu bulunduysa, ilk varyantı otomatik seç
-                st.session_state.selected_product_kampanya = results.iloc[0]
-                st.success(f"Ürün bulundu ve seçildi: **{st.session_state.selected_product_kampanya['Model Kodu']}**")
+                if len(unique_model_codes) == 1:
+                    # Tek bir model kodu bulunduysa, ilk varyantı otomatik seç
+                    st.session_state.selected_product_kampanya = results.iloc[0]
+                    st.success(f"Ürün bulundu ve seçildi: **{st.session_state.selected_product_kampanya['Model Kodu']}**")
+                else:
+                    # Birden fazla model kodu varsa, kullanıcıya seçtir
+                    secim = st.selectbox(
+                        "Birden fazla model bulundu, lütfen birini seçin:",
+                        options=unique_model_codes,
+                        index=None,
+                        placeholder="Bir model kodu seçin...",
+                        key="kampanya_product_select"
+                    )
+                    if secim:
+                        # Seçilen model kodunun ilk varyantını al
+                        st.session_state.selected_product_kampanya = results[results['Model Kodu'] == secim].iloc[0]
             else:
-                # Birden fazla model kodu varsa, kullanıcıya seçtir
-                secim = st.selectbox(
-                    "Birden fazla model bulundu, lütfen birini seçin:",
-                    options=unique_model_codes,
-                    index=None,
-                    placeholder="Bir model kodu seçin...",
-                    key="kampanya_product_select"
-                )
-                if secim:
-                    # Seçilen model kodunun ilk varyantını al
-                    st.session_state.selected_product_kampanya = results[results['Model Kodu'] == secim].iloc[0]
-        else:
-            st.warning("Bu arama kriterine uygun ürün bulunamadı.")
-            if 'selected_product_kampanya' in st.session_state:
-                del st.session_state['selected_product_kampanya']
+                st.warning("Bu arama kriterine uygun ürün bulunamadı.")
+                if 'selected_product_kampanya' in st.session_state:
+                    del st.session_state['selected_product_kampanya']
 
     st.markdown('</div>', unsafe_allow_html=True)
 
     # Seçilen ürün varsa hesaplama formunu göster
-    if 'selected_product_kampanya' in st.session_state:
+    if 'selected_product_kampanya' in st.session_state and pd.isna(st.session_state.selected_product_kampanya['Alış Fiyatı']):
+        st.warning(f"**{st.session_state.selected_product_kampanya['Model Kodu']}** için alış fiyatı girilmemiş. Lütfen önce 'Maliyet Yönetimi' sayfasından ekleyin.")
+    elif 'selected_product_kampanya' in st.session_state:
         urun = st.session_state.selected_product_kampanya
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader(f"Hesaplama: {urun['Model Kodu']}")
@@ -696,10 +1018,16 @@ def render_yeni_urun_sihirbazi():
 
         st.markdown('</div>', unsafe_allow_html=True)
 
+@st.cache_data
+def read_config(yol, degistirilme_zamani):
+    # Dosya her yeniden çalıştırmada ayrıştırılmaz; değiştirilme zamanı değişince yeniden okunur.
+    # cache_data her çağrıda kopya döndürür; kimlik doğrulayıcının yaptığı değişiklikler önbelleğe yansımaz
+    with open(yol) as file:
+        return yaml.load(file, Loader=SafeLoader)
+
 # --- KULLANICI GİRİŞİ ---
 # config.yaml dosyasını oku (Streamlit Cloud'da kök dizinde olmalı)
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
+config = read_config('config.yaml', os.path.getmtime('config.yaml'))
 
 # Kimlik doğrulayıcıyı oluştur
 authenticator = stauth.Authenticate(
@@ -716,6 +1044,7 @@ authenticator.login(location='main')
 # 2. Giriş durumunu st.session_state üzerinden kontrol et.
 if st.session_state["authentication_status"]:
     # --- ANA UYGULAMA AKIŞI ---
+    zamanlama.calistirma_baslat(st.session_state.get("username"))
     with st.sidebar:
         # Logo ve diğer bileşenler buraya gelecek
         try:
@@ -728,6 +1057,14 @@ if st.session_state["authentication_status"]:
         authenticator.logout('Çıkış Yap', 'main')
         st.markdown("---")
 
+        onbellek = paylasimli_onbellek.kullanim()
+        analiz = analiz_onbellegi.kullanim()
+        st.caption(
+            f"Paylaşılan veri önbelleği: {onbellek['kullanilan_mb']:.0f} / {onbellek['maks_mb']:.0f} MB "
+            f"({onbellek['kayit_sayisi']} veri seti) · Analiz önbelleği: {analiz['kayit_sayisi']} sonuç, "
+            f"{analiz['isabet']} isabet"
+        )
+
         # Sihirbazlar bölümü
         st.subheader("Sihirbazlar")
         app_mode = st.selectbox(
@@ -745,7 +1082,12 @@ if st.session_state["authentication_status"]:
         "🧙‍♂️ Yeni Ürün Sihirbazı": render_yeni_urun_sihirbazi,
         "🏷️ Kampanya Fiyatı": render_kampanya_fiyati
     }
-    page_map[app_mode]()
+    with olcum(f"sayfa:{app_mode}"):
+        page_map[app_mode]()
+
+    # Sadece yöneticilere ve zamanlama açıkken gösterilir
+    if zamanlama.ETKIN and st.session_state.get("username") in config.get('yoneticiler', []):
+        render_performans_paneli()
 
 elif st.session_state["authentication_status"] is False:
     st.error('Kullanıcı adı/şifre yanlış')
@@ -832,14 +1174,11 @@ def yeni_urun_sihirbazi():
                 }])
                 
                 # Güncel maliyet verileriyle birleştir
-                st.session_state.df_maliyet = pd.concat([st.session_state.df_maliyet, yeni_urun], ignore_index=True).drop_duplicates(subset=['Barkod'], keep='last')
+                st.session_state.df_maliyet = barkod_ekle_veya_guncelle(st.session_state.df_maliyet, yeni_urun.iloc[0].to_dict())
                 
-                # Google Sheets'e kaydet
+                # Google Sheets'e kaydet (sadece yeni satır gönderilir)
                 try:
-                    gc = get_google_creds()
-                    workbook = gc.open("maliyet_referans")
-                    worksheet = workbook.worksheet("Sayfa1")
-                    set_with_dataframe(worksheet, st.session_state.df_maliyet, reindex=True)
+                    save_cost_changes(st.session_state.df_maliyet)
                     st.success("Yeni ürün başarıyla kaydedildi ve Google Sheets'e aktarıldı.")
                 except Exception as e:
                     st.error(f"Google Sheets'e kaydedilirken hata oluştu: {e}")
@@ -0,0 +1,89 @@
+"""Maliyet tablosundaki model kodları ve barkodlar için arama indeksi.
+
+İndeks maliyet verisinin her sürümü için bir kez kurulur. Önek aramaları
+sıralı anahtar dizisi üzerinde ikili arama ile, alt dize aramaları ise
+üçlü harf (trigram) ters indeksi ile yapılır; her tuşta tüm tabloyu regex ile
+taramak gerekmez. Sonuçlar eşleşme kalitesine göre sıralanır.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+NGRAM = 3
+
+# Sıralama: tam eşleşme, önek eşleşmesi, alt dize eşleşmesi
+TAM, ONEK, ALT_DIZE = 0, 1, 2
+
+
+class AramaIndeksi:
+    """Model kodu ve barkod üzerinde önek/alt dize araması yapan indeks."""
+
+    def __init__(self, df_maliyet):
+        # Boş hücreler boş anahtar olur; hiçbir sorguyla eşleşmez
+        model = df_maliyet['Model Kodu'].fillna('').astype(str).str.strip().str.lower().to_numpy(dtype=object)
+        barkod = df_maliyet['Barkod'].fillna('').astype(str).str.strip().str.lower().to_numpy(dtype=object)
+        satir = np.arange(len(df_maliyet))
+
+        # Her maliyet satırı iki anahtarla (model kodu ve barkod) aranabilir
+        self.anahtarlar = np.concatenate([model, barkod]).astype(object)
+        self.satirlar = np.concatenate([satir, satir])
+
+        sira = np.argsort(self.anahtarlar, kind='stable')
+        self._sirali_anahtarlar = self.anahtarlar[sira].astype(str)
+        self._sirali_konum = sira
+
+        gecici = defaultdict(set)
+        for konum, anahtar in enumerate(self.anahtarlar):
+            for i in range(len(anahtar) - NGRAM + 1):
+                gecici[anahtar[i:i + NGRAM]].add(konum)
+        self._ngramlar = {ng: np.fromiter(sorted(k), dtype=np.int64, count=len(k)) for ng, k in gecici.items()}
+
+    def _onek_konumlari(self, sorgu):
+        bas = np.searchsorted(self._sirali_anahtarlar, sorgu, side='left')
+        son = np.searchsorted(self._sirali_anahtarlar, sorgu + '\uffff', side='left')
+        return self._sirali_konum[bas:son]
+
+    def _alt_dize_konumlari(self, sorgu):
+        if len(sorgu) < NGRAM:
+            # N-gramdan kısa sorgular sadece önek olarak (ikili arama ile) eşleştirilir
+            return self._onek_konumlari(sorgu)
+        listeler = []
+        for i in range(len(sorgu) - NGRAM + 1):
+            liste = self._ngramlar.get(sorgu[i:i + NGRAM])
+            if liste is None:
+                return np.empty(0, dtype=np.int64)
+            listeler.append(liste)
+        listeler.sort(key=len)
+        adaylar = listeler[0]
+        for liste in listeler[1:]:
+            adaylar = np.intersect1d(adaylar, liste, assume_unique=True)
+            if not len(adaylar):
+                return adaylar
+        # N-gramların hepsinin geçmesi yeterli değildir; adaylar gerçekten doğrulanır
+        return np.array([k for k in adaylar if sorgu in self.anahtarlar[k]], dtype=np.int64)
+
+    def ara(self, sorgu, limit=None):
+        """Sorguyla eşleşen maliyet satırlarının konumlarını sıralı döndürür.
+
+        Üç karakterden kısa sorgular önek, diğerleri alt dize olarak aranır.
+        Sıralama: önce tam eşleşme, sonra önek, sonra alt dize eşleşmesi;
+        aynı gruptakiler eşleşme konumu, anahtar uzunluğu ve alfabetik sıraya
+        göre dizilir. Her satır bir kez döner.
+        """
+        sorgu = str(sorgu).strip().lower()
+        if not sorgu:
+            return np.empty(0, dtype=np.int64)
+
+        konumlar = self._alt_dize_konumlari(sorgu)
+        if not len(konumlar):
+            return konumlar
+        anahtarlar = self.anahtarlar[konumlar]
+        baslangic = np.array([a.find(sorgu) for a in anahtarlar])
+        uzunluk = np.array([len(a) for a in anahtarlar])
+        derece = np.where(uzunluk == len(sorgu), TAM, np.where(baslangic == 0, ONEK, ALT_DIZE))
+
+        sira = np.lexsort((anahtarlar.astype(str), uzunluk, baslangic, derece))
+        satirlar = self.satirlar[konumlar[sira]]
+        _, ilk = np.unique(satirlar, return_index=True)
+        satirlar = satirlar[np.sort(ilk)]
+        return satirlar[:limit] if limit else satirlar
@@ -0,0 +1,265 @@
+"""Sıcak yollar için ölçüm (benchmark) betiği.
+
+Gerçekçi sentetik Pixa sipariş dökümü ve `maliyet_referans` tablosu üretir,
+analizin her aşamasını ayrı ayrı ölçer ve sonuçları sürümler arasında
+karşılaştırılabilecek bir JSON dosyasına yazar. İnternet bağlantısı gerekmez.
+
+Kullanım:
+    python benchmark.py                              # 10k, 100k, 1M satır
+    python benchmark.py --boyutlar 10000 100000 --tekrar 5
+    python benchmark.py --karsilastir benchmark_sonuclari/onceki.json
+
+Karşılaştırmada bir aşama eşikten (varsayılan %20) fazla yavaşladıysa çıkış kodu 1 olur.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from karlilik_motoru import (
+    HEDEF_KAR_MARJI, MODEL_TABLOSU_SUTUNLARI, MaliyetIndeksi, barkod_anahtari,
+    karlilik_analizi_hesapla, karlilik_analizi_ozetten_hesapla, tablo_sayfasi, toptan_fiyat_listesi_hesapla
+)
+from siparis_deposu import gunluk_ozet_olustur
+from siparis_onbellegi import siparis_excel_ayristir
+
+VARSAYILAN_BOYUTLAR = [10_000, 100_000, 1_000_000]
+SONUC_DIZINI = "benchmark_sonuclari"
+# Üretilen Excel dosyaları yavaş oluşturulduğu için tekrar kullanılır
+VERI_DIZINI = os.path.join(".onbellek", "benchmark")
+
+PLATFORMLAR = ['Trendyol', 'Hepsiburada', 'Amazon', 'N11', 'Shopify']
+PLATFORM_AGIRLIKLARI = [0.55, 0.2, 0.1, 0.1, 0.05]
+VARYANT_SAYISI = 4  # Model başına barkod (beden/renk) sayısı
+MALIYETSIZ_ORAN = 0.08  # Maliyet tablosunda bulunmayan barkodların oranı
+
+ANALIZ_PARAMETRELERI = {
+    "komisyon_oran": 21.5, "kdv_oran": 10.0,
+    "toplam_kargo_faturasi": 0.0, "kargo_maliyeti_siparis_basi": 80.0,
+    "toplam_reklam_butcesi": 25000.0, "reklam_gideri_urun_basi": 0.0,
+    "satis_fiyati_sutunu": 'Tutar'
+}
+
+
+# ==============================================================================
+# SENTETİK VERİ
+# ==============================================================================
+
+def maliyet_tablosu_uret(satir_sayisi, seed=0):
+    """`maliyet_referans` biçiminde (Model Kodu, Barkod, Alış Fiyatı) sentetik maliyet tablosu üretir."""
+    rng = np.random.default_rng(seed)
+    barkodlar = 8680000000000 + np.arange(satir_sayisi)
+    model_no = np.arange(satir_sayisi) // VARYANT_SAYISI
+    model_fiyati = rng.uniform(50, 600, model_no.max() + 1).round(2)
+    df = pd.DataFrame({
+        'Model Kodu': pd.Series(model_no).map('SD-{:06d}'.format),
+        # Sheets'ten gelen barkodlar karışık tiplidir: sayı, metin, ".0" sonekli metin
+        'Barkod': _karisik_barkodlar(barkodlar, rng),
+        'Alış Fiyatı': model_fiyati[model_no],
+    })
+    return df
+
+
+def siparis_dokumu_uret(satir_sayisi, maliyet_satir_sayisi, seed=0):
+    """Pixa sipariş dökümü biçiminde sentetik sipariş satırları üretir.
+
+    Siparişler birden çok satır içerir, birkaç platforma dağılır ve
+    barkodların bir kısmı maliyet tablosunda bulunmaz.
+    """
+    rng = np.random.default_rng(seed + 1)
+    # Sipariş başına ortalama ~1.6 satır
+    siparis = np.sort(rng.integers(0, max(1, int(satir_sayisi / 1.6)), satir_sayisi))
+    siparis_sayisi = siparis.max() + 1
+    # Popüler ürünler daha sık satılır
+    urun = np.minimum((rng.pareto(1.2, satir_sayisi) * maliyet_satir_sayisi / 20).astype(np.int64), maliyet_satir_sayisi - 1)
+    barkodlar = 8680000000000 + urun
+    maliyetsiz = rng.random(satir_sayisi) < MALIYETSIZ_ORAN
+    barkodlar[maliyetsiz] = 8690000000000 + rng.integers(0, maliyet_satir_sayisi, maliyetsiz.sum())
+
+    siparis_platformu = rng.choice(PLATFORMLAR, siparis_sayisi, p=PLATFORM_AGIRLIKLARI)
+    siparis_zamani = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, siparis_sayisi), unit='s')
+    return pd.DataFrame({
+        'Sipariş No': siparis + 100_000_000,
+        'Sipariş Tarihi': siparis_zamani[siparis],
+        'Platform': siparis_platformu[siparis],
+        'Barkod': _karisik_barkodlar(barkodlar, rng),
+        'Ürün Adı': 'Ürün',
+        'Miktar': rng.choice([1, 1, 1, 1, 2, 2, 3], satir_sayisi),
+        'Tutar': rng.uniform(150, 1500, satir_sayisi).round(2),
+        'Kargo Firması': rng.choice(['Yurtiçi', 'Aras', 'MNG'], satir_sayisi),
+    })
+
+
+def _karisik_barkodlar(barkodlar, rng):
+    tip = rng.integers(0, 3, len(barkodlar))
+    sonuc = barkodlar.astype(object)
+    sonuc[tip == 1] = barkodlar[tip == 1].astype(str).astype(object)
+    sonuc[tip == 2] = np.char.add(barkodlar[tip == 2].astype(str), '.0').astype(object)
+    return sonuc
+
+
+def siparis_excel_baytlari(df_siparis, satir_sayisi, seed):
+    """Sipariş dökümünü Excel baytlarına çevirir; aynı boyut/seed için diskteki dosyayı kullanır."""
+    yol = os.path.join(VERI_DIZINI, f"pixa-{satir_sayisi}-{seed}.xlsx")
+    if not os.path.exists(yol):
+        os.makedirs(VERI_DIZINI, exist_ok=True)
+        gecici_yol = f"{yol}.{os.getpid()}.tmp.xlsx"
+        df_siparis.to_excel(gecici_yol, index=False, engine="openpyxl")
+        os.replace(gecici_yol, yol)
+    with open(yol, "rb") as f:
+        return f.read()
+
+
+# ==============================================================================
+# ÖLÇÜM
+# ==============================================================================
+
+def tablo_bicimlendir(df_grouped):
+    """Kârlılık sayfasındaki model tablosunun sunucu tarafı işi: kâra göre sıralanan ilk sayfa.
+
+    Biçimlendirme tarayıcıda sütun ayarlarıyla yapıldığı için burada ölçülmez.
+    """
+    df_sayfa, _ = tablo_sayfasi(df_grouped[MODEL_TABLOSU_SUTUNLARI], 'Toplam_Kar')
+    return df_sayfa
+
+
+def olc(fonksiyon, tekrar):
+    """Fonksiyonu `tekrar` kez çalıştırır; (süreler, son sonuç) döndürür."""
+    sureler = []
+    sonuc = None
+    for _ in range(tekrar):
+        baslangic = time.perf_counter()
+        sonuc = fonksiyon()
+        sureler.append(time.perf_counter() - baslangic)
+    return sureler, sonuc
+
+
+def boyut_olc(satir_sayisi, tekrar, seed, excel=True):
+    """Bir veri boyutu için her aşamanın sürelerini {aşama: {...}} olarak döndürür."""
+    df_maliyet = maliyet_tablosu_uret(satir_sayisi, seed)
+    df_ham = siparis_dokumu_uret(satir_sayisi, len(df_maliyet), seed)
+    asamalar = {}
+
+    def kaydet(ad, sureler):
+        asamalar[ad] = {
+            'medyan_sn': statistics.median(sureler),
+            'min_sn': min(sureler),
+            'tekrar': len(sureler),
+        }
+        print(f"  {ad:<24} {statistics.median(sureler) * 1000:10.1f} ms", flush=True)
+
+    if excel:
+        veri = siparis_excel_baytlari(df_ham, satir_sayisi, seed)
+        sureler, (df_siparis, _) = olc(lambda: siparis_excel_ayristir(veri), tekrar)
+        kaydet('excel_ayristirma', sureler)
+    else:
+        df_siparis = df_ham.assign(Barkod=barkod_anahtari(df_ham['Barkod']))
+
+    sureler, _ = olc(lambda: barkod_anahtari(df_ham['Barkod']), tekrar)
+    kaydet('barkod_normalizasyonu', sureler)
+
+    sureler, indeks = olc(lambda: MaliyetIndeksi(df_maliyet), tekrar)
+    kaydet('maliyet_indeksi', sureler)
+    sureler, _ = olc(lambda: indeks.konumlar(df_siparis['Barkod']), tekrar)
+    kaydet('eslestirme', sureler)
+
+    # Model bazında toplama dahil tüm analiz (maliyet indeksi önbellekten gelir)
+    sureler, sonuc = olc(lambda: karlilik_analizi_hesapla(df_siparis, df_maliyet, ANALIZ_PARAMETRELERI), tekrar)
+    kaydet('model_toplama', sureler)
+
+    # Depoya eklemede bir kez yapılan günlük özetleme ve özetler üzerinden etkileşimli analiz
+    sureler, (df_gunluk, df_siparis_sayisi) = olc(lambda: gunluk_ozet_olustur(df_siparis), tekrar)
+    kaydet('gunluk_ozet_olusturma', sureler)
+    sureler, _ = olc(lambda: karlilik_analizi_ozetten_hesapla(df_gunluk, df_siparis_sayisi, df_maliyet, ANALIZ_PARAMETRELERI), tekrar)
+    kaydet('ozetten_analiz', sureler)
+
+    sureler, _ = olc(lambda: toptan_fiyat_listesi_hesapla(df_maliyet, 21.5, 10.0, HEDEF_KAR_MARJI, 25.0), tekrar)
+    kaydet('toptan_fiyat_listesi', sureler)
+
+    sureler, _ = olc(lambda: tablo_bicimlendir(sonuc['df_grouped']), tekrar)
+    kaydet('tablo_bicimlendirme', sureler)
+    return asamalar
+
+
+def ortam_bilgisi():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'zaman': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'makine': platform.machine(),
+        'isletim_sistemi': platform.platform(),
+    }
+
+
+def karsilastir(onceki, simdiki, esik):
+    """İki sonuç dosyasını karşılaştırıp tabloyu yazdırır; eşiği aşan gerilemeleri döndürür."""
+    gerilemeler = []
+    print(f"\nKarşılaştırma: {onceki['ortam'].get('commit')} -> {simdiki['ortam'].get('commit')}")
+    for boyut, asamalar in simdiki['sonuclar'].items():
+        onceki_asamalar = onceki['sonuclar'].get(boyut, {})
+        for ad, olcum in asamalar.items():
+            if ad not in onceki_asamalar:
+                continue
+            eski = onceki_asamalar[ad]['medyan_sn']
+            yeni = olcum['medyan_sn']
+            oran = yeni / eski if eski > 0 else float('inf')
+            # Birkaç milisaniyelik farklar ölçüm gürültüsüdür
+            geriledi = oran > 1 + esik and yeni - eski > 0.005
+            isaret = "  << GERİLEME" if geriledi else ""
+            print(f"  {boyut:>9} {ad:<24} {eski * 1000:10.1f} ms -> {yeni * 1000:10.1f} ms  x{oran:5.2f}{isaret}")
+            if geriledi:
+                gerilemeler.append((boyut, ad, oran))
+    return gerilemeler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stil Diva panelinin sıcak yolları için ölçüm betiği")
+    parser.add_argument("--boyutlar", type=int, nargs="+", default=VARSAYILAN_BOYUTLAR, help="Sipariş/maliyet satır sayıları")
+    parser.add_argument("--tekrar", type=int, default=3, help="Her aşamanın kaç kez çalıştırılacağı")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--excel-atla", action="store_true", help="Excel üretme/ayrıştırma aşamasını atla")
+    parser.add_argument("--cikti", help="Sonuç JSON dosyası (varsayılan: benchmark_sonuclari/<zaman>-<commit>.json)")
+    parser.add_argument("--karsilastir", help="Karşılaştırılacak önceki sonuç JSON dosyası")
+    parser.add_argument("--esik", type=float, default=0.2, help="Gerileme sayılacak göreli yavaşlama (0.2 = %%20)")
+    args = parser.parse_args(argv)
+
+    sonuc = {'ortam': ortam_bilgisi(), 'sonuclar': {}}
+    for boyut in args.boyutlar:
+        print(f"{boyut:,} satır", flush=True)
+        sonuc['sonuclar'][str(boyut)] = boyut_olc(boyut, args.tekrar, args.seed, excel=not args.excel_atla)
+
+    cikti = args.cikti
+    if not cikti:
+        os.makedirs(SONUC_DIZINI, exist_ok=True)
+        zaman = datetime.now().strftime("%Y%m%d-%H%M%S")
+        cikti = os.path.join(SONUC_DIZINI, f"{zaman}-{sonuc['ortam']['commit'] or 'yerel'}.json")
+    with open(cikti, "w", encoding="utf-8") as f:
+        json.dump(sonuc, f, ensure_ascii=False, indent=2)
+    print(f"\nSonuçlar kaydedildi: {cikti}")
+
+    if args.karsilastir:
+        with open(args.karsilastir, encoding="utf-8") as f:
+            onceki = json.load(f)
+        if karsilastir(onceki, sonuc, args.esik):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
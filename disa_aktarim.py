@@ -0,0 +1,159 @@
+"""Tabloları parça parça CSV/XLSX dosyasına yazan dışa aktarım yardımcıları.
+
+Tablo bellekte kopyalanmaz ya da tek seferde metne çevrilmez; satırlar
+sabit boyutlu parçalar halinde yazılır. XLSX çalışma sayfası XML'i her
+parça için sütun bazında (vektörel) üretilip sıkıştırılmış pakete akış
+halinde yazılır; bellekte hücre nesneleri ya da çalışma sayfası modeli
+kurulmaz. Çıktı, boyutu küçükse bellekte, büyükse geçici dosyada tutulur.
+"""
+import hashlib
+import io
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from zamanlama import olcum
+
+PARCA_SATIR = 10_000
+# Bu boyuttan büyük çıktılar bellek yerine geçici dosyada biriktirilir
+BELLEK_SINIRI = 16 * 1024 * 1024
+
+BICIMLER = {
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('csv', 'text/csv'),
+}
+
+
+def _parcalar(df, sutunlar):
+    konumlar = [df.columns.get_loc(c) for c in sutunlar]
+    for bas in range(0, len(df), PARCA_SATIR):
+        yield df.iloc[bas:bas + PARCA_SATIR, konumlar]
+
+
+def csv_yaz(df, hedef, sutunlar=None):
+    """Tabloyu ikili (binary) `hedef` dosyasına UTF-8 (Excel için BOM'lu) CSV olarak yazar."""
+    sutunlar = list(df.columns) if sutunlar is None else sutunlar
+    metin = io.TextIOWrapper(hedef, encoding='utf-8-sig', newline='', write_through=True)
+    try:
+        pd.DataFrame(columns=sutunlar).to_csv(metin, index=False)
+        for parca in _parcalar(df, sutunlar):
+            parca.to_csv(metin, index=False, header=False)
+        metin.flush()
+    finally:
+        metin.detach()  # Hedef dosya açık kalsın
+
+
+# --- XLSX paketi (SpreadsheetML) ---
+_ANA_AD_ALANI = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_ILISKI_AD_ALANI = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_XML_BASLIGI = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_SABIT_DOSYALAR = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Stil 1: binlik ayraçlı iki ondalık (#,##0.00), stil 2: tarih-saat
+    'xl/styles.xml': (
+        f'<styleSheet {_ANA_AD_ALANI}>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+# Excel tarih seri numarasının başlangıcı
+_EXCEL_SIFIR_GUNU = pd.Timestamp('1899-12-30')
+# XML 1.0'da geçersiz kontrol karakterleri
+_GECERSIZ_KARAKTERLER = r'[\x00-\x08\x0b\x0c\x0e-\x1f]'
+
+
+def _xml_kacis(metin):
+    return (metin.str.replace('&', '&amp;', regex=False).str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False).str.replace(_GECERSIZ_KARAKTERLER, '', regex=True))
+
+
+def _sutun_hucreleri(seri):
+    """Bir sütun parçasının hücre XML'lerini dizi olarak üretir; boş ve sonsuz değerler boş hücre olur."""
+    bos = seri.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(seri.dtype):
+        hucre = '<c t="b"><v>' + seri.astype(int).astype(str) + '</v></c>'
+    elif pd.api.types.is_integer_dtype(seri.dtype):
+        hucre = '<c><v>' + seri.astype(str) + '</v></c>'
+    elif pd.api.types.is_numeric_dtype(seri.dtype):
+        # inf/-inf Excel'de sayı değildir; "inf" yazılırsa dosya bozuk açılır
+        bos = bos | ~np.isfinite(seri.to_numpy(dtype=float, na_value=np.nan))
+        hucre = '<c s="1"><v>' + seri.astype(str) + '</v></c>'
+    elif pd.api.types.is_datetime64_any_dtype(seri.dtype):
+        seri_no = (seri - _EXCEL_SIFIR_GUNU) / pd.Timedelta(days=1)
+        hucre = '<c s="2"><v>' + seri_no.astype(str) + '</v></c>'
+    else:
+        hucre = '<c t="inlineStr"><is><t xml:space="preserve">' + _xml_kacis(seri.astype(str)) + '</t></is></c>'
+    hucre = hucre.to_numpy(dtype=object)
+    hucre[bos] = '<c/>'
+    return hucre
+
+
+def xlsx_yaz(df, hedef, sutunlar=None, sayfa_adi="Sayfa1"):
+    """Tabloyu tek sayfalık XLSX olarak `hedef` dosyasına akış halinde yazar."""
+    sutunlar = list(df.columns) if sutunlar is None else sutunlar
+    sayfa_adi = _xml_kacis(pd.Series([str(sayfa_adi)[:31]]))[0]  # Excel sayfa adı sınırı 31 karakter
+    with zipfile.ZipFile(hedef, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as paket:
+        for ad, icerik in _SABIT_DOSYALAR.items():
+            paket.writestr(ad, _XML_BASLIGI + icerik)
+        paket.writestr('xl/workbook.xml', (
+            f'{_XML_BASLIGI}<workbook {_ANA_AD_ALANI} {_ILISKI_AD_ALANI}>'
+            f'<sheets><sheet name="{sayfa_adi}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        with paket.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sayfa:
+            baslik = _sutun_hucreleri(pd.Series([str(c) for c in sutunlar], dtype=object))
+            sayfa.write(f'{_XML_BASLIGI}<worksheet {_ANA_AD_ALANI}><sheetData><row>{"".join(baslik)}</row>'.encode('utf-8'))
+            for parca in _parcalar(df, sutunlar):
+                satirlar = pd.Series('<row>', index=range(len(parca)), dtype=object)
+                for i in range(parca.shape[1]):
+                    satirlar = satirlar + _sutun_hucreleri(parca.iloc[:, i])
+                sayfa.write(''.join((satirlar + '</row>').tolist()).encode('utf-8'))
+            sayfa.write(b'</sheetData></worksheet>')
+
+
+def tablo_ozeti(df, sutunlar=None):
+    """Tablonun (seçilen sütunlarının) içerik özetini döndürür; aynı içerikli tablolar aynı özeti verir."""
+    sutunlar = list(df.columns) if sutunlar is None else sutunlar
+    satir_ozetleri = pd.util.hash_pandas_object(df[sutunlar], index=False).to_numpy()
+    return hashlib.sha256(repr(sutunlar).encode('utf-8') + satir_ozetleri.tobytes()).hexdigest()
+
+
+def disa_aktar(df, bicim, sutunlar=None, sayfa_adi="Sayfa1"):
+    """Tabloyu 'XLSX' ya da 'CSV' biçiminde dosya baytları olarak döndürür."""
+    with olcum(f'disa_aktarim_{bicim.lower()}', satir=len(df)), \
+            tempfile.SpooledTemporaryFile(max_size=BELLEK_SINIRI) as hedef:
+        if bicim == 'CSV':
+            csv_yaz(df, hedef, sutunlar)
+        else:
+            xlsx_yaz(df, hedef, sutunlar, sayfa_adi)
+        hedef.seek(0)
+        return hedef.read()
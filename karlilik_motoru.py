@@ -0,0 +1,622 @@
+"""Kârlılık analizi hesaplama motoru.
+
+Bu modül Streamlit'e bağımlı değildir; sipariş, maliyet ve parametreleri alıp
+model tablosunu, platform tablosunu ve toplamları tek geçişte hesaplar.
+Arayüz (app.py) sadece bu fonksiyonları çağırıp sonucu ekrana çizer.
+"""
+import hashlib
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from zamanlama import olcum
+
+# Model tablosunda ekranda gösterilen sütunlar
+MODEL_TABLOSU_SUTUNLARI = [
+    'Model Kodu', 'Toplam_Adet', 'Ort_Satis_Fiyati_KDVli', 'Alis_Fiyati_KDVsiz',
+    'Komisyon_TL', 'Net_Odenecek_KDV', 'Birim_Kar', 'Toplam_Kar'
+]
+# Modelden varyantlara (barkodlara) inildiğinde gösterilen sütunlar
+VARYANT_TABLOSU_SUTUNLARI = ['Model Kodu', 'Barkod'] + MODEL_TABLOSU_SUTUNLARI[1:]
+
+
+# Toptan fiyat listesindeki hedef türleri (arayüzdeki seçeneklerle aynı)
+HEDEF_KAR_MARJI = "% Kâr Marjı"
+HEDEF_NET_KAR = "Net Kâr Tutarı (TL)"
+
+
+def kar_hesapla(satis_fiyati_kdvli, alis_fiyati_kdvsiz, komisyon_orani, kdv_orani, kargo_gideri, reklam_gideri):
+    """Tek bir ürün ya da ürün dizileri için kâr hesaplaması yapar.
+
+    Girdiler skaler, NumPy dizisi veya pandas Serisi olabilir. Skaler girdide
+    skaler, dizi girdide aynı uzunlukta sütunlar döndürülür.
+    """
+    kdv_bolen = 1 + (kdv_orani / 100)
+    kdv_carpan = kdv_orani / 100
+
+    satis_fiyati_kdvsiz = satis_fiyati_kdvli / kdv_bolen
+    satis_kdv_tutari = satis_fiyati_kdvli - satis_fiyati_kdvsiz
+    alis_kdv_tutari = alis_fiyati_kdvsiz * kdv_carpan
+    net_odenecek_kdv = satis_kdv_tutari - alis_kdv_tutari
+    komisyon_tutari = satis_fiyati_kdvli * (komisyon_orani / 100)
+
+    toplam_maliyet = alis_fiyati_kdvsiz + kargo_gideri + reklam_gideri + komisyon_tutari + net_odenecek_kdv
+    net_kar = satis_fiyati_kdvsiz - toplam_maliyet
+    if np.ndim(satis_fiyati_kdvsiz) == 0:
+        kar_marji = (net_kar / satis_fiyati_kdvsiz) * 100 if satis_fiyati_kdvsiz > 0 else 0
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kar_marji = np.where(satis_fiyati_kdvsiz > 0, (net_kar / satis_fiyati_kdvsiz) * 100, 0.0)
+        if isinstance(net_kar, pd.Series):
+            kar_marji = pd.Series(kar_marji, index=net_kar.index)
+
+    return {
+        'net_kar': net_kar,
+        'kar_marji': kar_marji,
+        'toplam_maliyet': toplam_maliyet
+    }
+
+
+def toptan_fiyat_listesi_hesapla(df_maliyet, komisyon_orani, kdv_orani, hedef_tipi, hedef_deger):
+    """Her model için hedef kâr marjına ya da net kâr tutarına göre satış fiyatı listesi oluşturur.
+
+    Hedefe ulaşılamıyorsa (komisyon ve KDV payı fiyatın tamamını aşıyorsa) ValueError fırlatılır.
+    """
+    # --- DÜZELTME: Sadece benzersiz model kodları ile çalış ---
+    # Alış fiyatı girilmemiş satırlar listeye alınmaz
+    df_hesaplama = df_maliyet.dropna(subset=['Alış Fiyatı']).drop_duplicates(subset=['Model Kodu'])
+
+    kdv_carpan = kdv_orani / 100
+    kdv_bolen = 1 + kdv_carpan
+
+    alis_fiyati_kdvsiz = df_hesaplama['Alış Fiyatı']
+    alis_kdv_tutari = alis_fiyati_kdvsiz * kdv_carpan
+
+    if hedef_tipi == HEDEF_KAR_MARJI:
+        hedef_kar_marji = hedef_deger / 100
+        pay = alis_fiyati_kdvsiz - alis_kdv_tutari
+        payda = 1 - hedef_kar_marji - (kdv_bolen * (komisyon_orani/100)) - kdv_carpan
+    else: # Hedef Net Kâr (TL)
+        hedef_net_kar = hedef_deger
+        pay = alis_fiyati_kdvsiz - alis_kdv_tutari + hedef_net_kar
+        payda = 1 - (kdv_bolen * (komisyon_orani / 100)) - kdv_carpan
+
+    if payda <= 0:
+        raise ValueError("Bu hedefe ulaşılamıyor. Lütfen komisyon veya kâr hedefini düşürün.")
+
+    satis_fiyati_kdvsiz = pay / payda
+    satis_fiyati_kdvli = satis_fiyati_kdvsiz * kdv_bolen
+    sonuclar = kar_hesapla(satis_fiyati_kdvli, alis_fiyati_kdvsiz, komisyon_orani, kdv_orani, 0, 0)
+
+    # --- DÜZELTME: İstenen sütunlarla yeni bir sonuç DataFrame'i oluştur ---
+    return pd.DataFrame({
+        'Model Kodu': df_hesaplama['Model Kodu'],
+        'Alış Fiyatı (KDV Hariç)': alis_fiyati_kdvsiz,
+        'Satış Fiyatı (KDV Hariç)': satis_fiyati_kdvsiz,
+        'Satış Fiyatı (KDV Dahil)': satis_fiyati_kdvli,
+        'Net Kar': sonuclar['net_kar'],
+        'Kar Marjı': sonuclar['kar_marji'],
+    })
+
+
+def barkod_normalize(seri):
+    """Excel ve Google Sheets'ten gelen barkodları aynı metin formatına getirir."""
+    return seri.astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+
+
+def barkod_anahtari(seri):
+    """Barkod sütununu normalize edilmiş kategorik anahtara çevirir.
+
+    Zaten kategorik olan sütunların yükleme sırasında normalize edildiği kabul
+    edilir ve olduğu gibi döndürülür.
+    """
+    if isinstance(seri.dtype, pd.CategoricalDtype):
+        return seri
+    return barkod_normalize(seri).astype('category')
+
+
+class MaliyetIndeksi:
+    """Maliyet tablosu için önceden kurulmuş barkod → satır konumu indeksi.
+
+    Siparişleri maliyetlerle eşleştirmek, her çalıştırmada metin üzerinden
+    `pd.merge` yapmak yerine bu indeks üzerinden dizi aramasına dönüşür.
+    Aynı barkod birden fazla kez geçiyorsa son satır geçerlidir. Alış fiyatı
+    boş ya da sayı olmayan satırlar indekse alınmaz; o barkodların maliyeti
+    eksik sayılır.
+    """
+
+    def __init__(self, df_maliyet):
+        alis_fiyati = pd.to_numeric(df_maliyet['Alış Fiyatı'], errors='coerce')
+        df = df_maliyet.assign(Barkod=barkod_normalize(df_maliyet['Barkod']), **{'Alış Fiyatı': alis_fiyati})
+        df = df[alis_fiyati.notna()].drop_duplicates(subset=['Barkod'], keep='last')
+        self.barkodlar = pd.Index(df['Barkod'])
+        self.alis_fiyati = df['Alış Fiyatı'].to_numpy(dtype=float)
+        # Model kodları sıralı tam sayı kodlarına çevrilir; gruplama bu kodlar üzerinden yapılır
+        self.model_kodu, self.modeller = pd.factorize(df['Model Kodu'], sort=True)
+
+    def konumlar(self, barkod):
+        """Barkod serisi için maliyet satır konumlarını döndürür (-1: maliyet yok)."""
+        barkod = barkod_anahtari(barkod)
+        kategori_konum = self.barkodlar.get_indexer(barkod.cat.categories)
+        kodlar = barkod.cat.codes.to_numpy()
+        # Boş barkodun kodu -1'dir; sona eklenen -1 sayesinde o satırlar da "maliyet yok" olur
+        return np.append(kategori_konum, -1)[kodlar]
+
+
+# Aynı maliyet tablosu için indeks yeniden kurulmasın diye tablo nesnesine göre saklanır
+_indeks_onbellegi = {}
+
+
+def maliyet_indeksi_al(df_maliyet):
+    """Maliyet tablosunun indeksini döndürür; aynı tablo nesnesi için bir kez kurulur."""
+    kayit = _indeks_onbellegi.get(id(df_maliyet))
+    if kayit is not None and kayit[0]() is df_maliyet:
+        return kayit[1]
+    indeks = MaliyetIndeksi(df_maliyet)
+    anahtar = id(df_maliyet)
+    _indeks_onbellegi[anahtar] = (weakref.ref(df_maliyet, lambda _: _indeks_onbellegi.pop(anahtar, None)), indeks)
+    return indeks
+
+
+# Maliyet tablosunun içerik sürümü de tablo nesnesine göre bir kez hesaplanır
+_surum_onbellegi = {}
+
+
+def maliyet_surumu(df_maliyet):
+    """Maliyet tablosunun analizi etkileyen sütunlarının içerik özetini döndürür.
+
+    Analiz sonuçlarının önbellek anahtarında kullanılır: maliyetler
+    düzenlendiğinde (yeni tablo nesnesi) özet değişir, aynı içerik farklı
+    oturumlarda ya da yeniden yüklemede aynı özeti verir.
+    """
+    kayit = _surum_onbellegi.get(id(df_maliyet))
+    if kayit is not None and kayit[0]() is df_maliyet:
+        return kayit[1]
+    sutunlar = [c for c in ['Model Kodu', 'Barkod', 'Alış Fiyatı'] if c in df_maliyet.columns]
+    satir_ozetleri = pd.util.hash_pandas_object(df_maliyet[sutunlar], index=False).to_numpy()
+    surum = hashlib.sha1(satir_ozetleri.tobytes()).hexdigest()
+    anahtar = id(df_maliyet)
+    _surum_onbellegi[anahtar] = (weakref.ref(df_maliyet, lambda _: _surum_onbellegi.pop(anahtar, None)), surum)
+    return surum
+
+
+def urun_basi_kargo_hesapla(params, toplam_satilan_urun, essiz_siparis_sayisi):
+    """Toplam kargo faturası veya sipariş başı kargo bedelinden ürün başı kargoyu bulur."""
+    if toplam_satilan_urun <= 0:
+        return 0
+    if params['toplam_kargo_faturasi'] > 0:
+        return params['toplam_kargo_faturasi'] / toplam_satilan_urun
+    return (params['kargo_maliyeti_siparis_basi'] * essiz_siparis_sayisi) / toplam_satilan_urun
+
+
+def birim_reklam_gideri_hesapla(platform, params, trendyol_urun_adedi):
+    """Her satır için birim reklam giderini dizi olarak döndürür.
+
+    Toplam reklam bütçesi girildiyse bütçe filtredeki tüm Trendyol ürün adedine
+    dağıtılır ve sadece Trendyol satırlarına uygulanır; aksi halde ürün başı
+    reklam gideri tüm satırlara uygulanır.
+    """
+    if params['toplam_reklam_butcesi'] > 0:
+        birim = params['toplam_reklam_butcesi'] / trendyol_urun_adedi if trendyol_urun_adedi > 0 else 0
+        return np.where((platform == 'Trendyol').to_numpy(), birim, 0.0)
+    return np.full(len(platform), float(params['reklam_gideri_urun_basi']))
+
+
+def model_tablosu_hesapla(df_grouped, params, urun_basi_kargo_maliyeti):
+    """Model (ya da varyant) bazında toplanmış adet/ciro/alış fiyatından birim ve toplam kârı hesaplar.
+
+    Modelin alış fiyatı varyantlarının adet ağırlıklı ortalamasıdır; böylece
+    Birim_Kar × Toplam_Adet, her satırın kendi alış fiyatıyla hesaplanan
+    kârların toplamına eşittir.
+    """
+    if df_grouped.empty:
+        return df_grouped
+    kdv_bolen = 1 + (params['kdv_oran'] / 100)
+    kdv_carpan = params['kdv_oran'] / 100
+    df_grouped['Ort_Satis_Fiyati_KDVli'] = df_grouped['Toplam_Ciro_Analiz_Edilen'] / df_grouped['Toplam_Adet']
+    df_grouped['Ort_Satis_Fiyati_KDVsiz'] = df_grouped['Ort_Satis_Fiyati_KDVli'] / kdv_bolen
+    df_grouped['Satis_KDV'] = df_grouped['Ort_Satis_Fiyati_KDVli'] - df_grouped['Ort_Satis_Fiyati_KDVsiz']
+    df_grouped['Alis_KDV'] = df_grouped['Alis_Fiyati_KDVsiz'] * kdv_carpan
+    df_grouped['Net_Odenecek_KDV'] = df_grouped['Satis_KDV'] - df_grouped['Alis_KDV']
+    df_grouped['Komisyon_TL'] = df_grouped['Ort_Satis_Fiyati_KDVli'] * (params['komisyon_oran'] / 100)
+    df_grouped['Birim_Kar'] = (df_grouped['Ort_Satis_Fiyati_KDVsiz'] - df_grouped['Alis_Fiyati_KDVsiz'] - df_grouped['Net_Odenecek_KDV'] - df_grouped['Komisyon_TL'] - urun_basi_kargo_maliyeti)
+    df_grouped['Toplam_Kar'] = (df_grouped['Birim_Kar'] * df_grouped['Toplam_Adet']) - df_grouped['Toplam_Reklam_Gideri']
+    return df_grouped
+
+
+def _ortalama_alis_fiyati(df):
+    # Adet ağırlıklı ortalama alış fiyatı: Σ(alış fiyatı × adet) / Σadet
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['Alis_Fiyati_KDVsiz'] = df['Alis_Tutari'] / df['Toplam_Adet']
+
+
+def _karlilik_hesapla(satirlar, essiz_siparis_sayisi, df_maliyet, params, genel_toplamlar=None):
+    """Sipariş satırları ya da günlük özet satırları üzerinde ortak kârlılık hesabı.
+
+    `satirlar` Gün, Platform, Barkod, Miktar ve Ciro (Tutar × Miktar)
+    sütunlarını içerir. Tüm toplamlar adet ve ciroda doğrusal olduğundan
+    sonuç satırların ne kadar toplanmış olduğundan bağımsızdır.
+    `genel_toplamlar` verilirse ürün başı kargo ve reklam dağıtımı bu
+    satırlardan değil, verilen analizin toplamlarından alınır (bkz.
+    `karlilik_sonucuna_maliyet_ekle`).
+    (sonuç sözlüğü, maliyeti bulunan satırların maskesi) döndürür.
+    """
+    with olcum('maliyet_indeksi', satir=len(df_maliyet)):
+        indeks = maliyet_indeksi_al(df_maliyet)
+
+    miktar = satirlar['Miktar']
+    satir_ciro = satirlar['Ciro']
+    # Model ciroları analizde seçilen satış fiyatı sütunundan hesaplanır (varsayılan: Tutar)
+    analiz_ciro = satirlar['Analiz_Ciro'] if 'Analiz_Ciro' in satirlar else satir_ciro
+
+    toplam_satilan_urun = miktar.sum()
+    toplam_gercek_ciro = satir_ciro.sum()
+    urun_basi_kargo_maliyeti = urun_basi_kargo_hesapla(params, toplam_satilan_urun, essiz_siparis_sayisi)
+    trendyol_urun_adedi = miktar[satirlar['Platform'] == 'Trendyol'].sum()
+    if genel_toplamlar is not None:
+        urun_basi_kargo_maliyeti = genel_toplamlar['urun_basi_kargo_maliyeti']
+        trendyol_urun_adedi = genel_toplamlar['trendyol_urun_adedi']
+
+    df_platform = (
+        satir_ciro.groupby(satirlar['Platform'], observed=True).sum()
+        .rename('Ciro').reset_index()
+    )
+
+    # Sipariş-maliyet eşleştirmesi: barkod indeksinden satır konumu, metin birleştirmesi yok
+    with olcum('eslestirme', satir=len(satirlar)):
+        konum = indeks.konumlar(satirlar['Barkod'])
+    maliyetli_mask = konum >= 0
+    maliyet_konum = konum[maliyetli_mask]
+
+    platform_maliyetli = satirlar['Platform'][maliyetli_mask]
+    miktar_maliyetli = miktar.to_numpy()[maliyetli_mask]
+    birim_reklam = birim_reklam_gideri_hesapla(platform_maliyetli, params, trendyol_urun_adedi)
+
+    model_kodu = indeks.model_kodu[maliyet_konum]
+    gecerli = model_kodu >= 0
+    maliyet_konum, miktar_maliyetli = maliyet_konum[gecerli], miktar_maliyetli[gecerli]
+    platform_maliyetli = platform_maliyetli[gecerli]
+    satir_ciro_maliyetli = analiz_ciro.to_numpy()[maliyetli_mask][gecerli]
+    # Her satır kendi barkodunun (varyantın) alış fiyatıyla hesaplanır
+    satir_alis_tutari = indeks.alis_fiyati[maliyet_konum] * miktar_maliyetli
+    satir_reklam = birim_reklam[gecerli] * miktar_maliyetli
+
+    with olcum('model_toplama', satir=len(maliyet_konum)):
+        # Satırlar tek geçişte (varyant, platform) hücrelerine toplanır; varyant, model,
+        # platform ve genel toplamlar satırlara dönmeden bu küçük tablodan türetilir
+        satilan = np.zeros(len(indeks.barkodlar), dtype=bool)
+        satilan[maliyet_konum] = True
+        varyantlar = np.flatnonzero(satilan)
+        varyant_kodu = (np.cumsum(satilan) - 1)[maliyet_konum]
+        platform_kodu, platformlar = pd.factorize(platform_maliyetli)
+        platformlar = list(np.asarray(platformlar, dtype=object)) + [np.nan]  # Son sütun: platformu boş satırlar
+        platform_kodu[platform_kodu < 0] = len(platformlar) - 1
+        hucre = varyant_kodu * len(platformlar) + platform_kodu
+        hucre_sayisi = len(varyantlar) * len(platformlar)
+
+        def hucre_toplami(agirlik):
+            return np.bincount(hucre, weights=agirlik, minlength=hucre_sayisi).reshape(len(varyantlar), len(platformlar))
+
+        adet = hucre_toplami(miktar_maliyetli)
+        ciro = hucre_toplami(satir_ciro_maliyetli)
+        alis_tutari = hucre_toplami(satir_alis_tutari)
+        reklam = hucre_toplami(satir_reklam)
+        trendyol = [i for i, p in enumerate(platformlar) if p == 'Trendyol']
+
+        varyant_model = indeks.model_kodu[varyantlar]
+        df_varyant = pd.DataFrame({
+            'Model Kodu': np.asarray(indeks.modeller)[varyant_model],
+            'Barkod': indeks.barkodlar[varyantlar],
+            'Toplam_Adet': adet.sum(axis=1),
+            'Toplam_Ciro_Analiz_Edilen': ciro.sum(axis=1),
+            'Alis_Tutari': alis_tutari.sum(axis=1),
+            'Toplam_Reklam_Gideri': reklam.sum(axis=1),
+            'Trendyol_Adet': adet[:, trendyol].sum(axis=1),
+        })
+
+        model_sayisi = len(indeks.modeller)
+        var = np.bincount(varyant_model, minlength=model_sayisi) > 0
+        df_grouped = pd.DataFrame({'Model Kodu': np.asarray(indeks.modeller)[var]})
+        for sutun in ['Toplam_Adet', 'Toplam_Ciro_Analiz_Edilen', 'Alis_Tutari', 'Toplam_Reklam_Gideri', 'Trendyol_Adet']:
+            df_grouped[sutun] = np.bincount(varyant_model, weights=df_varyant[sutun].to_numpy(), minlength=model_sayisi)[var]
+
+        for df in (df_varyant, df_grouped):
+            _ortalama_alis_fiyati(df)
+            if pd.api.types.is_integer_dtype(miktar.dtype):
+                df['Toplam_Adet'] = df['Toplam_Adet'].astype(np.int64)
+        # Satışı sıfır adetli varyantlarda ortalama tanımsızdır; barkodun kendi alış fiyatı gösterilir
+        df_varyant['Alis_Fiyati_KDVsiz'] = df_varyant['Alis_Fiyati_KDVsiz'].fillna(pd.Series(indeks.alis_fiyati[varyantlar]))
+        df_varyant = df_varyant.sort_values(['Model Kodu', 'Barkod'], kind='stable', ignore_index=True)
+
+    df_grouped = model_tablosu_hesapla(df_grouped, params, urun_basi_kargo_maliyeti)
+    df_varyant = model_tablosu_hesapla(df_varyant, params, urun_basi_kargo_maliyeti)
+    toplam_analiz_kari = df_grouped['Toplam_Kar'].sum() if not df_grouped.empty else 0
+
+    # Kâr ciro, adet ve alış tutarında doğrusal olduğundan satır ve platform kârları da
+    # aynı formülle hesaplanıp toplanabilir; toplamları model tablosundaki toplam kârdır:
+    #   kâr = 2·C/(1+k) − C − c·C − (1−k)·a·A − kargo·A − reklam
+    kdv = params['kdv_oran'] / 100
+    ciro_carpani = 2 / (1 + kdv) - 1 - params['komisyon_oran'] / 100
+
+    def kar(c, a_tutari, a, r):
+        return c * ciro_carpani - (1 - kdv) * a_tutari - urun_basi_kargo_maliyeti * a - r
+
+    satir_kari = kar(satir_ciro_maliyetli, satir_alis_tutari, miktar_maliyetli, satir_reklam)
+    gun = satirlar['Gün'].to_numpy()[maliyetli_mask][gecerli]
+    df_gunluk_kar = pd.Series(satir_kari).groupby(gun).sum().rename_axis('Gün').rename('Kar').reset_index()
+
+    platform_kari = pd.Series(
+        kar(ciro.sum(axis=0), alis_tutari.sum(axis=0), adet.sum(axis=0), reklam.sum(axis=0))[:-1],
+        index=platformlar[:-1], dtype=float,
+    )
+    df_platform['Kar'] = df_platform['Platform'].astype(object).map(platform_kari).fillna(0.0).to_numpy()
+
+    sonuc = {
+        'df_grouped': df_grouped,
+        'df_varyant': df_varyant,
+        'df_platform': df_platform,
+        'df_gunluk_kar': df_gunluk_kar,
+        'toplamlar': {
+            'toplam_siparis_sayisi': essiz_siparis_sayisi,
+            'toplam_satilan_urun': toplam_satilan_urun,
+            'toplam_gercek_ciro': toplam_gercek_ciro,
+            'toplam_analiz_kari': toplam_analiz_kari,
+            'urun_basi_kargo_maliyeti': urun_basi_kargo_maliyeti,
+            'trendyol_urun_adedi': trendyol_urun_adedi,
+        },
+    }
+    return sonuc, maliyetli_mask
+
+
+def _maliyetsiz_satirlar(df, maliyetli_mask):
+    return df[~maliyetli_mask].assign(
+        Barkod=lambda d: d['Barkod'].astype(str), **{'Model Kodu': np.nan, 'Alış Fiyatı': np.nan}
+    )
+
+
+def karlilik_analizi_hesapla(df_siparis, df_maliyet, params):
+    """Filtrelenmiş siparişler ve maliyet tablosu için kârlılık analizini hesaplar.
+
+    Girdi DataFrame'leri değiştirilmez. Sonuç sözlüğü şunları içerir:
+    'df_grouped' (model tablosu), 'df_varyant' (barkod bazında model
+    kırılımı), 'df_platform' (platform cirosu ve kârı),
+    'df_gunluk_kar' (günlük kâr serisi), 'df_maliyetsiz' (maliyeti
+    bulunamayan satırlar) ve 'toplamlar'.
+    """
+    satirlar = _siparis_satirlari(df_siparis, params)
+    sonuc, maliyetli_mask = _karlilik_hesapla(satirlar, df_siparis['Sipariş No'].nunique(), df_maliyet, params)
+    sonuc['df_maliyetsiz'] = _maliyetsiz_satirlar(df_siparis, maliyetli_mask)
+    sonuc['toplamlar']['maliyetsiz_satir_sayisi'] = int((~maliyetli_mask).sum())
+    return sonuc
+
+
+def _siparis_satirlari(df_siparis, params):
+    satis_sutunu = params.get('satis_fiyati_sutunu', 'Tutar')
+    # Satır cirosu bir kez hesaplanır; grup bazında lambda yerine düz toplam alınır
+    miktar = df_siparis['Miktar']
+    satirlar = pd.DataFrame({
+        'Gün': df_siparis['Sipariş Tarihi'].dt.floor('D'),
+        'Platform': df_siparis['Platform'],
+        'Barkod': df_siparis['Barkod'],
+        'Miktar': miktar,
+        'Ciro': df_siparis['Tutar'] * miktar,
+    })
+    if satis_sutunu != 'Tutar':
+        satirlar['Analiz_Ciro'] = df_siparis[satis_sutunu] * miktar
+    return satirlar
+
+
+def karlilik_analizi_ozetten_hesapla(df_gunluk, df_siparis_sayisi, df_maliyet, params):
+    """Kârlılık analizini sipariş satırları yerine günlük özetlerden hesaplar.
+
+    `df_gunluk` (Gün, Platform, Barkod) başına Miktar, Ciro ve Satir;
+    `df_siparis_sayisi` (Gün, Platform) başına Siparis_Sayisi içerir (bkz.
+    `siparis_deposu.gunluk_ozet_olustur`). Süre sipariş satırı sayısına değil
+    gün × ürün sayısına bağlıdır. Sonuç `karlilik_analizi_hesapla` ile aynı
+    biçimdedir; 'df_maliyetsiz' burada günlük özet satırlarını içerir.
+    """
+    essiz_siparis_sayisi = int(df_siparis_sayisi['Siparis_Sayisi'].sum())
+    sonuc, maliyetli_mask = _karlilik_hesapla(df_gunluk, essiz_siparis_sayisi, df_maliyet, params)
+    sonuc['df_maliyetsiz'] = _maliyetsiz_satirlar(df_gunluk, maliyetli_mask)
+    sonuc['toplamlar']['maliyetsiz_satir_sayisi'] = int(df_gunluk['Satir'].to_numpy()[~maliyetli_mask].sum())
+    return sonuc
+
+
+# Model ve varyant tablolarında satırlar üzerinden toplanan (doğrusal) sütunlar
+_TOPLANAN_SUTUNLAR = ['Toplam_Adet', 'Toplam_Ciro_Analiz_Edilen', 'Alis_Tutari', 'Toplam_Reklam_Gideri', 'Trendyol_Adet']
+
+
+def karlilik_sonucuna_maliyet_ekle(sonuc, df_yeni_maliyet, params):
+    """Maliyeti sonradan girilen barkodları analizi baştan hesaplamadan sonuca ekler.
+
+    Sadece `sonuc['df_maliyetsiz']` içinde yeni maliyetlerle eşleşen satırlar
+    hesaplanır. Ürün başı kargo ve reklam dağıtımı zaten tüm satırlar üzerinden
+    bulunduğundan değişmez; kâr doğrusal olduğu için eklenen satırların model,
+    varyant, platform ve günlük kârları mevcut toplamlara fark olarak eklenir.
+    Verilen sonuç değiştirilmez (önbellekte paylaşılıyor olabilir); yeni sonuç
+    sözlüğü döndürülür.
+    """
+    df_maliyetsiz = sonuc['df_maliyetsiz']
+    toplamlar = sonuc['toplamlar']
+    # Barkodlar bir kez kategorik anahtara çevrilir; eşleştirme ve hesaplama aynı anahtarı kullanır
+    barkod = barkod_anahtari(df_maliyetsiz['Barkod'])
+    eslesen = maliyet_indeksi_al(df_yeni_maliyet).konumlar(barkod) >= 0
+    if not eslesen.any():
+        return sonuc
+
+    ek_satirlar = df_maliyetsiz[eslesen]
+    # Günlük özetten gelen sonuçta eksik satırlar zaten özet satırıdır; ham siparişlerde satırlar yeniden kurulur
+    satirlar = ek_satirlar if 'Ciro' in ek_satirlar else _siparis_satirlari(ek_satirlar, params)
+    satirlar = satirlar.assign(Barkod=barkod[eslesen].array)
+    with olcum('artimli_maliyet_ekleme', satir=len(satirlar)):
+        ek, maliyetli_mask = _karlilik_hesapla(satirlar, toplamlar['toplam_siparis_sayisi'], df_yeni_maliyet, params, toplamlar)
+    eklenen = eslesen.copy()
+    eklenen[eslesen] = maliyetli_mask
+    urun_basi_kargo_maliyeti = toplamlar['urun_basi_kargo_maliyeti']
+
+    df_grouped = (
+        pd.concat([sonuc['df_grouped'][['Model Kodu'] + _TOPLANAN_SUTUNLAR], ek['df_grouped'][['Model Kodu'] + _TOPLANAN_SUTUNLAR]])
+        .groupby('Model Kodu', sort=True, as_index=False).sum()
+    )
+    _ortalama_alis_fiyati(df_grouped)
+    df_grouped = model_tablosu_hesapla(df_grouped, params, urun_basi_kargo_maliyeti)
+    # Eklenen barkodlar daha önce maliyetsiz olduğundan mevcut varyantlarla çakışmaz
+    df_varyant = pd.concat([sonuc['df_varyant'], ek['df_varyant']], ignore_index=True)
+    df_varyant = df_varyant.sort_values(['Model Kodu', 'Barkod'], kind='stable', ignore_index=True)
+
+    ek_platform_kari = ek['df_platform'].set_index(ek['df_platform']['Platform'].astype(object))['Kar']
+    df_platform = sonuc['df_platform'].assign(
+        Kar=lambda d: d['Kar'] + d['Platform'].astype(object).map(ek_platform_kari).fillna(0.0).to_numpy()
+    )
+    df_gunluk_kar = (
+        pd.concat([sonuc['df_gunluk_kar'], ek['df_gunluk_kar']])
+        .groupby('Gün', as_index=False)['Kar'].sum()
+    )
+
+    eklenen_satir = int(ek_satirlar['Satir'].to_numpy()[maliyetli_mask].sum()) if 'Satir' in ek_satirlar else int(eklenen.sum())
+    return {
+        'df_grouped': df_grouped,
+        'df_varyant': df_varyant,
+        'df_platform': df_platform,
+        'df_gunluk_kar': df_gunluk_kar,
+        'df_maliyetsiz': df_maliyetsiz[~eklenen],
+        'toplamlar': {
+            **toplamlar,
+            'toplam_analiz_kari': toplamlar['toplam_analiz_kari'] + ek['toplamlar']['toplam_analiz_kari'],
+            'maliyetsiz_satir_sayisi': toplamlar['maliyetsiz_satir_sayisi'] - eklenen_satir,
+        },
+    }
+
+
+# ==============================================================================
+# TABLO SAYFALAMA
+# ==============================================================================
+
+def tablo_sayfasi(df, siralama_sutunu, azalan=True, ilk_n=None, sayfa=1, sayfa_boyutu=100):
+    """Tabloyu sunucuda sıralayıp istenen sayfayı sayısal tipleri koruyarak döndürür.
+
+    (sayfa tablosu, gösterilebilecek toplam satır) döndürür. Sadece sıralama
+    sütunu sıralanır ve sadece sayfadaki satırlar kopyalanır; `ilk_n`
+    verilirse tam sıralama yerine en büyük/küçük n değer seçilir.
+    """
+    sutun = df[siralama_sutunu]
+    if ilk_n is not None:
+        sirali = (sutun.nlargest(ilk_n) if azalan else sutun.nsmallest(ilk_n)).index
+    else:
+        sirali = sutun.sort_values(ascending=not azalan, kind='stable', na_position='last').index
+    bas = (sayfa - 1) * sayfa_boyutu
+    return df.loc[sirali[bas:bas + sayfa_boyutu]], len(sirali)
+
+
+# ==============================================================================
+# SENARYO ANALİZİ
+# ==============================================================================
+
+# Senaryo ızgarasında değiştirilebilen analiz parametreleri (analiz_params anahtarları)
+SENARYO_PARAMETRELERI = [
+    'komisyon_oran', 'kdv_oran', 'toplam_kargo_faturasi', 'kargo_maliyeti_siparis_basi',
+    'toplam_reklam_butcesi', 'reklam_gideri_urun_basi'
+]
+# Tek seferde hesaplanıp gösterilebilecek en fazla senaryo sayısı
+SENARYO_SINIRI = 20_000
+
+
+def aralik_uzunlugu(alt, ust, adim):
+    """(min, maks, adım) aralığının kaç değer üreteceğini, diziyi oluşturmadan döndürür."""
+    return int(np.ceil((ust + adim / 2 - alt) / adim))
+
+
+def aralik_degerleri(alt, ust, adim):
+    """(min, maks, adım) aralığının değerlerini döndürür; maks dahildir."""
+    return np.round(np.arange(alt, ust + adim / 2, adim), 6)
+
+
+def _senaryo_kargo_ve_reklam(izgara, toplamlar):
+    """Her senaryo için ürün başı kargo ve Trendyol ürün başı reklam payını dizi olarak döndürür."""
+    toplam_adet = toplamlar['toplam_satilan_urun']
+    trendyol_adet = toplamlar['trendyol_urun_adedi']
+    if toplam_adet > 0:
+        urun_basi_kargo = np.where(
+            izgara['toplam_kargo_faturasi'] > 0,
+            izgara['toplam_kargo_faturasi'] / toplam_adet,
+            izgara['kargo_maliyeti_siparis_basi'] * toplamlar['toplam_siparis_sayisi'] / toplam_adet,
+        )
+    else:
+        urun_basi_kargo = np.zeros_like(izgara['komisyon_oran'])
+    trendyol_birim_reklam = izgara['toplam_reklam_butcesi'] / trendyol_adet if trendyol_adet > 0 else np.zeros_like(izgara['komisyon_oran'])
+    return urun_basi_kargo, trendyol_birim_reklam
+
+
+def senaryo_izgarasi_hesapla(df_grouped, toplamlar, params):
+    """Parametre aralıklarının tüm kombinasyonları için toplam kâr ve marjı hesaplar.
+
+    `params`, analiz_params ile aynı anahtarları içerir; her değer tek bir sayı
+    ya da değer listesi olabilir. Ham siparişlere dönülmez: model başına kâr,
+    toplanmış ciro (C), adet (A), alış tutarı (a·A) ve Trendyol adedi (T)
+    üzerinden doğrusal olduğundan toplamlar her senaryo için birkaç toplamla
+    yayınlanarak (broadcast) hesaplanır:
+
+        kâr = 2·ΣC/(1+k) − ΣC − (1−k)·Σ(a·A) − c·ΣC − kargo·ΣA − reklam
+    """
+    eksenler = [np.atleast_1d(np.asarray(params[p], dtype=float)) for p in SENARYO_PARAMETRELERI]
+    senaryo_sayisi = int(np.prod([len(e) for e in eksenler]))
+    if senaryo_sayisi > SENARYO_SINIRI:
+        raise ValueError(f"{senaryo_sayisi:,} senaryo çok fazla; en fazla {SENARYO_SINIRI:,} senaryo hesaplanabilir.")
+    izgara = dict(zip(SENARYO_PARAMETRELERI, (e.ravel() for e in np.meshgrid(*eksenler, indexing='ij'))))
+
+    df = df_grouped[df_grouped['Toplam_Adet'] > 0]
+    ciro = df['Toplam_Ciro_Analiz_Edilen'].sum()
+    adet = df['Toplam_Adet'].sum()
+    alis_tutari = (df['Alis_Fiyati_KDVsiz'] * df['Toplam_Adet']).sum()
+    trendyol_adet = df['Trendyol_Adet'].sum()
+
+    kdv = izgara['kdv_oran'] / 100
+    komisyon = izgara['komisyon_oran'] / 100
+    urun_basi_kargo, trendyol_birim_reklam = _senaryo_kargo_ve_reklam(izgara, toplamlar)
+    reklam = np.where(
+        izgara['toplam_reklam_butcesi'] > 0,
+        trendyol_birim_reklam * trendyol_adet,
+        izgara['reklam_gideri_urun_basi'] * adet,
+    )
+
+    toplam_kar = 2 * ciro / (1 + kdv) - ciro - (1 - kdv) * alis_tutari - komisyon * ciro - urun_basi_kargo * adet - reklam
+    toplam_ciro = toplamlar['toplam_gercek_ciro']
+    df_senaryo = pd.DataFrame(izgara)
+    df_senaryo['Toplam_Kar'] = toplam_kar
+    df_senaryo['Kar_Marji'] = toplam_kar / toplam_ciro * 100 if toplam_ciro > 0 else 0.0
+    return df_senaryo
+
+
+def model_duyarlilik_tablosu(df_grouped, toplamlar, params):
+    """Her modelin toplam kârının parametrelerdeki birim değişime duyarlılığını hesaplar.
+
+    Sütunlar, komisyon ve KDV oranında +1 puan, kargo ve reklam girdisinde
+    (hangi mod seçiliyse: toplam fatura/bütçe ya da sipariş/ürün başı tutar)
+    +1 TL artışın modelin toplam kârına etkisini (TL) gösterir.
+    """
+    ciro = df_grouped['Toplam_Ciro_Analiz_Edilen']
+    adet = df_grouped['Toplam_Adet']
+    kdv = params['kdv_oran'] / 100
+    toplam_adet = toplamlar['toplam_satilan_urun']
+    trendyol_adet = toplamlar['trendyol_urun_adedi']
+
+    if toplam_adet <= 0:
+        kargo_carpani = 0
+    elif params['toplam_kargo_faturasi'] > 0:
+        kargo_carpani = 1 / toplam_adet
+    else:
+        kargo_carpani = toplamlar['toplam_siparis_sayisi'] / toplam_adet
+    if params['toplam_reklam_butcesi'] > 0:
+        reklam_etkisi = -df_grouped['Trendyol_Adet'] * (1 / trendyol_adet if trendyol_adet > 0 else 0)
+    else:
+        reklam_etkisi = -adet
+
+    return pd.DataFrame({
+        'Model Kodu': df_grouped['Model Kodu'],
+        'Toplam_Kar': df_grouped['Toplam_Kar'],
+        'Komisyon_1_Puan': -ciro / 100,
+        'KDV_1_Puan': (-2 * ciro / (1 + kdv) ** 2 + df_grouped['Alis_Fiyati_KDVsiz'] * adet) / 100,
+        'Kargo_1_TL': -adet * kargo_carpani,
+        'Reklam_1_TL': reklam_etkisi,
+    })
@@ -1,9 +1,30 @@
+import time
+
+BASLANGIC = time.perf_counter()  # Açılış süresi ölçümü; ağır modüller yüklenmeden önce
+
 import webview
 import subprocess
-import threading
-import time
 import sys
 import os
+import logging
+import urllib.request
+
+PORT = 8501
+SAGLIK_ADRESI = f"http://localhost:{PORT}/_stcore/health"
+# Sunucu bu süre içinde hazır olmazsa pencerede hata gösterilir
+HAZIR_ZAMAN_ASIMI = float(os.environ.get("STILDIVA_BASLATMA_ZAMAN_ASIMI", "60"))
+YOKLAMA_ARALIGI = 0.1
+
+MASAUSTU = os.path.join(os.path.expanduser("~"), "Desktop")
+# Log dosyaları Masaüstüne yazılır; Masaüstü klasörü yoksa (ör. OneDrive'a taşınmışsa) kullanıcı dizinine
+LOG_DIZINI = MASAUSTU if os.path.isdir(MASAUSTU) else os.path.expanduser("~")
+
+logging.basicConfig(
+    filename=os.path.join(LOG_DIZINI, "baslatma_log.txt"),
+    level=logging.INFO,
+    format="%(asctime)s %(message)s",
+)
+log = logging.getLogger("baslatici")
 
 # PyInstaller'ın geçici dosya yolunu çözmek için yardımcı fonksiyon
 def get_path(relative_path):
@@ -13,34 +34,64 @@ def get_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Streamlit sunucusunu çalıştıracak ve log tutacak fonksiyon
+# Streamlit sunucusunu başlatır; çıktılar log dosyasına yazılır
 def run_streamlit():
     app_path = get_path("app.py")
-    log_path = os.path.join(os.path.expanduser("~"), "Desktop", "app_log.txt") # Log dosyasını Masaüstüne kaydet
-    
-    command = ["streamlit", "run", app_path, "--server.headless", "true", "--server.port", "8501"]
-    
-    # Hataları yakalamak için log dosyasını aç
-    with open(log_path, "w") as log_file:
-        # subprocess.run yerine Popen kullanarak işlemi başlat ve logları yönlendir
-        process = subprocess.Popen(command, stdout=log_file, stderr=log_file, text=True)
-        process.wait() # İşlem bitene kadar bekle
+    log_path = os.path.join(LOG_DIZINI, "app_log.txt")
+
+    command = ["streamlit", "run", app_path, "--server.headless", "true", "--server.port", str(PORT)]
+
+    # Hataları yakalamak için log dosyasını aç; dosya sunucu süreci açık kaldığı sürece kullanılır
+    log_file = open(log_path, "w")
+    return subprocess.Popen(command, stdout=log_file, stderr=log_file, text=True)
+
+def sunucu_hazir_bekle(process, zaman_asimi=HAZIR_ZAMAN_ASIMI):
+    """Sağlık uç noktası yanıt verene kadar bekler; hazırsa None, değilse hata mesajı döndürür."""
+    son = time.perf_counter() + zaman_asimi
+    while time.perf_counter() < son:
+        if process.poll() is not None:
+            return f"Streamlit sunucusu beklenmedik şekilde kapandı (çıkış kodu {process.returncode}). Ayrıntılar için {os.path.join(LOG_DIZINI, 'app_log.txt')} dosyasına bakın."
+        try:
+            with urllib.request.urlopen(SAGLIK_ADRESI, timeout=1) as yanit:
+                if yanit.status == 200:
+                    return None
+        except OSError:
+            pass  # Sunucu henüz dinlemiyor
+        time.sleep(YOKLAMA_ARALIGI)
+    return f"Streamlit sunucusu {zaman_asimi:.0f} saniye içinde hazır olmadı. Ayrıntılar için {os.path.join(LOG_DIZINI, 'app_log.txt')} dosyasına bakın."
+
+def hata_sayfasi(mesaj):
+    return f"""
+    <html><body style="font-family: sans-serif; padding: 40px;">
+        <h2>Stil Diva - Yönetim Paneli başlatılamadı</h2>
+        <p>{mesaj}</p>
+    </body></html>
+    """
 
 if __name__ == '__main__':
     # Streamlit'i başlat
-    streamlit_thread = threading.Thread(target=run_streamlit)
-    streamlit_thread.daemon = True
-    streamlit_thread.start()
-
-    # Sunucunun başlaması için kısa bir bekleme süresi
-    time.sleep(5)
-
-    # Streamlit sunucusuna bağlanan bir webview penceresi oluştur
-    webview.create_window(
-        "Stil Diva - Yönetim Paneli",
-        "http://localhost:8501",
-        width=1280,
-        height=800,
-        resizable=True
-    )
-    webview.start()
\ No newline at end of file
+    process = run_streamlit()
+
+    # Sabit bir süre beklemek yerine sunucu hazır olana kadar sağlık uç noktasını yokla
+    hata = sunucu_hazir_bekle(process)
+    if hata:
+        log.error("Başlatma başarısız (%.2f sn): %s", time.perf_counter() - BASLANGIC, hata)
+        window = webview.create_window("Stil Diva - Yönetim Paneli", html=hata_sayfasi(hata), width=800, height=300)
+    else:
+        log.info("Sunucu hazır: %.2f sn", time.perf_counter() - BASLANGIC)
+
+        # Streamlit sunucusuna bağlanan bir webview penceresi oluştur
+        window = webview.create_window(
+            "Stil Diva - Yönetim Paneli",
+            f"http://localhost:{PORT}",
+            width=1280,
+            height=800,
+            resizable=True
+        )
+        window.events.loaded += lambda: log.info("Etkileşime hazır (pencere yüklendi): %.2f sn", time.perf_counter() - BASLANGIC)
+
+    try:
+        webview.start()
+    finally:
+        # Pencere kapanınca sunucu da kapatılır
+        process.terminate()
@@ -0,0 +1,377 @@
+"""Google Sheets'teki `maliyet_referans/Sayfa1` maliyet tablosunun yerel aynası.
+
+Maliyet tablosu temizlenmiş haliyle (barkod normalizasyonu uygulanmış) diskte
+Parquet olarak tutulur ve tablonun Drive'daki `modifiedTime` değeriyle
+damgalanır. Sayfalar her zaman yerel kopyadan anında açılır; revizyon kontrolü
+ucuz bir Drive meta veri isteğiyle arka planda yapılır ve tablo yalnızca
+değiştiyse yeniden indirilir. Sheets API yavaş ya da erişilemez olduğunda son
+senkronize kopya kullanılmaya devam eder.
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from karlilik_motoru import barkod_normalize
+from siparis_onbellegi import parquet_uyumlu_hale_getir
+from zamanlama import olcum
+
+CALISMA_KITABI = "maliyet_referans"
+CALISMA_SAYFASI = "Sayfa1"
+
+AYNA_DIZINI = os.environ.get("STILDIVA_MALIYET_AYNA_DIZINI", os.path.join(".onbellek", "maliyet"))
+AYNA_DOSYASI = os.path.join(AYNA_DIZINI, "maliyet_referans.parquet")
+META_DOSYASI = os.path.join(AYNA_DIZINI, "maliyet_referans.json")
+# Revizyon kontrolleri arasındaki en kısa süre (saniye)
+REVIZYON_KONTROL_ARALIGI = float(os.environ.get("STILDIVA_MALIYET_KONTROL_SANIYE", "30"))
+
+_kilit = threading.Lock()
+_senkron_calisiyor = threading.Event()
+# Süreç içi kopya: her yeniden çalıştırmada Parquet'i tekrar okumamak için
+_bellek = {"revizyon": None, "df": None}
+_son_kontrol = {"zaman": 0.0, "hata": None}
+
+
+class MaliyetCakismaHatasi(Exception):
+    """Kaydedilmek istenen satırlar bu arada başka biri tarafından değiştirildiğinde fırlatılır."""
+
+    def __init__(self, cakisan_satirlar):
+        self.cakisan_satirlar = cakisan_satirlar
+        super().__init__(
+            f"{len(cakisan_satirlar)} satır siz düzenlerken başka biri tarafından değiştirildi. "
+            "Lütfen sayfayı yenileyip değişikliklerinizi tekrar uygulayın."
+        )
+
+
+def maliyet_tablosunu_temizle(df):
+    """Sheets'ten gelen ham maliyet tablosunu analizde kullanılan formata getirir.
+
+    İndeks korunur: indeks değeri, satırın sayfadaki konumudur (başlık hariç, 0'dan başlar).
+    Alış fiyatı boş satırlar tabloda kalır: maliyeti sonradan girildiğinde aynı
+    satır güncellenir, barkod sayfaya ikinci kez eklenmez. Bu satırlar maliyet
+    aramasında (`MaliyetIndeksi`) maliyeti bilinmiyor sayılır. Sadece tamamen
+    boş (ör. silinmiş) satırlar atılır.
+    """
+    df['Barkod'] = barkod_normalize(df['Barkod'])
+    df['Model Kodu'] = df['Model Kodu'].astype(str).str.strip()
+    df['Alış Fiyatı'] = pd.to_numeric(df['Alış Fiyatı'], errors='coerce')
+    bos_barkod = df['Barkod'].isin(['', 'nan', 'None'])
+    return df[~(bos_barkod & df['Alış Fiyatı'].isna())]
+
+
+def _sayfayi_oku(worksheet):
+    """Sayfayı okur; (temiz tablo, sütun konumları, kullanılan son satır sayısı) döndürür."""
+    from gspread_dataframe import get_as_dataframe
+
+    ham = get_as_dataframe(worksheet, evaluate_formulas=True, drop_empty_columns=False)
+    sutunlar = list(ham.columns)
+    bos_sutunlar = [c for c in sutunlar if str(c).startswith("Unnamed:") and ham[c].isna().all()]
+    ham = ham.drop(columns=bos_sutunlar)
+    satir_sayisi = int(ham.index.max()) + 1 if len(ham) else 0
+    return maliyet_tablosunu_temizle(ham), sutunlar, satir_sayisi
+
+
+def _meta_oku():
+    try:
+        with open(META_DOSYASI, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _ayna_yaz(df, meta):
+    os.makedirs(AYNA_DIZINI, exist_ok=True)
+    gecici_parquet = f"{AYNA_DOSYASI}.{os.getpid()}.tmp"
+    gecici_meta = f"{META_DOSYASI}.{os.getpid()}.tmp"
+    parquet_uyumlu_hale_getir(df.copy()).to_parquet(gecici_parquet, index=True)
+    with open(gecici_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(gecici_parquet, AYNA_DOSYASI)
+    os.replace(gecici_meta, META_DOSYASI)
+    _bellek["df"], _bellek["revizyon"] = df, meta["revizyon"]
+
+
+def _ayna_oku():
+    """Yerel aynayı (varsa) belleğe alır; (meta, df) döndürür."""
+    meta = _meta_oku()
+    revizyon = meta.get("revizyon")
+    if revizyon is None or "sutunlar" not in meta or not os.path.exists(AYNA_DOSYASI):
+        return None, None
+    if _bellek["revizyon"] != revizyon:
+        _bellek["df"] = pd.read_parquet(AYNA_DOSYASI)
+        _bellek["revizyon"] = revizyon
+    return meta, _bellek["df"]
+
+
+def senkronize_et(gc, zorla=False):
+    """Sheets revizyonunu kontrol eder, değiştiyse tabloyu indirip aynayı günceller.
+
+    Güncel revizyonu döndürür. Ağ hataları çağırana iletilir.
+    """
+    # gspread sadece Sheets kaynağı kullanılırken gerekir; SQLite kaynağı onsuz da yüklenebilsin
+    from sheets_istemcisi import calisma_kitabi, calisma_sayfasi, izgara_satir_sayisi, tanitici_onbellegini_temizle
+
+    with _kilit:
+        meta = _meta_oku()
+        spreadsheet_id = meta.get("spreadsheet_id")
+        if spreadsheet_id:
+            revizyon = gc.get_file_drive_metadata(spreadsheet_id)["modifiedTime"]
+            if not zorla and revizyon == meta.get("revizyon") and os.path.exists(AYNA_DOSYASI):
+                return revizyon
+
+        try:
+            # Kitap ve sayfa tanıtıcıları önbellekten gelir; her senkronizasyonda yeniden aranmaz
+            if spreadsheet_id:
+                workbook = calisma_kitabi(gc, spreadsheet_id)
+            else:
+                workbook = calisma_kitabi(gc, ad=CALISMA_KITABI)
+                revizyon = workbook.get_lastUpdateTime()
+            worksheet = calisma_sayfasi(gc, CALISMA_SAYFASI, spreadsheet_id=workbook.id)
+            with olcum('sheets_okuma') as aralik:
+                df, sutunlar, satir_sayisi = _sayfayi_oku(worksheet)
+                aralik.satir = len(df)
+            sayfa_satir_sayisi = izgara_satir_sayisi(gc, workbook.id, worksheet.id)
+        except Exception:
+            # Sayfa silinmiş ya da yeniden adlandırılmış olabilir; sonraki denemede yeniden açılsın
+            tanitici_onbellegini_temizle()
+            raise
+        _ayna_yaz(df, {
+            "spreadsheet_id": workbook.id,
+            "sayfa_id": worksheet.id,
+            "revizyon": revizyon,
+            "senkron_zamani": time.time(),
+            "sutunlar": sutunlar,
+            "satir_sayisi": satir_sayisi,
+            "sayfa_satir_sayisi": sayfa_satir_sayisi,
+        })
+        return revizyon
+
+
+def _arka_planda_senkronize_et(gc):
+    try:
+        senkronize_et(gc)
+        _son_kontrol["hata"] = None
+    except Exception as e:
+        _son_kontrol["hata"] = e
+    finally:
+        _senkron_calisiyor.clear()
+
+
+def maliyet_verisi_yukle(gc):
+    """Maliyet tablosunu yerel aynadan döndürür; gerekirse senkronizasyonu tetikler.
+
+    (df, meta) döndürür; meta, tablonun hangi revizyondan geldiğini ve sayfa
+    düzenini içerir ve kaydederken değişiklik tespiti için saklanmalıdır.
+    Ayna hiç yoksa tablo ilk kez eşzamanlı olarak indirilir. Ayna varsa anında
+    döndürülür ve revizyon kontrolü (en fazla `REVIZYON_KONTROL_ARALIGI`
+    saniyede bir) arka plan iş parçacığında yapılır; yeni veri sonraki yeniden
+    çalıştırmada görünür.
+    """
+    meta, df = _ayna_oku()
+    if df is None:
+        senkronize_et(gc)
+        _son_kontrol["zaman"] = time.time()
+        meta, df = _ayna_oku()
+    elif time.time() - _son_kontrol["zaman"] >= REVIZYON_KONTROL_ARALIGI and not _senkron_calisiyor.is_set():
+        _son_kontrol["zaman"] = time.time()
+        _senkron_calisiyor.set()
+        threading.Thread(target=_arka_planda_senkronize_et, args=(gc,), daemon=True).start()
+    return df, meta
+
+
+def son_senkron_hatasi():
+    """Son arka plan senkronizasyonunda oluşan hatayı (yoksa None) döndürür."""
+    return _son_kontrol["hata"]
+
+
+# ==============================================================================
+# DEĞİŞİKLİK TESPİTİ VE TOPLU YAZMA
+# ==============================================================================
+
+def _bos_mu(deger):
+    return deger is None or (not isinstance(deger, str) and pd.isna(deger))
+
+
+def _hucre(deger):
+    """Bir Python/NumPy değerini Sheets API `CellData` nesnesine çevirir."""
+    if _bos_mu(deger):
+        return {}
+    if hasattr(deger, "item"):
+        deger = deger.item()
+    if isinstance(deger, bool):
+        return {"userEnteredValue": {"boolValue": deger}}
+    if isinstance(deger, (int, float)):
+        return {"userEnteredValue": {"numberValue": deger}}
+    return {"userEnteredValue": {"stringValue": str(deger)}}
+
+
+def _hucre_yaz_istegi(sayfa_id, satir, sutun, hucreler):
+    return {"updateCells": {
+        "rows": [{"values": hucreler}],
+        "fields": "userEnteredValue",
+        "start": {"sheetId": sayfa_id, "rowIndex": satir, "columnIndex": sutun},
+    }}
+
+
+def degisiklikleri_bul(onceki_df, yeni_df, sutunlar=None):
+    """Yüklenen anlık görüntü ile düzenlenmiş tablo arasındaki farkı bulur.
+
+    İndeks, satırın sayfadaki konumudur. Önceki tabloda olmayan indeksler
+    eklenen, yeni tabloda olmayanlar silinen satır sayılır. Sonuç sözlüğü:
+    'guncellenen' ({indeks: {sütun: değer}}), 'eklenen' (DataFrame) ve
+    'silinen' (indeks listesi).
+    """
+    sutunlar = [c for c in (sutunlar or onceki_df.columns) if c in onceki_df.columns and c in yeni_df.columns]
+    ortak = yeni_df.index[yeni_df.index.isin(onceki_df.index)]
+    eklenen = yeni_df[~yeni_df.index.isin(onceki_df.index)]
+    silinen = list(onceki_df.index.difference(yeni_df.index))
+
+    guncellenen = {}
+    if len(ortak):
+        onceki = onceki_df.loc[ortak, sutunlar].astype(object)
+        yeni = yeni_df.loc[ortak, sutunlar].astype(object)
+        farkli = ~((onceki == yeni) | (onceki.isna() & yeni.isna()))
+        satirlar, kolonlar = farkli.to_numpy().nonzero()
+        for i, j in zip(satirlar, kolonlar):
+            guncellenen.setdefault(ortak[i], {})[sutunlar[j]] = yeni.iat[i, j]
+
+    return {'guncellenen': guncellenen, 'eklenen': eklenen, 'silinen': silinen}
+
+
+def barkod_ekle_veya_guncelle(df, urun):
+    """Barkod tabloda varsa satırını günceller, yoksa yeni indeksle sona ekler.
+
+    Mevcut satırların indeksi (sayfa konumu) korunur; böylece kaydederken
+    ürün güncelleme olarak, yeni barkod ise eklenen satır olarak algılanır.
+    """
+    df = df.copy()
+    mevcut = df.index[df['Barkod'] == urun['Barkod']]
+    if len(mevcut):
+        for col, deger in urun.items():
+            df.loc[mevcut, col] = deger
+        return df
+    yeni_indeks = int(df.index.max()) + 1 if len(df) else 0
+    return pd.concat([df, pd.DataFrame([urun], index=[yeni_indeks])])
+
+
+def barkodlari_ekle_veya_guncelle(df, df_urunler):
+    """`barkod_ekle_veya_guncelle`'nin toplu hali; tüm ürünler tablo bir kez kopyalanarak işlenir.
+
+    Var olan barkodların satırları yerinde güncellenir, yeni barkodlar geldiği
+    sırayla yeni indekslerle sona eklenir.
+    """
+    df_urunler = df_urunler.drop_duplicates(subset=['Barkod'], keep='last')
+    df = df.copy()
+    mevcut = df['Barkod'].isin(df_urunler['Barkod'])
+    if mevcut.any():
+        urunler = df_urunler.set_index('Barkod')
+        for col in urunler.columns:
+            df.loc[mevcut, col] = df.loc[mevcut, 'Barkod'].map(urunler[col])
+    yeni = df_urunler[~df_urunler['Barkod'].isin(df['Barkod'])]
+    if yeni.empty:
+        return df
+    ilk_indeks = int(df.index.max()) + 1 if len(df) else 0
+    return pd.concat([df, yeni.set_axis(range(ilk_indeks, ilk_indeks + len(yeni)))])
+
+
+def degisiklik_var_mi(degisiklik):
+    return bool(degisiklik['guncellenen'] or len(degisiklik['eklenen']) or degisiklik['silinen'])
+
+
+def cakismalari_bul(uzak_df, onceki_df, degisiklik):
+    """Düzenlenen/silinen satırlardan uzak tarafta değiştirilmiş olanları döndürür."""
+    dokunulan = list(degisiklik['guncellenen']) + list(degisiklik['silinen'])
+    sutunlar = [c for c in onceki_df.columns if c in uzak_df.columns]
+    cakisan = []
+    for idx in dokunulan:
+        if idx not in uzak_df.index:
+            cakisan.append(idx)
+            continue
+        for col in sutunlar:
+            a, b = onceki_df.at[idx, col], uzak_df.at[idx, col]
+            if not ((_bos_mu(a) and _bos_mu(b)) or a == b):
+                cakisan.append(idx)
+                break
+    return cakisan
+
+
+def degisiklikleri_kaydet(gc, onceki_df, meta, yeni_df):
+    """Düzenlenmiş maliyet tablosunu Sheets'e sadece değişen hücreleri göndererek yazar.
+
+    `onceki_df` ve `meta`, `maliyet_verisi_yukle`'den alınan anlık görüntüdür.
+    Güncellenen hücreler, silinen satırların temizlenmesi ve yeni satırlar tek
+    bir `spreadsheets.batchUpdate` isteğinde gönderilir. Sayfa anlık görüntüden
+    sonra değiştiyse düzenlenen satırlar uzak sürümle karşılaştırılır; aynı
+    satırlar değiştirilmişse `MaliyetCakismaHatasi` fırlatılır. Yeni
+    (df, meta) ve bulunan değişiklikleri döndürür.
+
+    Yazmadan sonraki revizyon kilit bırakılmadan okunur. Drive sürüm numarası
+    yazmadan öncekinin bir fazlası değilse araya başka bir değişiklik girmiştir;
+    ayna o zaman sayfanın tamamından yenilenir.
+    """
+    from sheets_istemcisi import calisma_sayfasi, dosya_surumu, izgara_satir_sayisi
+
+    sutunlar = meta["sutunlar"]
+    degisiklik = degisiklikleri_bul(onceki_df, yeni_df, sutunlar)
+    if not degisiklik_var_mi(degisiklik):
+        return onceki_df, meta, degisiklik
+
+    with _kilit:
+        spreadsheet_id, sayfa_id = meta["spreadsheet_id"], meta["sayfa_id"]
+        satir_sayisi, sayfa_satir_sayisi = meta["satir_sayisi"], meta["sayfa_satir_sayisi"]
+
+        guncel_revizyon, surum = dosya_surumu(gc, spreadsheet_id)
+        sayfa_degisti = guncel_revizyon != meta["revizyon"]
+        if sayfa_degisti:
+            worksheet = calisma_sayfasi(gc, CALISMA_SAYFASI, spreadsheet_id=spreadsheet_id)
+            uzak_df, uzak_sutunlar, satir_sayisi = _sayfayi_oku(worksheet)
+            sayfa_satir_sayisi = izgara_satir_sayisi(gc, spreadsheet_id, sayfa_id)
+            if uzak_sutunlar != sutunlar:
+                raise MaliyetCakismaHatasi(list(degisiklik['guncellenen']) + degisiklik['silinen'])
+            cakisan = cakismalari_bul(uzak_df, onceki_df, degisiklik)
+            if cakisan:
+                raise MaliyetCakismaHatasi(cakisan)
+
+        konum = {ad: i for i, ad in enumerate(sutunlar)}
+        istekler = []
+        # Sayfa satırı = indeks + 1 (0. satır başlık)
+        for idx, hucreler in degisiklik['guncellenen'].items():
+            for col, deger in hucreler.items():
+                istekler.append(_hucre_yaz_istegi(sayfa_id, int(idx) + 1, konum[col], [_hucre(deger)]))
+        for idx in degisiklik['silinen']:
+            istekler.append(_hucre_yaz_istegi(sayfa_id, int(idx) + 1, 0, [{} for _ in sutunlar]))
+
+        eklenen = degisiklik['eklenen'].copy()
+        eklenen.index = range(satir_sayisi, satir_sayisi + len(eklenen))
+        gereken_satir = satir_sayisi + len(eklenen) + 1
+        if gereken_satir > sayfa_satir_sayisi:
+            istekler.insert(0, {"appendDimension": {
+                "sheetId": sayfa_id, "dimension": "ROWS", "length": gereken_satir - sayfa_satir_sayisi,
+            }})
+            sayfa_satir_sayisi = gereken_satir
+        for idx, satir in eklenen.iterrows():
+            hucreler = [_hucre(satir[col]) if col in satir.index else {} for col in sutunlar]
+            istekler.append(_hucre_yaz_istegi(sayfa_id, idx + 1, 0, hucreler))
+
+        gc.http_client.batch_update(spreadsheet_id, {"requests": istekler})
+
+        yeni_revizyon, yeni_surum = dosya_surumu(gc, spreadsheet_id)
+        # Sayfa sadece bu yazmayla değiştiyse ayna, yazılan tablodan güncellenir
+        baskasi_degistirdi = sayfa_degisti or yeni_surum != surum + 1
+        if not baskasi_degistirdi:
+            yeni_df = pd.concat([yeni_df[yeni_df.index.isin(onceki_df.index)], eklenen])
+            _ayna_yaz(maliyet_tablosunu_temizle(yeni_df), dict(
+                meta,
+                revizyon=yeni_revizyon,
+                senkron_zamani=time.time(),
+                satir_sayisi=satir_sayisi + len(eklenen),
+                sayfa_satir_sayisi=sayfa_satir_sayisi,
+            ))
+
+    if baskasi_degistirdi:
+        # Başkalarının değişiklikleri de var; aynayı sayfanın tamamından yenile
+        senkronize_et(gc, zorla=True)
+    meta, df = _ayna_oku()
+    return df, meta, degisiklik
@@ -0,0 +1,336 @@
+"""Maliyet verisi için değiştirilebilir kaynak (repository) katmanı.
+
+Sayfalar maliyet tablosuna doğrudan Google Sheets üzerinden değil, bu modüldeki
+`MaliyetKaynagi` arayüzü üzerinden erişir. İki uygulama vardır:
+
+- `SheetsMaliyetKaynagi`: `maliyet_referans` Google Sheets tablosu (yerel aynası ile).
+- `SqliteMaliyetKaynagi`: barkod ve model koduna göre indekslenmiş yerel SQLite
+  veritabanı; ağ bağlantısı ve servis hesabı gerektirmez.
+
+Hangi kaynağın kullanılacağı `STILDIVA_MALIYET_KAYNAGI` ("sheets" ya da
+"sqlite") ile seçilir. SQLite veritabanı `STILDIVA_MALIYET_SQLITE` yolunda
+(varsayılan `veri/maliyet.sqlite3`) tutulur; bu dizin kalıcı olmalıdır
+(Docker imajında volume olarak tanımlıdır).
+
+SQLite'a geçerken mevcut maliyet tablosu Google Sheets'ten bir kez içeri
+aktarılır; "Maliyet Yönetimi" sayfasındaki içeri aktarma kartı ya da komut
+satırından:
+
+    python maliyet_kaynagi.py --sheets-ten-aktar [--kimlik secrets.json]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+from karlilik_motoru import barkod_normalize
+from maliyet_deposu import (
+    MaliyetCakismaHatasi, barkodlari_ekle_veya_guncelle, cakismalari_bul, degisiklik_var_mi,
+    degisiklikleri_bul, degisiklikleri_kaydet, maliyet_tablosunu_temizle, maliyet_verisi_yukle,
+    senkronize_et, son_senkron_hatasi
+)
+
+KAYNAK_TURU = os.environ.get("STILDIVA_MALIYET_KAYNAGI", "sheets")
+SQLITE_DOSYASI = os.environ.get("STILDIVA_MALIYET_SQLITE", os.path.join("veri", "maliyet.sqlite3"))
+
+MALIYET_SUTUNLARI = ['Model Kodu', 'Barkod', 'Alış Fiyatı']
+
+
+def _barkod(barkod):
+    """Tek bir barkod için `barkod_normalize` ile aynı sonucu verir (nokta sorgular için hızlı yol)."""
+    return re.sub(r'\.0$', '', str(barkod)).strip()
+
+
+# Barkod → satır konumu sözlüğü tablo nesnesi başına bir kez kurulur
+_barkod_konum_onbellegi = {}
+
+
+def _barkod_konumlari(df):
+    kayit = _barkod_konum_onbellegi.get(id(df))
+    if kayit is not None and kayit[0]() is df:
+        return kayit[1]
+    # Aynı barkod birden çok kez geçiyorsa son satır geçerlidir
+    konumlar = dict(zip(barkod_normalize(df['Barkod']), range(len(df))))
+    anahtar = id(df)
+    _barkod_konum_onbellegi[anahtar] = (weakref.ref(df, lambda _: _barkod_konum_onbellegi.pop(anahtar, None)), konumlar)
+    return konumlar
+
+
+class MaliyetKaynagi(ABC):
+    """Maliyet tablosu kaynağı arayüzü.
+
+    `tumunu_yukle` (df, meta) döndürür; df'in indeksi satır kimliğidir ve
+    meta en az 'revizyon' anahtarını içerir. Kaydederken yüklenen anlık
+    görüntü (df, meta) geri verilir; aynı satırlar bu arada başkası
+    tarafından değiştirildiyse `MaliyetCakismaHatasi` fırlatılır.
+    """
+    ad = ""
+
+    @abstractmethod
+    def tumunu_yukle(self):
+        """Maliyet tablosunun tamamını (df, meta) olarak döndürür."""
+
+    def son_hata(self):
+        """Son senkronizasyonda oluşan (kullanıcıya gösterilecek) hata; yoksa None."""
+        return None
+
+    @abstractmethod
+    def kaydet(self, onceki_df, meta, yeni_df):
+        """Düzenlenmiş tabloyu anlık görüntüye göre farkını alarak yazar; (df, meta, değişiklik) döndürür."""
+
+    def barkod_bul(self, barkod):
+        """Barkodun maliyet satırını (Series) döndürür; yoksa None.
+
+        Arama, tablonun her sürümü için bir kez kurulan barkod sözlüğünden
+        yapılır; her tuşta tablo taranmaz.
+        """
+        df, _ = self.tumunu_yukle()
+        konum = _barkod_konumlari(df).get(_barkod(barkod))
+        return None if konum is None else df.iloc[konum]
+
+    def model_bul(self, model_kodu):
+        """Model koduna ait tüm varyantları (barkodları) döndürür."""
+        df, _ = self.tumunu_yukle()
+        return df[df['Model Kodu'] == str(model_kodu).strip()]
+
+    def ekle_veya_guncelle(self, urunler):
+        """Ürünleri (sözlük listesi) barkoda göre ekler ya da günceller; (df, meta, değişiklik) döndürür.
+
+        Tüm ürünler tek bir kayıt işlemiyle (Sheets'te tek toplu istek) yazılır.
+        """
+        onceki_df, meta = self.tumunu_yukle()
+        df = barkodlari_ekle_veya_guncelle(onceki_df, pd.DataFrame(list(urunler)))
+        return self.kaydet(onceki_df, meta, df)
+
+    def sil(self, barkodlar):
+        """Verilen barkodların satırlarını siler; (df, meta, değişiklik) döndürür."""
+        onceki_df, meta = self.tumunu_yukle()
+        barkodlar = set(barkod_normalize(pd.Series(list(barkodlar), dtype=object)))
+        return self.kaydet(onceki_df, meta, onceki_df[~onceki_df['Barkod'].isin(barkodlar)])
+
+
+class SheetsMaliyetKaynagi(MaliyetKaynagi):
+    """Google Sheets `maliyet_referans` tablosu; okumalar yerel aynadan yapılır (bkz. `maliyet_deposu`)."""
+    ad = "Google Sheets"
+
+    def __init__(self, istemci_saglayici):
+        # İstemci sadece gerçekten Sheets'e erişilecekse oluşturulur
+        self._istemci_saglayici = istemci_saglayici
+
+    def tumunu_yukle(self):
+        return maliyet_verisi_yukle(self._istemci_saglayici())
+
+    def son_hata(self):
+        return son_senkron_hatasi()
+
+    def kaydet(self, onceki_df, meta, yeni_df):
+        return degisiklikleri_kaydet(self._istemci_saglayici(), onceki_df, meta, yeni_df)
+
+
+class SqliteMaliyetKaynagi(MaliyetKaynagi):
+    """Barkod ve model koduna göre indekslenmiş yerel SQLite maliyet tablosu."""
+    ad = "yerel veritabanı"
+
+    _SEMA = """
+        CREATE TABLE IF NOT EXISTS maliyet (
+            satir INTEGER PRIMARY KEY,
+            model_kodu TEXT NOT NULL,
+            barkod TEXT NOT NULL UNIQUE,
+            alis_fiyati REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS maliyet_model_kodu ON maliyet (model_kodu);
+        CREATE TABLE IF NOT EXISTS surum (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            revizyon INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO surum (id, revizyon) VALUES (0, 0);
+    """
+    _SUTUN = {'Model Kodu': 'model_kodu', 'Barkod': 'barkod', 'Alış Fiyatı': 'alis_fiyati'}
+    _SECIM = "SELECT satir, model_kodu, barkod, alis_fiyati FROM maliyet"
+
+    def __init__(self, yol=SQLITE_DOSYASI):
+        self.yol = yol
+        if os.path.dirname(yol):
+            os.makedirs(os.path.dirname(yol), exist_ok=True)
+        self._yerel = threading.local()
+        self._bellek = {"revizyon": None, "df": None}
+        self._baglanti().executescript(self._SEMA)
+
+    def _baglanti(self):
+        # SQLite bağlantıları iş parçacıkları arasında paylaşılmaz; her iş parçacığına bir bağlantı
+        baglanti = getattr(self._yerel, "baglanti", None)
+        if baglanti is None:
+            baglanti = sqlite3.connect(self.yol, timeout=30, isolation_level=None)
+            baglanti.execute("PRAGMA journal_mode=WAL")
+            self._yerel.baglanti = baglanti
+        return baglanti
+
+    def _revizyon(self, baglanti):
+        return baglanti.execute("SELECT revizyon FROM surum WHERE id = 0").fetchone()[0]
+
+    def _tablo(self, satirlar):
+        df = pd.DataFrame(satirlar, columns=['satir'] + MALIYET_SUTUNLARI).set_index('satir')
+        df.index.name = None
+        return df
+
+    def tumunu_yukle(self):
+        baglanti = self._baglanti()
+        revizyon = self._revizyon(baglanti)
+        # Tablo değişmediyse her yeniden çalıştırmada tekrar okunmaz
+        if self._bellek["revizyon"] != revizyon:
+            self._bellek["df"] = self._tablo(baglanti.execute(self._SECIM + " ORDER BY satir").fetchall())
+            self._bellek["revizyon"] = revizyon
+        return self._bellek["df"], {"revizyon": revizyon}
+
+    def barkod_bul(self, barkod):
+        satir = self._baglanti().execute(self._SECIM + " WHERE barkod = ?", (_barkod(barkod),)).fetchone()
+        if satir is None:
+            return None
+        return pd.Series(dict(zip(MALIYET_SUTUNLARI, satir[1:])), name=satir[0], dtype=object)
+
+    def model_bul(self, model_kodu):
+        satirlar = self._baglanti().execute(
+            self._SECIM + " WHERE model_kodu = ? ORDER BY satir", (str(model_kodu).strip(),)
+        ).fetchall()
+        return self._tablo(satirlar)
+
+    def _deger(self, sutun, deger):
+        if sutun == 'Barkod':
+            return _barkod(deger)
+        if sutun == 'Alış Fiyatı':
+            return float(deger)
+        return str(deger).strip()
+
+    def _yaz(self, yaz):
+        """`yaz(baglanti)` fonksiyonunu tek bir yazma işleminde çalıştırıp revizyonu artırır."""
+        baglanti = self._baglanti()
+        try:
+            baglanti.execute("BEGIN IMMEDIATE")
+            yaz(baglanti)
+            baglanti.execute("UPDATE surum SET revizyon = revizyon + 1 WHERE id = 0")
+            baglanti.execute("COMMIT")
+        except sqlite3.IntegrityError as e:
+            baglanti.execute("ROLLBACK")
+            raise ValueError(f"Maliyet tablosu kaydedilemedi; barkodların tekil, alanların dolu olduğundan emin olun ({e}).") from e
+        except BaseException:
+            baglanti.execute("ROLLBACK")
+            raise
+
+    def kaydet(self, onceki_df, meta, yeni_df):
+        degisiklik = degisiklikleri_bul(onceki_df, yeni_df, MALIYET_SUTUNLARI)
+        if not degisiklik_var_mi(degisiklik):
+            return onceki_df, meta, degisiklik
+        # Veritabanında alış fiyatı zorunludur; fiyatı boş yeni satırlar yazılmaz
+        eklenen = maliyet_tablosunu_temizle(degisiklik['eklenen'].reindex(columns=MALIYET_SUTUNLARI)).dropna(subset=['Alış Fiyatı'])
+
+        def yaz(baglanti):
+            if self._revizyon(baglanti) != meta["revizyon"]:
+                dokunulan = list(degisiklik['guncellenen']) + list(degisiklik['silinen'])
+                yer = ",".join("?" * len(dokunulan))
+                uzak_df = self._tablo(baglanti.execute(
+                    f"{self._SECIM} WHERE satir IN ({yer})", [int(i) for i in dokunulan]
+                ).fetchall())
+                cakisan = cakismalari_bul(uzak_df, onceki_df, degisiklik)
+                if cakisan:
+                    raise MaliyetCakismaHatasi(cakisan)
+
+            for idx, hucreler in degisiklik['guncellenen'].items():
+                atamalar = ", ".join(f"{self._SUTUN[col]} = ?" for col in hucreler)
+                degerler = [self._deger(col, deger) for col, deger in hucreler.items()]
+                baglanti.execute(f"UPDATE maliyet SET {atamalar} WHERE satir = ?", degerler + [int(idx)])
+            baglanti.executemany("DELETE FROM maliyet WHERE satir = ?", [(int(i),) for i in degisiklik['silinen']])
+            baglanti.executemany(
+                "INSERT INTO maliyet (model_kodu, barkod, alis_fiyati) VALUES (?, ?, ?) "
+                "ON CONFLICT (barkod) DO UPDATE SET model_kodu = excluded.model_kodu, alis_fiyati = excluded.alis_fiyati",
+                eklenen[MALIYET_SUTUNLARI].itertuples(index=False, name=None),
+            )
+
+        self._yaz(yaz)
+        df, meta = self.tumunu_yukle()
+        return df, meta, degisiklik
+
+    def ekle_veya_guncelle(self, urunler):
+        onceki_df, meta = self.tumunu_yukle()
+        df = maliyet_tablosunu_temizle(pd.DataFrame(list(urunler)).reindex(columns=MALIYET_SUTUNLARI)).dropna(subset=['Alış Fiyatı'])
+        self._yaz(lambda baglanti: baglanti.executemany(
+            "INSERT INTO maliyet (model_kodu, barkod, alis_fiyati) VALUES (?, ?, ?) "
+            "ON CONFLICT (barkod) DO UPDATE SET model_kodu = excluded.model_kodu, alis_fiyati = excluded.alis_fiyati",
+            df.itertuples(index=False, name=None),
+        ))
+        yeni_df, yeni_meta = self.tumunu_yukle()
+        return yeni_df, yeni_meta, degisiklikleri_bul(onceki_df, yeni_df, MALIYET_SUTUNLARI)
+
+    def sil(self, barkodlar):
+        onceki_df, meta = self.tumunu_yukle()
+        barkodlar = [(_barkod(b),) for b in barkodlar]
+        self._yaz(lambda baglanti: baglanti.executemany("DELETE FROM maliyet WHERE barkod = ?", barkodlar))
+        yeni_df, yeni_meta = self.tumunu_yukle()
+        return yeni_df, yeni_meta, degisiklikleri_bul(onceki_df, yeni_df, MALIYET_SUTUNLARI)
+
+    def iceri_aktar(self, df_maliyet):
+        """Bir maliyet tablosunun (ör. Sheets'ten alınan) tamamını veritabanına yazar; yazılan satır sayısını döndürür.
+
+        Veritabanındaki mevcut satırlar silinir.
+        """
+        df = (maliyet_tablosunu_temizle(df_maliyet[MALIYET_SUTUNLARI].copy())
+              .dropna(subset=['Alış Fiyatı']).drop_duplicates('Barkod', keep='last'))
+
+        def yaz(baglanti):
+            baglanti.execute("DELETE FROM maliyet")
+            baglanti.executemany(
+                "INSERT INTO maliyet (model_kodu, barkod, alis_fiyati) VALUES (?, ?, ?)",
+                df.itertuples(index=False, name=None),
+            )
+        self._yaz(yaz)
+        return len(df)
+
+    def sheets_ten_aktar(self, istemci_saglayici):
+        """Google Sheets maliyet tablosunu güncel haliyle indirip veritabanına yazar; yazılan satır sayısını döndürür."""
+        gc = istemci_saglayici()
+        senkronize_et(gc, zorla=True)
+        df, _ = maliyet_verisi_yukle(gc)
+        return self.iceri_aktar(df)
+
+
+def maliyet_kaynagi_olustur(istemci_saglayici=None, tur=None):
+    """Ayarlara göre maliyet kaynağını oluşturur.
+
+    `istemci_saglayici`, Sheets kaynağı için gspread istemcisini döndüren fonksiyondur.
+    """
+    tur = tur or KAYNAK_TURU
+    if tur == "sqlite":
+        return SqliteMaliyetKaynagi()
+    if tur == "sheets":
+        return SheetsMaliyetKaynagi(istemci_saglayici)
+    raise ValueError(f"Bilinmeyen maliyet kaynağı: {tur}")
+
+
+def main(argv=None):
+    ayristirici = argparse.ArgumentParser(description="Maliyet kaynağı yönetimi")
+    ayristirici.add_argument("--sheets-ten-aktar", action="store_true",
+                             help="Google Sheets maliyet tablosunu SQLite veritabanına aktar (mevcut satırlar silinir)")
+    ayristirici.add_argument("--kimlik", default="secrets.json", help="Servis hesabı kimlik bilgisi dosyası")
+    ayristirici.add_argument("--veritabani", default=SQLITE_DOSYASI, help="SQLite veritabanı yolu")
+    args = ayristirici.parse_args(argv)
+    if not args.sheets_ten_aktar:
+        ayristirici.print_help()
+        return
+
+    def istemci():
+        from google.oauth2.service_account import Credentials
+        from sheets_istemcisi import istemci_olustur
+
+        scopes = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+        return istemci_olustur(Credentials.from_service_account_file(args.kimlik, scopes=scopes))
+
+    satir = SqliteMaliyetKaynagi(args.veritabani).sheets_ten_aktar(istemci)
+    print(f"{satir} maliyet satırı {args.veritabani} veritabanına aktarıldı.")
+
+
+if __name__ == "__main__":
+    main()
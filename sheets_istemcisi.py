@@ -0,0 +1,146 @@
+"""Süreç genelinde paylaşılan Google Sheets (gspread) istemcisi.
+
+Tüm oturumlar tek bir istemciyi kullanır: HTTP bağlantıları yeniden
+kullanılır, OAuth jetonu süresi dolmadan tek bir iş parçacığı tarafından
+yenilenir ve kota/geçici sunucu hatalarında okuma (GET) istekleri artan
+bekleme süreleriyle yeniden denenir. Yazma istekleri (batchUpdate, append)
+sunucuya ulaşıp uygulanmış olabileceğinden tekrar gönderilmez; hata çağırana
+iletilir. Çalışma kitabı ve sayfa tanıtıcıları önbellekte tutulur;
+`gc.open(...)` ile her işlemde yeniden aranmaz.
+"""
+import random
+import threading
+import time
+
+import gspread
+import requests
+from google.auth.transport.requests import Request
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from gspread.urls import DRIVE_FILES_API_V3_URL
+
+# Yeniden deneme ayarları (saniye)
+MAKS_DENEME = 5
+TABAN_BEKLEME = 1.0
+MAKS_BEKLEME = 32.0
+
+# Kota aşımı ya da geçici sunucu hatası anlamına gelen durumlar
+_TEKRAR_DENENECEK_KODLAR = {408, 429, 500, 502, 503, 504}
+_KOTA_NEDENLERI = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+# Tekrar gönderilmesi yan etki doğurmayan (idempotent) HTTP yöntemleri
+_TEKRAR_DENENEBILIR_YONTEMLER = {"GET", "HEAD"}
+
+
+def _tekrar_denenir_mi(hata):
+    if isinstance(hata, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if not isinstance(hata, APIError):
+        return False
+    if hata.code in _TEKRAR_DENENECEK_KODLAR:
+        return True
+    # Drive API kota aşımını 403 ile bildirir
+    nedenler = {e.get("reason") for e in (hata.error or {}).get("errors", []) if isinstance(e, dict)}
+    return hata.code == 403 and bool(nedenler & _KOTA_NEDENLERI)
+
+
+class YenidenDenemeliHTTPClient(HTTPClient):
+    """Jetonu iş parçacığı güvenli yenileyen, kota hatalarında okuma isteklerini yeniden deneyen HTTP istemcisi."""
+
+    def __init__(self, auth, session=None):
+        super().__init__(auth, session)
+        self._yenileme_kilidi = threading.Lock()
+
+    def _jetonu_yenile(self):
+        # Aynı anda birden çok oturumun jeton yenilemesini önle
+        auth = getattr(self, "auth", None)  # Hazır oturum verildiyse kimlik bilgisi oturumdadır
+        if auth is not None and not auth.valid:
+            with self._yenileme_kilidi:
+                if not auth.valid:
+                    auth.refresh(Request())
+
+    def request(self, method, endpoint, *args, **kwargs):
+        deneme_sayisi = MAKS_DENEME if method.upper() in _TEKRAR_DENENEBILIR_YONTEMLER else 1
+        for deneme in range(deneme_sayisi):
+            self._jetonu_yenile()
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except (APIError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if deneme == deneme_sayisi - 1 or not _tekrar_denenir_mi(e):
+                    raise
+                # Üstel bekleme; aynı anda bekleyen istekler aynı anda dönmesin diye rastgele pay
+                time.sleep(min(MAKS_BEKLEME, TABAN_BEKLEME * 2 ** deneme) * random.uniform(0.5, 1.0))
+
+
+def istemci_olustur(kimlik_bilgisi, zaman_asimi=None):
+    """Servis hesabı kimlik bilgisinden paylaşılacak gspread istemcisini oluşturur."""
+    gc = gspread.authorize(kimlik_bilgisi, http_client=YenidenDenemeliHTTPClient)
+    if zaman_asimi is not None:
+        gc.set_timeout(zaman_asimi)
+    return gc
+
+
+_tanitici_kilidi = threading.Lock()
+_kitaplar = {}
+_sayfalar = {}
+
+
+def calisma_kitabi(gc, spreadsheet_id=None, ad=None):
+    """Çalışma kitabı tanıtıcısını önbellekten döndürür; yoksa kimliğe (ya da ada) göre açar."""
+    anahtar = (id(gc), spreadsheet_id or ad)
+    with _tanitici_kilidi:
+        kitap = _kitaplar.get(anahtar)
+    if kitap is None:
+        kitap = gc.open_by_key(spreadsheet_id) if spreadsheet_id else gc.open(ad)
+        with _tanitici_kilidi:
+            _kitaplar[anahtar] = kitap
+            _kitaplar[(id(gc), kitap.id)] = kitap
+    return kitap
+
+
+def calisma_sayfasi(gc, sayfa_adi, spreadsheet_id=None, kitap_adi=None):
+    """Sayfa tanıtıcısını önbellekten döndürür.
+
+    Tanıtıcıdaki satır sayısı gibi özellikler açıldığı andaki değerlerdir;
+    güncel ızgara boyutu için `izgara_satir_sayisi` kullanılmalıdır.
+    """
+    kitap = calisma_kitabi(gc, spreadsheet_id, kitap_adi)
+    anahtar = (id(gc), kitap.id, sayfa_adi)
+    with _tanitici_kilidi:
+        sayfa = _sayfalar.get(anahtar)
+    if sayfa is None:
+        sayfa = kitap.worksheet(sayfa_adi)
+        with _tanitici_kilidi:
+            _sayfalar[anahtar] = sayfa
+    return sayfa
+
+
+def izgara_satir_sayisi(gc, spreadsheet_id, sayfa_id):
+    """Sayfanın güncel ızgara satır sayısını sadece gereken alanı isteyerek okur."""
+    meta = gc.http_client.fetch_sheet_metadata(
+        spreadsheet_id, params={"fields": "sheets(properties(sheetId,gridProperties(rowCount)))"}
+    )
+    for sayfa in meta["sheets"]:
+        if sayfa["properties"]["sheetId"] == sayfa_id:
+            return sayfa["properties"]["gridProperties"]["rowCount"]
+    raise KeyError(f"Sayfa bulunamadı: {sayfa_id}")
+
+
+def dosya_surumu(gc, spreadsheet_id):
+    """Dosyanın Drive'daki (modifiedTime, version) ikilisini tek bir meta veri isteğiyle okur.
+
+    `version` dosyadaki her değişiklikte artar; iki okuma arasında araya
+    başka bir yazma girip girmediği bununla anlaşılır.
+    """
+    yanit = gc.http_client.request(
+        "get", f"{DRIVE_FILES_API_V3_URL}/{spreadsheet_id}",
+        params={"supportsAllDrives": True, "fields": "modifiedTime,version"},
+    )
+    meta = yanit.json()
+    return meta["modifiedTime"], int(meta["version"])
+
+
+def tanitici_onbellegini_temizle():
+    """Sayfa silinip yeniden oluşturulduğunda olduğu gibi eski tanıtıcıları unutur."""
+    with _tanitici_kilidi:
+        _kitaplar.clear()
+        _sayfalar.clear()
@@ -0,0 +1,279 @@
+"""Aylara bölümlenmiş, kalıcı yerel sipariş deposu.
+
+Yüklenen her Pixa dökümü depoya eklenir; analiz sayfası tekrar yükleme
+yapmadan tüm geçmiş üzerinde istenen tarih aralığını sorgular. Her ay
+`ay=YYYY-AA/siparisler.parquet` dosyasında tutulur; bir tarih aralığı
+sorgusu sadece o aralığa düşen ayların dosyalarını okur.
+
+Bir sipariş satırı (`Sipariş No`, `Barkod`) anahtarıyla tanımlanır. Aynı
+dökümde aynı anahtarla birden çok satır varsa bunlar ayrı satışlardır ve tek
+satırda toplanır; çakışan dökümlerde ise en son eklenen döküm geçerli sayılır.
+Ay listesi, satır sayıları ve tarih sınırları küçük bir özet dosyasında
+tutulur; filtreler için veri dosyalarını okumak gerekmez.
+
+Her ay için ekleme sırasında günlük özet tabloları da yazılır (bkz.
+`gunluk_ozet_olustur`); kârlılık analizi sipariş satırları yerine bunları okur.
+Özet tabloları güne göre sıralı yazılır ve aylar sırayla birleştirildiğinden
+tarih aralığı maske yerine ikili aramayla kesilir.
+"""
+import json
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from zamanlama import olcum
+
+DEPO_DIZINI = os.environ.get("STILDIVA_SIPARIS_DEPOSU", "siparis_deposu")
+OZET_DOSYASI = "ozet.json"
+# Aynı sipariş satırını tanımlayan sütunlar
+TEKIL_ANAHTAR = ['Sipariş No', 'Barkod']
+KATEGORIK_SUTUNLAR = ['Platform', 'Barkod', 'Model Kodu', 'Sipariş No']
+
+_yazma_kilidi = threading.Lock()
+
+
+def _ay_yolu(ay, tablo="siparisler"):
+    return os.path.join(DEPO_DIZINI, f"ay={ay}", f"{tablo}.parquet")
+
+
+def _ozet_yolu():
+    return os.path.join(DEPO_DIZINI, OZET_DOSYASI)
+
+
+def _atomik_yaz(yol, yaz):
+    gecici_yol = f"{yol}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(yol), exist_ok=True)
+    try:
+        yaz(gecici_yol)
+        os.replace(gecici_yol, yol)
+    finally:
+        if os.path.exists(gecici_yol):
+            os.remove(gecici_yol)
+
+
+def depo_ozeti():
+    """Deponun özetini döndürür: revizyon, ay bazında satır sayısı/tarih sınırları/platformlar."""
+    try:
+        with open(_ozet_yolu(), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'revizyon': 0, 'aylar': {}, 'yuklenenler': []}
+
+
+def _ozet_yaz(ozet):
+    def yaz(yol):
+        with open(yol, "w", encoding="utf-8") as f:
+            json.dump(ozet, f, ensure_ascii=False, indent=1)
+    _atomik_yaz(_ozet_yolu(), yaz)
+
+
+def siparis_no_metin(seri):
+    """Sipariş numaralarını dökümler arasında karşılaştırılabilir metne çevirir.
+
+    Excel'in sayı olarak okuduğu numaralar tam sayı metnine çevrilir (123 ve
+    123.0 → '123'); metin olarak gelen numaralar sadece kırpılır, baştaki
+    sıfırlar ve uzun numaralar korunur. Boş değerler boş kalır.
+    """
+    metin = seri.astype(str).str.strip().where(seri.notna())
+    if pd.api.types.is_float_dtype(seri):
+        ondalik = (seri % 1 == 0).to_numpy()
+    elif seri.dtype == object:
+        ondalik = np.fromiter((isinstance(x, float) and x.is_integer() for x in seri.to_numpy()), dtype=bool, count=len(seri))
+    else:
+        return metin
+    if ondalik.any():
+        metin[ondalik] = [f"{x:.0f}" for x in seri[ondalik].to_numpy(dtype=float)]
+    return metin
+
+
+def _depo_tiplerine_cevir(df):
+    """Farklı dökümlerden gelen tabloların birleştirilebilmesi için sütun tiplerini sabitler."""
+    df = df.copy()
+    df['Sipariş Tarihi'] = df['Sipariş Tarihi'].astype('datetime64[ns]')
+    df['Sipariş No'] = siparis_no_metin(df['Sipariş No'].astype(object))
+    df['Tutar'] = df['Tutar'].astype('float64')
+    for col in KATEGORIK_SUTUNLAR:
+        if col in df.columns:
+            df[col] = df[col].astype(str).where(df[col].notna()).astype('category')
+    return df
+
+
+def _birlestir(tablolar):
+    """Kategorik sütunları farklı kategorilere sahip tabloları birleştirip yeniden kategorik yapar."""
+    df = pd.concat(tablolar, ignore_index=True)
+    for col in KATEGORIK_SUTUNLAR:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'Miktar' in df.columns and (df['Miktar'] % 1 == 0).all():
+        df['Miktar'] = pd.to_numeric(df['Miktar'].astype('int64'), downcast='integer')
+    return df
+
+
+def _tekrarlanan_satirlari_topla(df):
+    """Aynı dökümde aynı (`Sipariş No`, `Barkod`) ile birden çok kez geçen satırları tek satırda toplar.
+
+    Miktarlar toplanır, Tutar (birim fiyat) miktar ağırlıklı ortalamaya
+    çevrilir; diğer sütunlarda ilk satır geçerlidir.
+    """
+    tekrar = df.duplicated(TEKIL_ANAHTAR, keep=False).to_numpy()
+    if not tekrar.any():
+        return df
+    df_tekrar = df[tekrar]
+    # sort=False ile grup numaraları ilk görülme sırasındadır; ilk satırlar da aynı sıradadır
+    grup = df_tekrar.groupby(TEKIL_ANAHTAR, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    df_toplam = df_tekrar[~pd.Series(grup).duplicated().to_numpy()].copy()
+    miktar = np.bincount(grup, weights=df_tekrar['Miktar'].to_numpy(dtype=float))
+    ciro = np.bincount(grup, weights=(df_tekrar['Tutar'] * df_tekrar['Miktar']).to_numpy(dtype=float))
+    df_toplam['Tutar'] = np.where(miktar != 0, ciro / np.where(miktar != 0, miktar, 1), df_toplam['Tutar'])
+    df_toplam['Miktar'] = miktar
+    return _birlestir([df[~tekrar], df_toplam])
+
+
+def _ay_oku(ay):
+    return pd.read_parquet(_ay_yolu(ay))
+
+
+def gunluk_ozet_olustur(df_siparis):
+    """Sipariş satırlarından günlük özet tablolarını üretir.
+
+    (df_gunluk, df_siparis_sayisi) döndürür: ilki (Gün, Platform, Barkod)
+    başına Miktar, Ciro (Tutar × Miktar) ve Satir sayısı, ikincisi (Gün,
+    Platform) başına benzersiz Siparis_Sayisi; ikisi de Gün, Platform
+    sırasıyla sıralıdır. Bir siparişin tüm satırları aynı gün ve platformda
+    olduğundan sipariş sayıları toplanabilir. Model kodu burada tutulmaz;
+    barkodlar analiz sırasında güncel maliyet tablosuyla modele eşlenir.
+    """
+    gun = df_siparis['Sipariş Tarihi'].dt.floor('D').rename('Gün')
+    df = pd.DataFrame({
+        'Gün': gun,
+        'Platform': df_siparis['Platform'],
+        'Barkod': df_siparis['Barkod'],
+        'Miktar': df_siparis['Miktar'],
+        'Ciro': df_siparis['Tutar'] * df_siparis['Miktar'],
+    })
+    df_gunluk = (
+        df.groupby(['Gün', 'Platform', 'Barkod'], observed=True, dropna=False, sort=True)
+        .agg(Miktar=('Miktar', 'sum'), Ciro=('Ciro', 'sum'), Satir=('Miktar', 'size'))
+        .reset_index()
+    )
+    df_siparis_sayisi = (
+        df_siparis.groupby([gun, df_siparis['Platform']], observed=True, dropna=False, sort=True)['Sipariş No']
+        .nunique().rename('Siparis_Sayisi').reset_index()
+    )
+    return df_gunluk, df_siparis_sayisi
+
+
+def _ozet_tablolarini_yaz(ay, df_ay):
+    df_gunluk, df_siparis_sayisi = gunluk_ozet_olustur(df_ay)
+    _atomik_yaz(_ay_yolu(ay, "gunluk"), lambda yol: df_gunluk.to_parquet(yol, index=False))
+    _atomik_yaz(_ay_yolu(ay, "gunluk_siparis"), lambda yol: df_siparis_sayisi.to_parquet(yol, index=False))
+    return df_gunluk, df_siparis_sayisi
+
+
+def _ozet_tablolarini_oku(ay):
+    try:
+        return pd.read_parquet(_ay_yolu(ay, "gunluk")), pd.read_parquet(_ay_yolu(ay, "gunluk_siparis"))
+    except FileNotFoundError:
+        # Günlük özetlerden önce oluşturulmuş depo: ay dosyasından bir kez üretilir
+        with _yazma_kilidi:
+            return _ozet_tablolarini_yaz(ay, _ay_oku(ay))
+
+
+def depoya_ekle(df_siparis, kaynak=None):
+    """Ayrıştırılmış sipariş tablosunu depoya ekler.
+
+    Sadece tablonun düştüğü ayların dosyaları yeniden yazılır. Tablo içinde
+    tekrarlanan (`Sipariş No`, `Barkod`) satırları toplanır; aynı satır
+    depoda önceki bir dökümden zaten varsa yenisiyle değiştirilir.
+    `kaynak` (ör. dosyanın içerik özeti) verilirse aynı dosya ikinci kez
+    eklenmez. {'eklenen', 'guncellenen', 'aylar'} sözlüğü döndürür.
+    """
+    sonuc = {'eklenen': 0, 'guncellenen': 0, 'aylar': []}
+    if df_siparis.empty:
+        return sonuc
+    with _yazma_kilidi, olcum('siparis_deposu_ekleme', satir=len(df_siparis)):
+        ozet = depo_ozeti()
+        if kaynak is not None and kaynak in ozet['yuklenenler']:
+            return sonuc
+
+        df_yeni = _tekrarlanan_satirlari_topla(_depo_tiplerine_cevir(df_siparis))
+        aylar = df_yeni['Sipariş Tarihi'].dt.strftime('%Y-%m')
+        for ay, df_ay in df_yeni.groupby(aylar, sort=True):
+            if ay in ozet['aylar']:
+                df_eski = _ay_oku(ay)
+                eski_anahtarlar = pd.MultiIndex.from_frame(df_eski[TEKIL_ANAHTAR].astype(str))
+                yeni_anahtarlar = pd.MultiIndex.from_frame(df_ay[TEKIL_ANAHTAR].astype(str))
+                mevcut = yeni_anahtarlar.isin(eski_anahtarlar)
+                sonuc['guncellenen'] += int(mevcut.sum())
+                sonuc['eklenen'] += int((~mevcut).sum())
+                # Sadece önceki dökümlerden gelen ve bu dökümde yeniden gelen satırlar değiştirilir
+                df_ay = _birlestir([df_eski[~eski_anahtarlar.isin(yeni_anahtarlar)], df_ay])
+            else:
+                sonuc['eklenen'] += len(df_ay)
+            _atomik_yaz(_ay_yolu(ay), lambda yol: df_ay.to_parquet(yol, index=False))
+            _ozet_tablolarini_yaz(ay, df_ay)
+            ozet['aylar'][ay] = {
+                'satir': len(df_ay),
+                'min_tarih': df_ay['Sipariş Tarihi'].min().isoformat(),
+                'maks_tarih': df_ay['Sipariş Tarihi'].max().isoformat(),
+                'platformlar': sorted(df_ay['Platform'].dropna().astype(str).unique().tolist()),
+            }
+            sonuc['aylar'].append(ay)
+
+        ozet['aylar'] = dict(sorted(ozet['aylar'].items()))
+        if kaynak is not None:
+            ozet['yuklenenler'].append(kaynak)
+        ozet['revizyon'] += 1
+        _ozet_yaz(ozet)
+    return sonuc
+
+
+def ay_araligi(baslangic, bitis):
+    """İki tarih arasındaki (iki uç dahil) ayları 'YYYY-AA' olarak döndürür."""
+    return [d.strftime('%Y-%m') for d in pd.period_range(baslangic, bitis, freq='M')]
+
+
+def gunluk_ozetleri_oku(baslangic, bitis, platformlar=None):
+    """Tarih aralığı ve platformlar için günlük özet tablolarını döndürür.
+
+    (df_gunluk, df_siparis_sayisi) döndürür; sadece aralıkla kesişen ayların
+    özet dosyaları okunur. Birleştirilen tablo güne göre sıralı olduğundan
+    tarih aralığı ikili aramayla kesilir; platform filtresi sadece bu dilime
+    uygulanır.
+    """
+    mevcut_aylar = depo_ozeti()['aylar']
+    aylar = [ay for ay in ay_araligi(baslangic, bitis) if ay in mevcut_aylar]
+    with olcum('gunluk_ozet_okuma') as aralik:
+        if not aylar:
+            return pd.DataFrame(), pd.DataFrame()
+        gunluk, siparis_sayisi = zip(*(_ozet_tablolarini_oku(ay) for ay in aylar))
+        df_gunluk, df_siparis_sayisi = _birlestir(gunluk), _birlestir(siparis_sayisi)
+        alt, ust = pd.Timestamp(baslangic), pd.Timestamp(bitis)
+        df_gunluk = _ozet_dilimle(df_gunluk, alt, ust, platformlar)
+        df_siparis_sayisi = _ozet_dilimle(df_siparis_sayisi, alt, ust, platformlar)
+        aralik.satir = len(df_gunluk)
+    return df_gunluk, df_siparis_sayisi
+
+
+def _ozet_dilimle(df, alt, ust, platformlar):
+    gunler = df['Gün'].to_numpy()
+    bas, son = gunler.searchsorted(np.datetime64(alt), side='left'), gunler.searchsorted(np.datetime64(ust), side='right')
+    df = df.iloc[bas:son]
+    if platformlar is not None:
+        df = df[df['Platform'].isin(platformlar).to_numpy()]
+    return df.reset_index(drop=True)
+
+
+def depo_sinirlari(ozet=None):
+    """Depodaki (en eski tarih, en yeni tarih, platformlar) üçlüsünü özetten döndürür; depo boşsa None."""
+    ozet = ozet or depo_ozeti()
+    if not ozet['aylar']:
+        return None
+    aylar = ozet['aylar'].values()
+    min_tarih = min(date.fromisoformat(a['min_tarih'][:10]) for a in aylar)
+    maks_tarih = max(date.fromisoformat(a['maks_tarih'][:10]) for a in aylar)
+    platformlar = sorted({p for a in aylar for p in a['platformlar']})
+    return min_tarih, maks_tarih, platformlar
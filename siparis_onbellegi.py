@@ -0,0 +1,204 @@
+"""Yüklenen Pixa sipariş Excel dosyaları için içerik özetine (hash) göre disk önbelleği.
+
+Aynı baytlar tekrar yüklendiğinde (hangi oturumdan olursa olsun) Excel yeniden
+ayrıştırılmaz; ilk ayrıştırmada kaydedilen tipli Parquet dosyası okunur.
+Excel'den sadece sayfaların kullandığı sütunlar okunur, tipleri doğrulanır ve
+bellekte küçük yer kaplayan tiplere (kategorik, küçültülmüş sayısal) çevrilir.
+"""
+import hashlib
+import io
+import os
+import time
+
+import pandas as pd
+
+from karlilik_motoru import barkod_anahtari
+from siparis_deposu import siparis_no_metin
+from zamanlama import olcum
+
+ONBELLEK_DIZINI = os.environ.get("STILDIVA_ONBELLEK_DIZINI", os.path.join(".onbellek", "siparisler"))
+# Önbellek bu boyutu aşarsa en eski kullanılan dosyalar silinir
+MAKS_ONBELLEK_MB = float(os.environ.get("STILDIVA_ONBELLEK_MAKS_MB", "1024"))
+# Kaydedilen tablonun biçimi değiştiğinde artırılır; eski dosyalar kullanılmaz ve zamanla silinir
+ONBELLEK_SURUMU = 1
+# Bu süreden uzun süredir kullanılmayan dosyalar silinir
+MAKS_ONBELLEK_GUN = float(os.environ.get("STILDIVA_ONBELLEK_MAKS_GUN", "30"))
+
+# Sayfaların kullandığı sütunlar; Excel'deki diğer sütunlar okunmaz
+ZORUNLU_SUTUNLAR = ['Sipariş Tarihi', 'Platform', 'Barkod', 'Miktar', 'Tutar', 'Sipariş No']
+# Varsa okunan, yoksa sorun çıkarmayan sütunlar
+ISTEGE_BAGLI_SUTUNLAR = ['Model Kodu']
+
+
+def icerik_hash(veri):
+    """Dosya içeriğinin (bayt) özetini döndürür; önbellek anahtarı olarak kullanılır."""
+    return hashlib.sha256(veri).hexdigest()
+
+
+def _onbellek_yolu(anahtar):
+    return os.path.join(ONBELLEK_DIZINI, f"v{ONBELLEK_SURUMU}-{anahtar}.parquet")
+
+
+def _hatalar_yolu(anahtar):
+    return os.path.join(ONBELLEK_DIZINI, f"v{ONBELLEK_SURUMU}-{anahtar}.hatalar.parquet")
+
+
+def parquet_uyumlu_hale_getir(df):
+    """Karışık tipli (ör. hem sayı hem metin barkod) object sütunları metne çevirir.
+
+    Parquet her sütun için tek tip ister. Boş değerler korunur; metne çevirme
+    sonraki barkod temizliğinin (`astype(str)`) vereceği sonuçla aynıdır.
+    """
+    for col in df.columns:
+        if df[col].dtype == object:
+            tipler = df[col].dropna().map(type).unique()
+            if len(tipler) > 1:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def siparis_tablosunu_sikistir(df_siparis):
+    """Sipariş tablosunun tiplerini doğrular ve sütunları küçük tiplere çevirir.
+
+    (df, df_hatali) döndürür. Tarihi, miktarı veya tutarı okunamayan ya da
+    sipariş numarası boş olan satırlar analizden çıkarılır ve 'Hata' sütunuyla birlikte df_hatali'da raporlanır.
+    """
+    tarih = pd.to_datetime(df_siparis['Sipariş Tarihi'], errors='coerce')
+    miktar = pd.to_numeric(df_siparis['Miktar'], errors='coerce')
+    tutar = pd.to_numeric(df_siparis['Tutar'], errors='coerce')
+
+    hata = pd.Series('', index=df_siparis.index)
+    # Boş sipariş numarası tek bir "nan" siparişi gibi sayılmasın diye satır raporlanır
+    hata = hata.mask(df_siparis['Sipariş No'].isna(), 'Sipariş No boş')
+    hata = hata.mask(tutar.isna(), 'Tutar sayı değil')
+    hata = hata.mask(miktar.isna(), 'Miktar sayı değil')
+    hata = hata.mask(tarih.isna(), 'Sipariş Tarihi okunamadı')
+    hatali = (hata != '').to_numpy()
+    df_hatali = df_siparis[hatali].astype(str).assign(Hata=hata[hatali])
+
+    gecerli = ~hatali
+    df = pd.DataFrame({
+        'Sipariş Tarihi': tarih[gecerli],
+        'Platform': df_siparis['Platform'][gecerli].astype('category'),
+        'Barkod': barkod_anahtari(df_siparis['Barkod'][gecerli]),
+        'Miktar': miktar[gecerli],
+        # Para tutarları toplamların değişmemesi için float64 olarak kalır
+        'Tutar': tutar[gecerli].astype('float64'),
+        'Sipariş No': df_siparis['Sipariş No'][gecerli],
+    }).reset_index(drop=True)
+
+    if (df['Miktar'] % 1 == 0).all():
+        df['Miktar'] = pd.to_numeric(df['Miktar'].astype('int64'), downcast='integer')
+    # Sipariş numaraları sayıya çevrilmez: baştaki sıfırlar ve int64'e sığmayan numaralar korunur
+    df['Sipariş No'] = siparis_no_metin(df['Sipariş No']).astype('category')
+    if 'Model Kodu' in df_siparis.columns:
+        model = df_siparis['Model Kodu'][gecerli]
+        # Boş model kodları boş kalır; kategorik dizi konumla atanır (indeks sıfırlandı)
+        df['Model Kodu'] = model.where(model.isna(), model.astype(str).str.strip()).astype('category').array
+    return df, df_hatali.reset_index(drop=True)
+
+
+def siparis_excel_ayristir(veri):
+    """Excel baytlarından sadece gerekli sütunları okuyup doğrulanmış, sıkıştırılmış tabloyu döndürür.
+
+    (df, df_hatali) döndürür. Barkodlar burada bir kez normalize edilip
+    kategorik anahtara çevrilir. Zorunlu sütunlardan biri yoksa ValueError fırlatılır.
+    """
+    okunacak = set(ZORUNLU_SUTUNLAR + ISTEGE_BAGLI_SUTUNLAR)
+    with olcum('excel_okuma') as aralik:
+        df_siparis = pd.read_excel(io.BytesIO(veri), engine="calamine", usecols=lambda c: str(c).strip() in okunacak)
+        aralik.satir = len(df_siparis)
+    df_siparis.columns = [str(c).strip() for c in df_siparis.columns]
+    eksik = [c for c in ZORUNLU_SUTUNLAR if c not in df_siparis.columns]
+    if eksik:
+        raise ValueError(f"Excel dosyasında gerekli sütunlar bulunamadı: {', '.join(eksik)}")
+
+    df_siparis, df_hatali = siparis_tablosunu_sikistir(df_siparis)
+    return df_siparis, df_hatali
+
+
+def onbellek_temizle(maks_mb=None, maks_gun=None):
+    """Yaşı veya toplam boyutu sınırı aşan önbellek dosyalarını siler."""
+    maks_mb = MAKS_ONBELLEK_MB if maks_mb is None else maks_mb
+    maks_gun = MAKS_ONBELLEK_GUN if maks_gun is None else maks_gun
+    if not os.path.isdir(ONBELLEK_DIZINI):
+        return
+
+    simdi = time.time()
+    dosyalar = []
+    for ad in os.listdir(ONBELLEK_DIZINI):
+        if not ad.endswith(".parquet"):
+            continue
+        yol = os.path.join(ONBELLEK_DIZINI, ad)
+        try:
+            bilgi = os.stat(yol)
+        except FileNotFoundError:
+            continue
+        if simdi - bilgi.st_mtime > maks_gun * 86400:
+            _sil(yol)
+        else:
+            dosyalar.append((bilgi.st_mtime, bilgi.st_size, yol))
+
+    # En son kullanılandan en eskiye doğru sırala; sınırı aşan eski dosyaları sil
+    dosyalar.sort(reverse=True)
+    toplam = 0
+    for _, boyut, yol in dosyalar:
+        toplam += boyut
+        if toplam > maks_mb * 1024 * 1024:
+            _sil(yol)
+
+
+def _sil(yol):
+    try:
+        os.remove(yol)
+    except FileNotFoundError:
+        pass
+
+
+def siparis_onbellekten_yukle(anahtar):
+    """Daha önce ayrıştırılmış siparişleri diskten (df, hatalı satırlar) olarak döndürür; yoksa None."""
+    yol = _onbellek_yolu(anahtar)
+    hatalar_yolu = _hatalar_yolu(anahtar)
+    if not os.path.exists(yol):
+        return None
+    try:
+        df_siparis = pd.read_parquet(yol)
+        df_hatali = pd.read_parquet(hatalar_yolu) if os.path.exists(hatalar_yolu) else pd.DataFrame()
+        os.utime(yol)  # Son kullanım zamanını güncelle (eskime/boyut temizliği için)
+        return df_siparis, df_hatali
+    except Exception:
+        _sil(yol)  # Bozuk dosya; yeniden ayrıştırılacak
+        return None
+
+
+def siparis_excel_yukle(veri, anahtar=None):
+    """Sipariş Excel'ini içerik özetine göre önbellekten ya da Excel'den yükler.
+
+    (anahtar, DataFrame, hatalı satırlar) döndürür. Önbellekte yoksa Excel
+    ayrıştırılır ve sonuç Parquet olarak kaydedilir. Özet önceden
+    hesaplandıysa `anahtar` olarak verilebilir.
+    """
+    anahtar = anahtar or icerik_hash(veri)
+    onbellekteki = siparis_onbellekten_yukle(anahtar)
+    if onbellekteki is not None:
+        return (anahtar, *onbellekteki)
+
+    yol = _onbellek_yolu(anahtar)
+    hatalar_yolu = _hatalar_yolu(anahtar)
+    df_siparis, df_hatali = siparis_excel_ayristir(veri)
+    # Önbellekten okunan ve ilk kez ayrıştırılan veri aynı tiplere sahip olsun
+    df_siparis = parquet_uyumlu_hale_getir(df_siparis)
+
+    gecici_yol = f"{yol}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(ONBELLEK_DIZINI, exist_ok=True)
+        if not df_hatali.empty:
+            df_hatali.to_parquet(hatalar_yolu, index=False)
+        df_siparis.to_parquet(gecici_yol, index=False)
+        os.replace(gecici_yol, yol)
+        onbellek_temizle()
+    except Exception:
+        # Önbelleğe yazılamaması analizi engellememeli
+        _sil(gecici_yol)
+
+    return anahtar, df_siparis, df_hatali
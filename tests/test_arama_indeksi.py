@@ -0,0 +1,49 @@
+"""Arama indeksinin sonuçlarını tablo taramasıyla karşılaştırır."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from arama_indeksi import AramaIndeksi
+
+
+@pytest.fixture
+def maliyetler():
+    return pd.DataFrame({
+        'Model Kodu': ['SD-100', 'SD-1001', 'ELB-200', 'ab-sd-1', 'Etek 55', 'sd-100', 'X', None],
+        'Barkod': ['8680001', '8680002', '8681100', '1008680', '8680055', '8680006', '99', '8689999'],
+        'Alış Fiyatı': [150.0, 120.0, 90.0, 60.0, np.nan, 70.0, 10.0, 20.0],
+    })
+
+
+def _tarama(df, sorgu):
+    """İndeksten önceki arama: iki sütunda büyük/küçük harf duyarsız alt dize eşleşmesi."""
+    return set(np.flatnonzero(
+        df['Model Kodu'].str.contains(sorgu, case=False, regex=False, na=False).to_numpy()
+        | df['Barkod'].str.contains(sorgu, case=False, regex=False, na=False).to_numpy()
+    ))
+
+
+@pytest.mark.parametrize('sorgu', ['sd-', 'SD-100', '868', '1008', '100', 'etek 5', 'ELB', '8689999', 'yok', '0055', 'nan'])
+def test_alt_dize_sorgulari_taramayla_ayni(maliyetler, sorgu):
+    indeks = AramaIndeksi(maliyetler)
+    sonuc = indeks.ara(sorgu)
+    assert len(sonuc) == len(set(sonuc))  # Her satır bir kez döner
+    assert set(sonuc) == _tarama(maliyetler, sorgu)
+
+
+def test_kisa_sorgular_sadece_onek_eslesir(maliyetler):
+    indeks = AramaIndeksi(maliyetler)
+    # "sd" alt dize olarak "ab-sd-1" içinde de geçer; ama üç karakterden kısa sorgu sadece önek arar
+    assert set(indeks.ara('sd')) == {0, 1, 5}
+    assert set(indeks.ara('9')) == {6}
+    assert set(indeks.ara('x')) == {6}
+    assert len(indeks.ara('  ')) == 0
+
+
+def test_siralama_ve_limit(maliyetler):
+    indeks = AramaIndeksi(maliyetler)
+    sonuc = indeks.ara('sd-100')
+    # Önce tam eşleşmeler (büyük/küçük harf duyarsız), sonra önek eşleşmesi
+    assert list(sonuc[:2]) == [0, 5]
+    assert sonuc[2] == 1
+    assert list(indeks.ara('sd-100', limit=2)) == [0, 5]
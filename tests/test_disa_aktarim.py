@@ -0,0 +1,52 @@
+"""Akış halinde yazılan XLSX/CSV dosyalarının geçerli olduğunu ve içeriği koruduğunu doğrular."""
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+from disa_aktarim import disa_aktar, tablo_ozeti
+
+
+def _tablo():
+    return pd.DataFrame({
+        'Model Kodu': ['SD-1', 'SD-2 <&>', 'SD-3', None],
+        'Adet': [1, 2, 3, 4],
+        # Sıfır ciroda marj gibi hesaplar inf/nan üretebilir
+        'Kar_Marji': [12.5, np.inf, -np.inf, np.nan],
+        'Tarih': pd.to_datetime(['2025-03-01 00:00', None, '2025-03-03 12:00', '2025-03-04 00:00']),
+    })
+
+
+def test_xlsx_sonsuz_ve_bos_degerler_bos_hucre_olur():
+    veri = disa_aktar(_tablo(), 'XLSX')
+
+    with zipfile.ZipFile(io.BytesIO(veri)) as paket:
+        sayfa = paket.read('xl/worksheets/sheet1.xml')
+    ElementTree.fromstring(sayfa)  # XML geçerli
+    assert b'inf' not in sayfa and b'nan' not in sayfa
+
+    okunan = pd.read_excel(io.BytesIO(veri), engine='openpyxl')
+    assert okunan['Kar_Marji'].iloc[0] == 12.5
+    assert okunan['Kar_Marji'].iloc[1:].isna().all()
+    assert okunan['Model Kodu'].tolist()[:3] == ['SD-1', 'SD-2 <&>', 'SD-3']
+    assert okunan['Adet'].tolist() == [1, 2, 3, 4]
+    assert pd.isna(okunan['Tarih'].iloc[1]) and okunan['Tarih'].iloc[2] == pd.Timestamp('2025-03-03 12:00')
+
+
+def test_csv_sutun_secimi():
+    veri = disa_aktar(_tablo(), 'CSV', sutunlar=['Adet', 'Model Kodu'])
+    okunan = pd.read_csv(io.BytesIO(veri), encoding='utf-8-sig')
+    assert okunan.columns.tolist() == ['Adet', 'Model Kodu']
+    assert len(okunan) == 4
+
+
+def test_tablo_ozeti_icerige_bagli():
+    df = _tablo()
+    assert tablo_ozeti(df) == tablo_ozeti(df.copy())
+    assert tablo_ozeti(df) != tablo_ozeti(df.iloc[::-1])
+    assert tablo_ozeti(df, ['Adet']) != tablo_ozeti(df, ['Adet', 'Model Kodu'])
+    degisik = df.copy()
+    degisik.loc[0, 'Adet'] = 5
+    assert tablo_ozeti(df) != tablo_ozeti(degisik)
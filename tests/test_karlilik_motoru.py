@@ -0,0 +1,194 @@
+"""Vektörel kârlılık motorunun satır satır hesaplanan referansla aynı sonucu verdiğini doğrular."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from karlilik_motoru import (
+    SENARYO_SINIRI, aralik_degerleri, aralik_uzunlugu, kar_hesapla, karlilik_analizi_hesapla, karlilik_analizi_ozetten_hesapla,
+    karlilik_sonucuna_maliyet_ekle, maliyet_surumu, senaryo_izgarasi_hesapla
+)
+from maliyet_deposu import barkodlari_ekle_veya_guncelle, maliyet_tablosunu_temizle
+from siparis_deposu import gunluk_ozet_olustur
+
+PARAMS = {
+    'komisyon_oran': 21.5, 'kdv_oran': 10.0,
+    'toplam_kargo_faturasi': 0, 'kargo_maliyeti_siparis_basi': 80.0,
+    'toplam_reklam_butcesi': 500.0, 'reklam_gideri_urun_basi': 0,
+    'satis_fiyati_sutunu': 'Tutar',
+}
+
+
+def _referans_kar(satis_fiyati_kdvli, alis_fiyati_kdvsiz, komisyon_orani, kdv_orani, kargo_gideri, reklam_gideri):
+    # Vektörleştirmeden önceki tek ürünlük hesap
+    kdv_bolen = 1 + (kdv_orani / 100)
+    satis_fiyati_kdvsiz = satis_fiyati_kdvli / kdv_bolen
+    net_odenecek_kdv = (satis_fiyati_kdvli - satis_fiyati_kdvsiz) - alis_fiyati_kdvsiz * (kdv_orani / 100)
+    komisyon_tutari = satis_fiyati_kdvli * (komisyon_orani / 100)
+    toplam_maliyet = alis_fiyati_kdvsiz + kargo_gideri + reklam_gideri + komisyon_tutari + net_odenecek_kdv
+    net_kar = satis_fiyati_kdvsiz - toplam_maliyet
+    kar_marji = (net_kar / satis_fiyati_kdvsiz) * 100 if satis_fiyati_kdvsiz > 0 else 0
+    return {'net_kar': net_kar, 'kar_marji': kar_marji, 'toplam_maliyet': toplam_maliyet}
+
+
+def _ayni(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == pytest.approx(b)
+
+
+def _barkod(deger):
+    return str(deger).removesuffix('.0').strip()
+
+
+def _referans_analiz(df_siparis, df_maliyet, params):
+    """Sipariş satırlarını tek tek dolaşıp model bazında kârı toplar."""
+    maliyetler = {}
+    for satir in df_maliyet.itertuples(index=False):
+        if pd.notna(satir[2]):  # Alış fiyatı boş olan ürünün maliyeti bilinmiyor sayılır
+            maliyetler[_barkod(satir[1])] = (satir[0], float(satir[2]))
+
+    toplam_adet = df_siparis['Miktar'].sum()
+    kargo = params['kargo_maliyeti_siparis_basi'] * df_siparis['Sipariş No'].nunique() / toplam_adet
+    trendyol_adet = df_siparis.loc[df_siparis['Platform'] == 'Trendyol', 'Miktar'].sum()
+
+    model_kari, maliyetsiz = {}, 0
+    for satir in df_siparis.itertuples(index=False):
+        maliyet = maliyetler.get(_barkod(satir.Barkod))
+        if maliyet is None:
+            maliyetsiz += 1
+            continue
+        model, alis = maliyet
+        reklam = params['toplam_reklam_butcesi'] / trendyol_adet if satir.Platform == 'Trendyol' else 0
+        birim = _referans_kar(satir.Tutar, alis, params['komisyon_oran'], params['kdv_oran'], kargo, reklam)
+        model_kari[model] = model_kari.get(model, 0) + birim['net_kar'] * satir.Miktar
+    return model_kari, maliyetsiz
+
+
+@pytest.fixture
+def siparisler():
+    return pd.DataFrame({
+        'Sipariş No': ['1', '1', '2', '3', '4', '5', '6'],
+        'Sipariş Tarihi': pd.to_datetime([
+            '2025-03-01 10:00', '2025-03-01 10:00', '2025-03-02 12:00', '2025-03-02 13:00',
+            '2025-03-03 09:00', '2025-03-04 18:00', '2025-03-04 19:00',
+        ]),
+        'Platform': ['Trendyol', 'Trendyol', 'Hepsiburada', 'Trendyol', 'N11', 'Trendyol', 'Hepsiburada'],
+        # Excel'den gelen barkodlar sayı, metin ya da ".0" sonekli olabilir
+        'Barkod': [8680001, '8680002', '8680001.0', 8680003, '8680009', 8680004, '8680005 '],
+        'Miktar': [1, 2, 1, 3, 1, 2, 1],
+        # Sıfır fiyatlı (hediye) satır dahil
+        'Tutar': [499.9, 350.0, 520.0, 0.0, 199.0, 275.5, 410.0],
+    })
+
+
+@pytest.fixture
+def maliyetler():
+    return pd.DataFrame({
+        'Model Kodu': ['SD-1', 'SD-1', 'SD-2', 'SD-3', 'SD-4', 'SD-1'],
+        'Barkod': ['8680001', 8680002, '8680003', '8680004', '8680005', '8680001'],
+        # 8680004'ün alış fiyatı boş (maliyeti eksik); 8680001 iki kez geçiyor, son satır geçerli
+        'Alış Fiyatı': [150.0, 120.0, 90.0, np.nan, 200.0, 160.0],
+    })
+
+
+def test_kar_hesapla_dizi_ve_skaler_ayni():
+    satis = np.array([499.9, 0.0, 120.0, 80.0, 300.0])
+    alis = np.array([150.0, 40.0, 130.0, 20.0, 100.0])
+    komisyon = np.array([21.5, 21.5, 0.0, np.nan, 15.0])
+    kdv = np.array([10.0, 20.0, 10.0, 10.0, 0.0])
+    kargo, reklam = 35.0, np.array([0.0, 0.0, 5.0, 5.0, 12.5])
+
+    sonuc = kar_hesapla(satis, alis, komisyon, kdv, kargo, reklam)
+    for i in range(len(satis)):
+        beklenen = _referans_kar(satis[i], alis[i], komisyon[i], kdv[i], kargo, reklam[i])
+        for anahtar in ('net_kar', 'kar_marji', 'toplam_maliyet'):
+            assert _ayni(float(sonuc[anahtar][i]), float(beklenen[anahtar])), (i, anahtar)
+
+    # Skaler girdide skaler döner; sıfır fiyatta marj 0'dır
+    skaler = kar_hesapla(0.0, 40.0, 21.5, 20.0, 35.0, 0.0)
+    assert np.ndim(skaler['net_kar']) == 0 and skaler['kar_marji'] == 0
+    # Seri girdide indeks korunur
+    seri = kar_hesapla(pd.Series(satis, index=list('abcde')), alis, 21.5, 10.0, kargo, 0.0)
+    assert list(seri['kar_marji'].index) == list('abcde')
+
+
+def test_karlilik_analizi_referans_dongu_ile_ayni(siparisler, maliyetler):
+    beklenen, beklenen_maliyetsiz = _referans_analiz(siparisler, maliyetler, PARAMS)
+    sonuc = karlilik_analizi_hesapla(siparisler, maliyetler, PARAMS)
+
+    model_kari = sonuc['df_grouped'].set_index('Model Kodu')['Toplam_Kar']
+    assert set(model_kari.index) == set(beklenen)
+    for model, kar in beklenen.items():
+        assert model_kari[model] == pytest.approx(kar), model
+    assert sonuc['toplamlar']['toplam_analiz_kari'] == pytest.approx(sum(beklenen.values()))
+    assert sonuc['toplamlar']['maliyetsiz_satir_sayisi'] == beklenen_maliyetsiz
+    assert sorted(sonuc['df_maliyetsiz']['Barkod']) == ['8680004', '8680009']
+    # Günlük kâr serisi ve platform kârları da aynı toplamı verir
+    assert sonuc['df_gunluk_kar']['Kar'].sum() == pytest.approx(sum(beklenen.values()))
+    assert sonuc['df_platform']['Kar'].sum() == pytest.approx(sum(beklenen.values()))
+    # Girdi tabloları değiştirilmez
+    assert siparisler['Barkod'].iloc[0] == 8680001
+
+
+def test_karlilik_analizi_nan_komisyon(siparisler, maliyetler):
+    sonuc = karlilik_analizi_hesapla(siparisler, maliyetler, {**PARAMS, 'komisyon_oran': np.nan})
+    assert sonuc['df_grouped']['Toplam_Kar'].isna().all()
+    assert math.isnan(_referans_analiz(siparisler, maliyetler, {**PARAMS, 'komisyon_oran': np.nan})[0]['SD-1'])
+
+
+@pytest.mark.parametrize('ozetten', [False, True])
+def test_eksik_maliyet_doldurulup_yeniden_calistirilinca_ayni_sonuc(siparisler, maliyetler, ozetten):
+    # Uygulamadaki akış: analiz → eksik maliyet girilir → sonuç artımlı güncellenir → sayfa yeniden çalışır
+    if ozetten:
+        def analiz(df_maliyet):
+            return karlilik_analizi_ozetten_hesapla(*gunluk_ozet_olustur(siparisler), df_maliyet, PARAMS)
+    else:
+        def analiz(df_maliyet):
+            return karlilik_analizi_hesapla(siparisler, df_maliyet, PARAMS)
+
+    kaynak = maliyet_tablosunu_temizle(maliyetler.copy())
+    sonuc = analiz(kaynak)
+    assert sorted(sonuc['df_maliyetsiz']['Barkod'].astype(str).unique()) == ['8680004', '8680009']
+
+    yeni_maliyetler = maliyet_tablosunu_temizle(pd.DataFrame({
+        'Model Kodu': ['SD-3', 'SD-9'], 'Barkod': ['8680004', 8680009], 'Alış Fiyatı': [95.0, 60.0],
+    }))
+    artimli = karlilik_sonucuna_maliyet_ekle(sonuc, yeni_maliyetler, PARAMS)
+    beklenen_df = barkodlari_ekle_veya_guncelle(kaynak, yeni_maliyetler)
+
+    # Yeniden çalıştırmada tablo kaynaktan tekrar yüklenir ve oturumdaki ekler üzerine uygulanır
+    yeniden_yuklenen = maliyet_tablosunu_temizle(maliyetler.copy())
+    df_maliyet = barkodlari_ekle_veya_guncelle(yeniden_yuklenen, yeni_maliyetler)
+    # Analiz anahtarı artımlı sonucun önbelleğe konduğu anahtarla aynıdır
+    assert maliyet_surumu(df_maliyet) == maliyet_surumu(beklenen_df)
+
+    tam = analiz(df_maliyet)
+    assert artimli['df_maliyetsiz'].empty and tam['df_maliyetsiz'].empty
+    for anahtar in ('toplam_analiz_kari', 'maliyetsiz_satir_sayisi', 'toplam_satilan_urun'):
+        assert artimli['toplamlar'][anahtar] == pytest.approx(tam['toplamlar'][anahtar]), anahtar
+    model_kari = tam['df_grouped'].set_index('Model Kodu')['Toplam_Kar']
+    artimli_model_kari = artimli['df_grouped'].set_index('Model Kodu')['Toplam_Kar']
+    assert set(artimli_model_kari.index) == set(model_kari.index) == {'SD-1', 'SD-2', 'SD-3', 'SD-4', 'SD-9'}
+    for model in model_kari.index:
+        assert artimli_model_kari[model] == pytest.approx(model_kari[model]), model
+    assert artimli['df_platform'].set_index('Platform')['Kar'].to_dict() == pytest.approx(
+        tam['df_platform'].set_index('Platform')['Kar'].to_dict())
+    assert artimli['df_gunluk_kar']['Kar'].sum() == pytest.approx(tam['df_gunluk_kar']['Kar'].sum())
+
+
+@pytest.mark.parametrize('aralik', [(10.0, 10.0, 0.5), (0.0, 25.0, 0.5), (0.0, 100.0, 5.0), (1.0, 2.0, 0.3), (0.0, 1.0, 0.01)])
+def test_aralik_uzunlugu_dizi_uzunluguyla_ayni(aralik):
+    assert aralik_uzunlugu(*aralik) == len(aralik_degerleri(*aralik))
+
+
+def test_senaryo_izgarasi_siniri(siparisler, maliyetler):
+    sonuc = karlilik_analizi_hesapla(siparisler, maliyetler, PARAMS)
+    params = {**PARAMS, 'komisyon_oran': aralik_degerleri(10.0, 30.0, 0.5), 'kdv_oran': [10.0, 20.0]}
+    df_senaryo = senaryo_izgarasi_hesapla(sonuc['df_grouped'], sonuc['toplamlar'], params)
+    assert len(df_senaryo) == 41 * 2
+    secilen = df_senaryo[(df_senaryo['komisyon_oran'] == 21.5) & (df_senaryo['kdv_oran'] == 10.0)]
+    assert secilen['Toplam_Kar'].iloc[0] == pytest.approx(sonuc['toplamlar']['toplam_analiz_kari'])
+
+    params['kargo_maliyeti_siparis_basi'] = np.arange(SENARYO_SINIRI // 82 + 1)
+    with pytest.raises(ValueError):
+        senaryo_izgarasi_hesapla(sonuc['df_grouped'], sonuc['toplamlar'], params)
@@ -0,0 +1,171 @@
+"""Maliyet aynasının değişiklik tespitini, toplu yazma isteklerini ve çakışma kontrolünü doğrular."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import maliyet_deposu
+import sheets_istemcisi
+from maliyet_deposu import (
+    MaliyetCakismaHatasi, barkodlari_ekle_veya_guncelle, cakismalari_bul, degisiklikleri_bul,
+    degisiklikleri_kaydet, maliyet_tablosunu_temizle
+)
+
+SUTUNLAR = ['Model Kodu', 'Barkod', 'Alış Fiyatı']
+
+
+class SahteSheets:
+    """Sheets ve Drive API'lerinin kaydetmede kullanılan kısmını taklit eden istemci."""
+
+    def __init__(self, df, revizyon="r1", surum=10, izgara=4):
+        self.uzak_df = df
+        self.revizyon, self.surum, self.izgara = revizyon, surum, izgara
+        self.istekler = []
+        self.yazmadan_sonra_baskasi_yazar = False
+        self.http_client = self
+
+    def batch_update(self, spreadsheet_id, govde):
+        self.istekler.append(govde["requests"])
+        self.surum += 1
+        self.revizyon = f"r{self.surum}"
+        if self.yazmadan_sonra_baskasi_yazar:
+            self.baskasi_yazdi()
+
+    def baskasi_yazdi(self, df=None):
+        if df is not None:
+            self.uzak_df = df
+        self.surum += 1
+        self.revizyon = f"r{self.surum}"
+
+
+@pytest.fixture
+def ayna(tmp_path, monkeypatch):
+    monkeypatch.setattr(maliyet_deposu, 'AYNA_DIZINI', str(tmp_path))
+    monkeypatch.setattr(maliyet_deposu, 'AYNA_DOSYASI', str(tmp_path / "ayna.parquet"))
+    monkeypatch.setattr(maliyet_deposu, 'META_DOSYASI', str(tmp_path / "ayna.json"))
+    monkeypatch.setattr(maliyet_deposu, '_bellek', {"revizyon": None, "df": None})
+    monkeypatch.setattr(sheets_istemcisi, 'dosya_surumu', lambda gc, _id: (gc.revizyon, gc.surum))
+    monkeypatch.setattr(sheets_istemcisi, 'calisma_sayfasi', lambda gc, *a, **k: gc)
+    monkeypatch.setattr(sheets_istemcisi, 'izgara_satir_sayisi', lambda gc, *a: gc.izgara)
+    monkeypatch.setattr(maliyet_deposu, '_sayfayi_oku', lambda gc: (gc.uzak_df.copy(), SUTUNLAR, len(gc.uzak_df)))
+    senkronlar = []
+
+    def senkronize_et(gc, zorla=False):
+        senkronlar.append(zorla)
+        maliyet_deposu._ayna_yaz(gc.uzak_df.copy(), dict(maliyet_deposu._meta_oku(), revizyon=gc.revizyon))
+    monkeypatch.setattr(maliyet_deposu, 'senkronize_et', senkronize_et)
+
+    df = maliyet_tablosunu_temizle(pd.DataFrame({
+        'Model Kodu': ['SD-1', 'SD-2', 'SD-3'],
+        'Barkod': ['8680001', '8680002', 8680003],
+        # 8680003'ün maliyeti henüz girilmemiş
+        'Alış Fiyatı': [150.0, 120.0, np.nan],
+    }))
+    gc = SahteSheets(df.copy())
+    maliyet_deposu._ayna_yaz(df, {
+        "spreadsheet_id": "kitap", "sayfa_id": 7, "revizyon": gc.revizyon, "sutunlar": SUTUNLAR,
+        "satir_sayisi": 3, "sayfa_satir_sayisi": gc.izgara,
+    })
+    meta, onceki_df = maliyet_deposu._ayna_oku()
+    return gc, onceki_df, meta, senkronlar
+
+
+def _hucre_istekleri(istekler):
+    return {
+        (i["updateCells"]["start"]["rowIndex"], i["updateCells"]["start"]["columnIndex"]): i["updateCells"]["rows"][0]["values"]
+        for i in istekler if "updateCells" in i
+    }
+
+
+def test_degisiklikleri_bul():
+    onceki = pd.DataFrame({'Barkod': ['1', '2', '3'], 'Alış Fiyatı': [10.0, np.nan, 30.0]})
+    yeni = pd.DataFrame({'Barkod': ['1', '2', '4'], 'Alış Fiyatı': [10.0, 20.0, 40.0]}, index=[0, 1, 3])
+    degisiklik = degisiklikleri_bul(onceki, yeni)
+    assert degisiklik['guncellenen'] == {1: {'Alış Fiyatı': 20.0}}
+    assert degisiklik['silinen'] == [2]
+    assert list(degisiklik['eklenen'].index) == [3]
+
+
+def test_fiyati_bos_satir_yeni_satir_olarak_eklenmez(ayna):
+    _, onceki_df, _, _ = ayna
+    assert '8680003' in onceki_df['Barkod'].tolist()
+    yeni_df = barkodlari_ekle_veya_guncelle(
+        onceki_df, pd.DataFrame({'Model Kodu': ['SD-3'], 'Barkod': ['8680003'], 'Alış Fiyatı': [95.0]})
+    )
+    degisiklik = degisiklikleri_bul(onceki_df, yeni_df, SUTUNLAR)
+    assert degisiklik['guncellenen'] == {2: {'Alış Fiyatı': 95.0}}
+    assert degisiklik['eklenen'].empty
+
+
+def test_sadece_degisen_hucreler_tek_istekte_yazilir(ayna):
+    gc, onceki_df, meta, senkronlar = ayna
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[0, 'Alış Fiyatı'] = 155.0
+    yeni_df = yeni_df.drop(index=1)
+    yeni_df = pd.concat([yeni_df, pd.DataFrame({'Model Kodu': ['SD-4'], 'Barkod': ['8680004'], 'Alış Fiyatı': [80.0]}, index=[9])])
+
+    df, yeni_meta, degisiklik = degisiklikleri_kaydet(gc, onceki_df, meta, yeni_df)
+
+    assert len(gc.istekler) == 1
+    istekler = gc.istekler[0]
+    # Izgara 4 satır (başlık + 3); yeni satır için bir satır eklenir
+    assert istekler[0] == {"appendDimension": {"sheetId": 7, "dimension": "ROWS", "length": 1}}
+    hucreler = _hucre_istekleri(istekler)
+    assert hucreler == {
+        (1, 2): [{"userEnteredValue": {"numberValue": 155.0}}],  # Güncellenen hücre (sayfa satırı = indeks + 1)
+        (2, 0): [{}, {}, {}],  # Silinen satır temizlenir
+        (4, 0): [{"userEnteredValue": {"stringValue": "SD-4"}}, {"userEnteredValue": {"stringValue": "8680004"}},
+                 {"userEnteredValue": {"numberValue": 80.0}}],
+    }
+    # Araya başka yazma girmedi: ayna yazılan tablodan güncellenir
+    assert senkronlar == []
+    assert yeni_meta['revizyon'] == gc.revizyon
+    assert (yeni_meta['satir_sayisi'], yeni_meta['sayfa_satir_sayisi']) == (4, 5)
+    assert df.loc[3, 'Barkod'] == '8680004' and 1 not in df.index
+
+
+def test_yazmadan_hemen_sonra_gelen_degisiklik_tam_senkronla_alinir(ayna):
+    gc, onceki_df, meta, senkronlar = ayna
+    gc.yazmadan_sonra_baskasi_yazar = True
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[0, 'Alış Fiyatı'] = 155.0
+
+    _, yeni_meta, _ = degisiklikleri_kaydet(gc, onceki_df, meta, yeni_df)
+
+    assert len(gc.istekler) == 1
+    assert senkronlar == [True]
+    assert yeni_meta['revizyon'] == gc.revizyon
+
+
+def test_ayni_satir_uzakta_degistiyse_cakisma(ayna):
+    gc, onceki_df, meta, senkronlar = ayna
+    uzak = onceki_df.copy()
+    uzak.loc[0, 'Alış Fiyatı'] = 170.0
+    gc.baskasi_yazdi(uzak)
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[0, 'Alış Fiyatı'] = 155.0
+
+    with pytest.raises(MaliyetCakismaHatasi) as hata:
+        degisiklikleri_kaydet(gc, onceki_df, meta, yeni_df)
+    assert hata.value.cakisan_satirlar == [0]
+    assert gc.istekler == [] and senkronlar == []
+
+
+def test_baska_satir_uzakta_degistiyse_yazilir_ve_senkronlanir(ayna):
+    gc, onceki_df, meta, senkronlar = ayna
+    uzak = onceki_df.copy()
+    uzak.loc[1, 'Alış Fiyatı'] = 125.0
+    gc.baskasi_yazdi(uzak)
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[0, 'Alış Fiyatı'] = 155.0
+
+    degisiklikleri_kaydet(gc, onceki_df, meta, yeni_df)
+
+    assert _hucre_istekleri(gc.istekler[0]) == {(1, 2): [{"userEnteredValue": {"numberValue": 155.0}}]}
+    assert senkronlar == [True]
+
+
+def test_cakismalari_bul_silinen_satir():
+    onceki = pd.DataFrame({'Barkod': ['1', '2'], 'Alış Fiyatı': [10.0, 20.0]})
+    uzak = pd.DataFrame({'Barkod': ['1'], 'Alış Fiyatı': [10.0]})
+    degisiklik = {'guncellenen': {0: {'Alış Fiyatı': 11.0}}, 'silinen': [1], 'eklenen': onceki.iloc[0:0]}
+    assert cakismalari_bul(uzak, onceki, degisiklik) == [1]
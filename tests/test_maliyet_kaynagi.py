@@ -0,0 +1,95 @@
+"""SQLite maliyet kaynağının ekleme/güncelleme, silme ve içeri aktarma işlemlerini doğrular."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from maliyet_deposu import MaliyetCakismaHatasi
+from maliyet_kaynagi import SqliteMaliyetKaynagi
+
+
+@pytest.fixture
+def kaynak(tmp_path):
+    kaynak = SqliteMaliyetKaynagi(str(tmp_path / "maliyet.sqlite3"))
+    kaynak.iceri_aktar(pd.DataFrame({
+        'Model Kodu': ['SD-1', 'SD-1', 'SD-2'],
+        'Barkod': ['8680001', '8680002', '8680003'],
+        'Alış Fiyatı': [150.0, 150.0, 90.0],
+    }))
+    return kaynak
+
+
+def _fiyatlar(df):
+    return dict(zip(df['Barkod'], df['Alış Fiyatı']))
+
+
+def test_iceri_aktar_tabloyu_aynen_yazar(tmp_path):
+    kaynak = SqliteMaliyetKaynagi(str(tmp_path / "maliyet.sqlite3"))
+    kaynak.ekle_veya_guncelle([{'Model Kodu': 'ESKI', 'Barkod': '1', 'Alış Fiyatı': 1.0}])
+    df_sheets = pd.DataFrame({
+        'Model Kodu': [' SD-1 ', 'SD-2', 'SD-2', 'SD-3'],
+        'Barkod': [8680001, '8680002.0', '8680002', '8680004'],
+        'Alış Fiyatı': ['150.5', 80.0, 85.0, np.nan],
+    })
+
+    # Mevcut satırlar silinir; aynı barkodun son satırı geçerlidir, fiyatı boş satır yazılmaz
+    assert kaynak.iceri_aktar(df_sheets) == 2
+    df, _ = kaynak.tumunu_yukle()
+    assert df[['Model Kodu', 'Barkod', 'Alış Fiyatı']].values.tolist() == [['SD-1', '8680001', 150.5], ['SD-2', '8680002', 85.0]]
+
+    # Yeni bir nesne aynı dosyadan aynı tabloyu okur
+    df_tekrar, _ = SqliteMaliyetKaynagi(kaynak.yol).tumunu_yukle()
+    pd.testing.assert_frame_equal(df_tekrar, df)
+
+
+def test_ekle_veya_guncelle_barkoda_gore(kaynak):
+    onceki_df, onceki_meta = kaynak.tumunu_yukle()
+    df, meta, degisiklik = kaynak.ekle_veya_guncelle([
+        {'Model Kodu': 'SD-2', 'Barkod': '8680003.0', 'Alış Fiyatı': 95.0},
+        {'Model Kodu': 'SD-4', 'Barkod': 8680005, 'Alış Fiyatı': 40.0},
+        {'Model Kodu': 'SD-5', 'Barkod': '8680006', 'Alış Fiyatı': None},
+    ])
+
+    assert _fiyatlar(df) == {'8680001': 150.0, '8680002': 150.0, '8680003': 95.0, '8680005': 40.0}
+    # Güncellenen satır yerinde kalır
+    assert df.index[df['Barkod'] == '8680003'].tolist() == onceki_df.index[onceki_df['Barkod'] == '8680003'].tolist()
+    assert meta['revizyon'] == onceki_meta['revizyon'] + 1
+    assert len(degisiklik['guncellenen']) == 1 and len(degisiklik['eklenen']) == 1 and not degisiklik['silinen']
+    assert kaynak.barkod_bul('8680005.0')['Model Kodu'] == 'SD-4'
+    assert kaynak.barkod_bul('8680006') is None
+
+
+def test_sil(kaynak):
+    df, _, degisiklik = kaynak.sil(['8680002', 8680003])
+    assert _fiyatlar(df) == {'8680001': 150.0}
+    assert len(degisiklik['silinen']) == 2
+    assert kaynak.model_bul('SD-2').empty
+    assert kaynak.model_bul(' SD-1 ')['Barkod'].tolist() == ['8680001']
+
+
+def test_kaydet_sadece_degisen_satirlari_yazar(kaynak):
+    onceki_df, meta = kaynak.tumunu_yukle()
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[yeni_df['Barkod'] == '8680001', 'Alış Fiyatı'] = 155.0
+    yeni_df = yeni_df[yeni_df['Barkod'] != '8680002']
+    yeni_df = pd.concat([yeni_df, pd.DataFrame({'Model Kodu': ['SD-3'], 'Barkod': ['8680009'], 'Alış Fiyatı': [70.0]}, index=[99])])
+
+    df, _, _ = kaynak.kaydet(onceki_df, meta, yeni_df)
+    assert _fiyatlar(df) == {'8680001': 155.0, '8680003': 90.0, '8680009': 70.0}
+
+
+def test_kaydet_ayni_satir_baskasi_tarafindan_degistiyse_cakisma(kaynak):
+    onceki_df, meta = kaynak.tumunu_yukle()
+    # Başka bir oturum aynı satırı araya girip günceller
+    kaynak.ekle_veya_guncelle([{'Model Kodu': 'SD-1', 'Barkod': '8680001', 'Alış Fiyatı': 170.0}])
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[yeni_df['Barkod'] == '8680001', 'Alış Fiyatı'] = 155.0
+
+    with pytest.raises(MaliyetCakismaHatasi):
+        kaynak.kaydet(onceki_df, meta, yeni_df)
+    assert _fiyatlar(kaynak.tumunu_yukle()[0])['8680001'] == 170.0
+
+    # Başka bir satırdaki değişiklik çakışma sayılmaz
+    yeni_df = onceki_df.copy()
+    yeni_df.loc[yeni_df['Barkod'] == '8680003', 'Alış Fiyatı'] = 99.0
+    df, _, _ = kaynak.kaydet(onceki_df, meta, yeni_df)
+    assert _fiyatlar(df) == {'8680001': 170.0, '8680002': 150.0, '8680003': 99.0}
@@ -0,0 +1,100 @@
+"""Sipariş deposunun dökümleri eklerken satırları doğru tekilleştirdiğini doğrular."""
+import pandas as pd
+import pytest
+
+import siparis_deposu
+
+
+@pytest.fixture(autouse=True)
+def gecici_depo(tmp_path, monkeypatch):
+    monkeypatch.setattr(siparis_deposu, 'DEPO_DIZINI', str(tmp_path))
+
+
+def _dokum(satirlar):
+    return pd.DataFrame(satirlar, columns=['Sipariş No', 'Sipariş Tarihi', 'Platform', 'Barkod', 'Miktar', 'Tutar']).assign(
+        **{'Sipariş Tarihi': lambda df: pd.to_datetime(df['Sipariş Tarihi'])}
+    )
+
+
+def _depo(ay='2025-03'):
+    return siparis_deposu._ay_oku(ay).set_index(['Sipariş No', 'Barkod'])[['Miktar', 'Tutar']]
+
+
+def test_ayni_dokumdeki_tekrarlanan_satirlar_toplanir():
+    sonuc = siparis_deposu.depoya_ekle(_dokum([
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680001', 1, 100.0],
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680001', 2, 130.0],
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680002', 1, 50.0],
+        ['2', '2025-03-02 12:00', 'N11', '8680001', 1, 90.0],
+    ]))
+    assert sonuc == {'eklenen': 3, 'guncellenen': 0, 'aylar': ['2025-03']}
+
+    depo = _depo()
+    assert depo.loc[('1', '8680001'), 'Miktar'] == 3
+    # Ciro korunur: 1×100 + 2×130
+    assert depo.loc[('1', '8680001'), 'Tutar'] * 3 == pytest.approx(360.0)
+    assert depo['Miktar'].sum() == 5
+
+    df_gunluk, _ = siparis_deposu.gunluk_ozetleri_oku('2025-03-01', '2025-03-31')
+    assert df_gunluk['Ciro'].sum() == pytest.approx(360.0 + 50.0 + 90.0)
+
+
+def test_sonraki_dokum_onceki_satirlarin_yerine_gecer():
+    siparis_deposu.depoya_ekle(_dokum([
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680001', 1, 100.0],
+        ['2', '2025-03-02 12:00', 'N11', '8680001', 1, 90.0],
+    ]), kaynak='a')
+    # Çakışan döküm aynı siparişi güncel haliyle (iki satıra bölünmüş) yeniden getirir
+    sonuc = siparis_deposu.depoya_ekle(_dokum([
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680001', 1, 100.0],
+        ['1', '2025-03-01 10:00', 'Trendyol', '8680001', 1, 100.0],
+        ['3', '2025-03-05 09:00', 'Trendyol', '8680003', 1, 70.0],
+    ]), kaynak='b')
+    assert (sonuc['eklenen'], sonuc['guncellenen']) == (1, 1)
+
+    depo = _depo()
+    assert depo.loc[('1', '8680001'), 'Miktar'] == 2
+    assert len(depo) == 3
+    # Aynı dosya ikinci kez eklenmez
+    assert siparis_deposu.depoya_ekle(_dokum([['4', '2025-03-06 09:00', 'N11', '8680004', 1, 10.0]]), kaynak='b')['aylar'] == []
+
+
+def test_gunluk_ozet_araligi_maskeyle_ayni():
+    siparis_deposu.depoya_ekle(_dokum([
+        ['1', '2025-02-27 23:30', 'Trendyol', '8680001', 1, 100.0],
+        ['2', '2025-02-28 10:00', 'N11', '8680002', 2, 50.0],
+        ['3', '2025-03-01 00:00', 'N11', '8680001', 1, 90.0],
+        ['4', '2025-03-01 18:00', 'Trendyol', '8680003', 1, 70.0],
+        ['5', '2025-03-15 12:00', 'Trendyol', '8680001', 3, 95.0],
+        ['6', '2025-03-31 23:59', 'N11', '8680002', 1, 40.0],
+        ['7', '2025-04-01 08:00', 'Trendyol', '8680002', 1, 45.0],
+    ]))
+    tum, tum_siparis = siparis_deposu.gunluk_ozetleri_oku('2025-02-01', '2025-04-30')
+    assert tum['Gün'].is_monotonic_increasing and tum_siparis['Gün'].is_monotonic_increasing
+
+    for baslangic, bitis, platformlar in [
+        ('2025-02-28', '2025-03-31', None), ('2025-03-01', '2025-03-01', ['N11']),
+        ('2025-02-01', '2025-04-30', ['Trendyol']), ('2025-03-02', '2025-03-14', None),
+    ]:
+        df_gunluk, df_siparis_sayisi = siparis_deposu.gunluk_ozetleri_oku(baslangic, bitis, platformlar)
+        for sonuc, beklenen in ((df_gunluk, tum), (df_siparis_sayisi, tum_siparis)):
+            maske = beklenen['Gün'].between(pd.Timestamp(baslangic), pd.Timestamp(bitis))
+            if platformlar is not None:
+                maske &= beklenen['Platform'].isin(platformlar)
+            pd.testing.assert_frame_equal(sonuc, beklenen[maske].reset_index(drop=True))
+
+
+def test_siparis_numaralari_metin_olarak_korunur():
+    # Aynı numara bir dökümde sayı (7.0), diğerinde metin ('7') olarak gelebilir; '007' ayrı bir sipariştir
+    siparis_deposu.depoya_ekle(_dokum([
+        [7.0, '2025-03-01 10:00', 'Trendyol', '8680001', 1, 100.0],
+        ['007', '2025-03-01 11:00', 'Trendyol', '8680001', 1, 100.0],
+        ['12345678901234567891', '2025-03-02 12:00', 'N11', '8680001', 1, 90.0],
+        ['12345678901234567892', '2025-03-02 12:00', 'N11', '8680001', 1, 90.0],
+    ]), kaynak='a')
+    sonuc = siparis_deposu.depoya_ekle(_dokum([['7', '2025-03-01 10:00', 'Trendyol', '8680001', 2, 100.0]]), kaynak='b')
+    assert (sonuc['eklenen'], sonuc['guncellenen']) == (0, 1)
+
+    depo = _depo()
+    assert sorted(depo.index.get_level_values('Sipariş No')) == ['007', '12345678901234567891', '12345678901234567892', '7']
+    assert depo.loc[('7', '8680001'), 'Miktar'] == 2
@@ -0,0 +1,117 @@
+"""Oturumlar arasında paylaşılan, bellek sınırlı veri seti önbelleği.
+
+Aynı sipariş dosyasını açan her oturum kendi kopyasını tutmaz; veri seti
+içerik özetiyle anahtarlanıp süreç genelinde bir kez bellekte tutulur ve
+oturumlar sadece anahtarı (ve kendi filtre/parametre durumunu) saklar.
+Toplam boyut sınırı aşılınca en uzun süredir kullanılmayan veri setleri
+bellekten çıkarılır; gerekirse diskteki Parquet önbelleğinden yeniden yüklenir.
+
+Önbellekten dönen nesneler tüm oturumlarca paylaşılır ve değiştirilmemelidir.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Paylaşılan önbelleğin toplam bellek sınırı
+MAKS_PAYLASIMLI_MB = float(os.environ.get("STILDIVA_PAYLASIMLI_ONBELLEK_MB", "1024"))
+# Analiz sonuçları önbelleğinin sınırı; sonuçlar veri setlerini bellekten itmesin diye ayrı tutulur
+MAKS_ANALIZ_MB = float(os.environ.get("STILDIVA_ANALIZ_ONBELLEK_MB", "256"))
+
+
+def nesne_boyutu(deger):
+    """DataFrame, dizi ve bunları içeren demet/sözlük/nesnelerin yaklaşık bellek boyutunu (bayt) döndürür."""
+    if deger is None:
+        return 0
+    if isinstance(deger, (pd.DataFrame, pd.Series, pd.Index)):
+        boyut = deger.memory_usage(deep=True)
+        return int(boyut.sum() if isinstance(boyut, pd.Series) else boyut)
+    if isinstance(deger, np.ndarray):
+        return deger.nbytes
+    if isinstance(deger, (tuple, list)):
+        return sum(nesne_boyutu(d) for d in deger)
+    if isinstance(deger, dict):
+        return sum(nesne_boyutu(d) for d in deger.values())
+    if hasattr(deger, '__dict__'):
+        return nesne_boyutu(vars(deger))
+    return sys.getsizeof(deger)
+
+
+class VeriOnbellegi:
+    """Boyut sınırlı, iş parçacığı güvenli LRU veri seti önbelleği."""
+
+    def __init__(self, maks_mb):
+        self.maks_bayt = int(maks_mb * 1024 * 1024)
+        self._kayitlar = OrderedDict()  # anahtar -> (değer, boyut)
+        self._toplam = 0
+        self._kilit = threading.Lock()
+        self._yukleme_kilitleri = {}
+        self.isabet = 0
+        self.iskalama = 0
+        self.cikarilan = 0
+
+    def al(self, anahtar, uret):
+        """Anahtarın değerini döndürür; yoksa `uret()` ile bir kez üretip önbelleğe ekler.
+
+        Aynı anahtarı aynı anda isteyen oturumlar bekler ve tek bir üretimin
+        sonucunu paylaşır.
+        """
+        with self._kilit:
+            if anahtar in self._kayitlar:
+                self._kayitlar.move_to_end(anahtar)
+                self.isabet += 1
+                return self._kayitlar[anahtar][0]
+            yukleme_kilidi = self._yukleme_kilitleri.setdefault(anahtar, threading.Lock())
+
+        with yukleme_kilidi:
+            with self._kilit:
+                if anahtar in self._kayitlar:
+                    self._kayitlar.move_to_end(anahtar)
+                    self.isabet += 1
+                    return self._kayitlar[anahtar][0]
+            try:
+                deger = uret()
+                self._ekle(anahtar, deger)
+                return deger
+            finally:
+                with self._kilit:
+                    self._yukleme_kilitleri.pop(anahtar, None)
+
+    def _ekle(self, anahtar, deger):
+        boyut = nesne_boyutu(deger)
+        with self._kilit:
+            self.iskalama += 1
+            self._kayitlar[anahtar] = (deger, boyut)
+            self._toplam += boyut
+            # Sınır aşıldıysa en eski kullanılanları çıkar; yeni eklenen her zaman kalır
+            while self._toplam > self.maks_bayt and len(self._kayitlar) > 1:
+                _, (_, eski_boyut) = self._kayitlar.popitem(last=False)
+                self._toplam -= eski_boyut
+                self.cikarilan += 1
+
+    def sil(self, anahtar):
+        with self._kilit:
+            kayit = self._kayitlar.pop(anahtar, None)
+            if kayit is not None:
+                self._toplam -= kayit[1]
+
+    def kullanim(self):
+        """Önbelleğin anlık doluluk ve isabet sayılarını döndürür."""
+        with self._kilit:
+            return {
+                'kayit_sayisi': len(self._kayitlar),
+                'kullanilan_mb': self._toplam / (1024 * 1024),
+                'maks_mb': self.maks_bayt / (1024 * 1024),
+                'isabet': self.isabet,
+                'iskalama': self.iskalama,
+                'cikarilan': self.cikarilan,
+            }
+
+
+# Süreç genelinde tek önbellek; tüm oturumlar bunu kullanır
+paylasimli_onbellek = VeriOnbellegi(MAKS_PAYLASIMLI_MB)
+# Veri sürümü, maliyet sürümü ve filtre/parametrelerle anahtarlanan analiz sonuçları
+analiz_onbellegi = VeriOnbellegi(MAKS_ANALIZ_MB)
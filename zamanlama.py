@@ -0,0 +1,128 @@
+"""Aşama bazında süre ölçümü (zamanlama aralıkları).
+
+Maliyet yükleme, Excel ayrıştırma, eşleştirme, toplama, grafik çizimi ve
+sayfa render fonksiyonları gibi aşamalar `olcum(...)` bloklarıyla sarılır.
+Her blok duvar saati süresini, satır sayısını ve süreç belleğindeki değişimi
+kaydeder; kayıtlar JSONL dosyasına yazılır ve son çalıştırmalar yönetici
+panelinde gösterilmek üzere bellekte tutulur.
+
+Özellik `STILDIVA_ZAMANLAMA=1` ile açılır. Kapalıyken `olcum` hiçbir şey
+yapmayan ortak bir nesne döndürür; ek maliyet bir fonksiyon çağrısından ibarettir.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+ETKIN = os.environ.get("STILDIVA_ZAMANLAMA", "0") == "1"
+LOG_DOSYASI = os.environ.get("STILDIVA_ZAMANLAMA_LOG", os.path.join(".onbellek", "zamanlama.jsonl"))
+# Yönetici panelinde gösterilen son çalıştırma sayısı
+SON_CALISTIRMA_SAYISI = int(os.environ.get("STILDIVA_ZAMANLAMA_SON", "20"))
+
+_son_calistirmalar = deque(maxlen=SON_CALISTIRMA_SAYISI)
+_yazma_kilidi = threading.Lock()
+_calistirma = contextvars.ContextVar("zamanlama_calistirma", default=None)
+_ust_aralik = contextvars.ContextVar("zamanlama_ust_aralik", default=None)
+
+
+def _rss_mb():
+    """Sürecin o anki yerleşik bellek (RSS) kullanımını MB olarak döndürür; ölçülemiyorsa None."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _BosAralik:
+    """Zamanlama kapalıyken kullanılan, hiçbir şey yapmayan aralık."""
+    satir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *hata):
+        return False
+
+    def __setattr__(self, ad, deger):
+        pass
+
+
+_BOS_ARALIK = _BosAralik()
+
+
+class _Aralik:
+    def __init__(self, ad, satir):
+        self.ad = ad
+        self.satir = satir
+
+    def __enter__(self):
+        self._ust = _ust_aralik.set(self.ad)
+        self._bellek = _rss_mb()
+        self._baslangic = time.perf_counter()
+        return self
+
+    def __exit__(self, hata_tipi, hata, iz):
+        sure = time.perf_counter() - self._baslangic
+        bellek = _rss_mb()
+        _ust_aralik.reset(self._ust)
+        calistirma = _calistirma.get()
+        kayit = {
+            'zaman': time.time(),
+            'calistirma': calistirma['id'] if calistirma else None,
+            'ad': self.ad,
+            'ust': _ust_aralik.get(),
+            'sure_ms': round(sure * 1000, 3),
+            'satir': None if self.satir is None else int(self.satir),
+            'bellek_degisim_mb': None if bellek is None or self._bellek is None else round(bellek - self._bellek, 2),
+            'hata': hata_tipi.__name__ if hata_tipi else None,
+        }
+        if calistirma is not None:
+            calistirma['araliklar'].append(kayit)
+        _log_yaz(kayit)
+        return False
+
+
+def olcum(ad, satir=None):
+    """Bir aşamayı ölçen bağlam yöneticisi döndürür.
+
+    Satır sayısı blok içinde sonradan da verilebilir:
+        with olcum('maliyet_yukle') as aralik:
+            df = ...
+            aralik.satir = len(df)
+    """
+    if not ETKIN:
+        return _BOS_ARALIK
+    return _Aralik(ad, satir)
+
+
+def calistirma_baslat(ad):
+    """Yeni bir yeniden çalıştırma (rerun) başlatır; sonraki aralıklar bu çalıştırmaya bağlanır."""
+    if not ETKIN:
+        return
+    calistirma = {'id': uuid.uuid4().hex[:8], 'ad': ad, 'zaman': time.time(), 'araliklar': []}
+    _calistirma.set(calistirma)
+    _son_calistirmalar.append(calistirma)
+
+
+def son_calistirmalar():
+    """Bellekte tutulan son çalıştırmaları en yeniden eskiye döndürür."""
+    return list(reversed(_son_calistirmalar))
+
+
+def _log_yaz(kayit):
+    try:
+        with _yazma_kilidi:
+            os.makedirs(os.path.dirname(LOG_DOSYASI) or ".", exist_ok=True)
+            with open(LOG_DOSYASI, "a", encoding="utf-8") as f:
+                f.write(json.dumps(kayit, ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # Ölçüm kaydının yazılamaması uygulamayı etkilememeli